@@ -0,0 +1,206 @@
+"""
+PEER REVIEW SCRIPT: bench_builders
+
+Benchmarks the dataframe_builder functions on synthetic data (see
+synthetic.py) across course sizes. Runs entirely offline. For each builder and
+size it records the best wall time over a few repeats and the peak memory
+allocated (measured with tracemalloc in a separate run, since tracing slows
+things down). Results are written as JSON so runs on different commits can be
+compared.
+
+Usage:
+    python benchmarks/bench_builders.py
+    python benchmarks/bench_builders.py --sizes 50 500 --repeat 5
+    python benchmarks/bench_builders.py --compare old.json new.json
+
+last edit:
+Oct 18, 2026
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import pandas as pd
+
+from dataframe_builder import (
+    make_assessments_df,
+    make_overview_df,
+    make_comments_df,
+    _expand_criteria_to_columns,
+)
+from reliability import make_reliability_df
+from review_graph import ReviewGraph, make_coverage_df
+from synthetic import generate_course, as_canvas_objects
+
+DEFAULT_SIZES = [50, 500, 5000, 50000]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def main(sizes, repeat, output_path, num_criteria, reviews_per_student):
+    results = []
+    for num_students in sizes:
+        print(f"Generating course with {num_students} students...")
+        objects = as_canvas_objects(
+            generate_course(
+                num_students,
+                reviews_per_student=reviews_per_student,
+                num_criteria=num_criteria,
+            )
+        )
+
+        for name, builder in _builders(objects).items():
+            seconds = _best_time(builder, repeat)
+            peak_bytes = _peak_memory(builder)
+            results.append(
+                {
+                    "builder": name,
+                    "students": num_students,
+                    "reviews": len(objects["peer_reviews_json"]),
+                    "criteria": num_criteria,
+                    "seconds": seconds,
+                    "peak_bytes": peak_bytes,
+                }
+            )
+            print(f"  {name:<30} {seconds:10.4f}s {peak_bytes / 2**20:10.1f} MiB")
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeat": repeat,
+        "results": results,
+    }
+
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        output_path = os.path.join(RESULTS_DIR, f"{stamp}_{report['commit']}.json")
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output_path}")
+
+
+def compare(old_path, new_path):
+    """Prints the time and memory ratio (new / old) for every builder and size
+       found in both results files.
+    """
+    with open(old_path) as f:
+        old = {(r["builder"], r["students"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(r["builder"], r["students"]): r for r in json.load(f)["results"]}
+
+    print(f"{'builder':<30} {'students':>9} {'time x':>9} {'memory x':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        time_ratio = new[key]["seconds"] / old[key]["seconds"]
+        memory_ratio = new[key]["peak_bytes"] / max(old[key]["peak_bytes"], 1)
+        print(f"{key[0]:<30} {key[1]:>9} {time_ratio:>9.2f} {memory_ratio:>9.2f}")
+
+
+def _builders(objects):
+    """Returns {name: function with no arguments} for every builder. Inputs the
+       builders depend on (eg. the assessments table for the overview) are made
+       here, outside of what is timed.
+    """
+    rubric = objects["rubric"]
+    with _quiet():
+        assessments_df = make_assessments_df(
+            objects["assessments_json"],
+            objects["peer_reviews_json"],
+            objects["students"],
+            rubric,
+            False,
+        )
+    raw_assessments_df = pd.DataFrame(objects["assessments_json"])[
+        ["assessor_id", "artifact_id", "data", "score"]
+    ]
+
+    return {
+        "make_assessments_df": lambda: make_assessments_df(
+            objects["assessments_json"],
+            objects["peer_reviews_json"],
+            objects["students"],
+            rubric,
+            False,
+        ),
+        "make_overview_df": lambda: make_overview_df(
+            assessments_df, objects["peer_reviews_json"], objects["students"]
+        ),
+        "_expand_criteria_to_columns": lambda: _expand_criteria_to_columns(
+            raw_assessments_df.copy(), rubric.data, True
+        ),
+        "make_comments_df": lambda: make_comments_df(iter(objects["submissions"])),
+        "make_reliability_df": lambda: make_reliability_df(assessments_df, rubric),
+        "make_coverage_df": lambda: make_coverage_df(
+            ReviewGraph.from_peer_reviews(objects["peer_reviews_json"], objects["students"]), 3
+        ),
+    }
+
+
+def _best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        with _quiet():
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(function):
+    tracemalloc.start()
+    try:
+        with _quiet():
+            function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@contextlib.contextmanager
+def _quiet():
+    # the builders print progress/warnings; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dataframe builders.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="numbers of students to benchmark")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per builder and size (best is kept)")
+    parser.add_argument("--criteria", type=int, default=5, help="rubric criteria")
+    parser.add_argument("--reviews", type=int, default=4, help="reviews per student")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two results files instead of benchmarking")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        main(args.sizes, args.repeat, args.output, args.criteria, args.reviews)
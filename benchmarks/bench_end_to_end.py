@@ -0,0 +1,127 @@
+"""
+PEER REVIEW SCRIPT: bench_end_to_end
+
+Runs the whole report pipeline (peer_review.run_report) against the local mock
+Canvas API (mock_canvas.py) and reports wall-clock time, number of requests
+and bytes transferred. Runs entirely offline; output tables are written to a
+temporary directory.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --students 2000 --latency 0.05
+    python benchmarks/bench_end_to_end.py --students 500 --rate-limit --comments --scores
+    python benchmarks/bench_end_to_end.py --rate-limit --workers 16 --no-throttle
+
+last edit:
+Oct 18, 2026
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from mock_canvas import MockCanvas, LeakyBucket
+from synthetic import generate_course
+
+
+def run(server, include_comments, include_assignment_score, use_cache=False, throttle=True):
+    """Runs one report against the mock server.
+
+    Args:
+        server (MockCanvas): Running mock server
+        include_comments (bool): Whether to include comment data
+        include_assignment_score (bool): Whether to output the given score table
+        use_cache (bool): Whether to use the on-disk response cache
+        throttle (bool): Whether to schedule requests around the rate limit
+
+    Returns:
+        result (dict): 'seconds' plus the server's request statistics
+    """
+    # the scripts read the instance url and token from the environment
+    os.environ["API_INSTANCE"] = server.url
+    os.environ["API_TOKEN"] = "mock-token"
+
+    import interface
+    import settings
+    from peer_review import run_report
+
+    interface.URL = server.url
+    interface.KEY = "mock-token"
+    settings.HTTP_CACHE = use_cache
+    settings.THROTTLE = throttle
+
+    server.reset_stats()
+    output_dir = tempfile.mkdtemp()
+    # keep the runs out of the real history (see history.py)
+    settings.HISTORY_PATH = os.path.join(output_dir, "peer_review_history.sqlite3")
+    working_dir = os.getcwd()
+    os.chdir(output_dir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            canvas = interface.make_canvas()
+            interface.get_current_user(canvas)
+            course = canvas.get_course(server.data["course"]["id"])
+            assignment = course.get_assignment(server.data["assignment"]["id"])
+            run_report(course, [assignment], include_comments, include_assignment_score)
+            seconds = time.perf_counter() - start
+    finally:
+        os.chdir(working_dir)
+
+    return {"seconds": seconds, "output_dir": output_dir, **server.stats()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline against a mock Canvas.")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--criteria", type=int, default=5)
+    parser.add_argument("--reviews", type=int, default=4, help="reviews per student")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--other-assessments", type=int, default=0,
+                        help="assessments made with the rubric in other assignments")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    parser.add_argument("--rate-limit", action="store_true", help="apply Canvas style rate limiting")
+    parser.add_argument("--comments", action="store_true", help="include comment data")
+    parser.add_argument("--scores", action="store_true", help="include assignment scores")
+    parser.add_argument("--cache", action="store_true", help="use the response cache")
+    parser.add_argument("--no-throttle", action="store_true", help="don't schedule requests around the rate limit")
+    parser.add_argument("--workers", type=int, help="concurrent requests (default: settings.MAX_WORKERS)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    data = generate_course(
+        args.students,
+        reviews_per_student=args.reviews,
+        num_criteria=args.criteria,
+        other_assessments=args.other_assessments,
+    )
+    server = MockCanvas(
+        data,
+        page_size=args.page_size,
+        latency=args.latency,
+        rate_limit=LeakyBucket() if args.rate_limit else None,
+    ).start()
+
+    if args.workers:
+        import settings
+        settings.MAX_WORKERS = args.workers
+
+    result = run(server, args.comments, args.scores, args.cache, not args.no_throttle)
+    result.update(vars(args))
+
+    print(f"wall time:   {result['seconds']:.2f}s")
+    print(f"requests:    {result['requests']} ({result['throttled']} throttled)")
+    print(f"bytes:       {result['bytes_sent'] / 2**20:.2f} MiB")
+    for endpoint, count in sorted(result["requests_by_endpoint"].items()):
+        print(f"  {endpoint:<22} {count}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
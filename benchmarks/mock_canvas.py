@@ -0,0 +1,392 @@
+"""
+PEER REVIEW SCRIPT: mock_canvas
+
+Local stand-in for the Canvas API endpoints used by /src, serving data from
+the synthetic generator (synthetic.py). Supports Link header pagination with a
+configurable page size, injected latency, and Canvas style rate limiting:
+every response carries X-Request-Cost and X-Rate-Limit-Remaining headers from
+a leaky bucket, and requests that would overflow the bucket get
+403 Forbidden (Rate Limit Exceeded) like the real thing. Responses carry an
+ETag, and a request whose If-None-Match matches it gets 304 Not Modified. The
+server counts requests and bytes sent, so throughput can be measured.
+
+Usage (stand alone):
+    python benchmarks/mock_canvas.py --students 2000 --port 8900
+    then set API_INSTANCE = 'http://127.0.0.1:8900' in .env
+
+last edit:
+Oct 18, 2026
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from synthetic import generate_course
+
+
+class LeakyBucket:
+    """Canvas style rate limit. Each request adds its cost to the bucket, the
+    bucket leaks at leak_rate units per second and a request that would take
+    it past capacity is refused.
+
+    Args:
+        capacity (float): Size of the bucket (Canvas uses 700)
+        leak_rate (float): Units leaked per second (Canvas uses 10)
+        initial_cost (float): Cost added up front for every request while it
+                              runs (Canvas uses 50, refunded when it finishes)
+    """
+
+    def __init__(self, capacity=700.0, leak_rate=10.0, initial_cost=50.0):
+        self.capacity = capacity
+        self.leak_rate = leak_rate
+        self.initial_cost = initial_cost
+        self.level = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Reserves the up front cost of a request. Returns False if the
+        request has to be refused.
+        """
+        with self._lock:
+            self._leak()
+            if self.level + self.initial_cost > self.capacity:
+                return False
+            self.level += self.initial_cost
+            return True
+
+    def finish(self, cost):
+        """Swaps the up front cost of a finished request for its actual cost.
+        Returns the remaining capacity.
+        """
+        with self._lock:
+            self._leak()
+            self.level = max(self.level - self.initial_cost + cost, 0.0)
+            return self.capacity - self.level
+
+    def remaining(self):
+        with self._lock:
+            self._leak()
+            return self.capacity - self.level
+
+    def _leak(self):
+        now = time.monotonic()
+        self.level = max(self.level - (now - self._updated) * self.leak_rate, 0.0)
+        self._updated = now
+
+
+class MockCanvas(ThreadingHTTPServer):
+    """HTTP server serving one synthetic course.
+
+    Args:
+        data (dict): Course data as returned by synthetic.generate_course
+        port (int): Port to listen on (0 picks a free one)
+        page_size (int): Default items per page (Canvas uses 10); clients
+                         can ask for up to max_page_size with per_page
+        max_page_size (int): Largest page size a client can ask for
+        latency (float): Seconds to wait before answering every request
+        rate_limit (LeakyBucket): (optional) Rate limit to apply
+        fail_after (dict): (optional) {path regex: n} makes the next request
+                           matching path after the first n fail (once) with
+                           500, to test recovery from failures part way
+                           through pagination
+        num_courses (int): Number of courses in the account (ids counting up
+                           from the synthetic course's), all serving the same
+                           assignment data
+    """
+
+    daemon_threads = True
+
+    def __init__(self, data, port=0, page_size=10, max_page_size=100, latency=0.0,
+                 rate_limit=None, fail_after=None, num_courses=1):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.data = data
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_after = {re.compile(pattern): n for pattern, n in (fail_after or {}).items()}
+        self.courses = {
+            data["course"]["id"] + i: {
+                **data["course"],
+                "id": data["course"]["id"] + i,
+                "name": data["course"]["name"] + (f" {i + 1}" if i else ""),
+            }
+            for i in range(num_courses)
+        }
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        """Serves in a background thread and returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.throttled = 0
+            self.failed = 0
+            self.not_modified = 0
+            self.requests_by_endpoint = Counter()
+            self.fail_counts = Counter()
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "requests": self.requests,
+                "bytes_sent": self.bytes_sent,
+                "throttled": self.throttled,
+                "failed": self.failed,
+                "not_modified": self.not_modified,
+                "requests_by_endpoint": dict(self.requests_by_endpoint),
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    ROUTES = [
+        (r"/api/v1/users/self", "_user_self"),
+        (r"/api/v1/accounts/(?P<account_id>\d+)", "_account"),
+        (r"/api/v1/accounts/(?P<account_id>\d+)/courses", "_account_courses"),
+        (r"/api/v1/courses/(?P<course_id>\d+)", "_course"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/assignments", "_assignments"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)", "_assignment"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)/peer_reviews", "_peer_reviews"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/(search_)?users", "_users"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/sections", "_sections"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/rubrics/(?P<rubric_id>\d+)", "_rubric"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)/submissions", "_submissions"),
+        (r"/api/v1/courses/(?P<course_id>\d+)/students/submissions", "_student_submissions"),
+    ]
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        self.query = parse_qs(parts.query)
+
+        for pattern, endpoint in self.ROUTES:
+            match = re.fullmatch(pattern, parts.path)
+            if match:
+                break
+        else:
+            return self._send(404, {"errors": [{"message": "The specified resource does not exist."}]})
+
+        endpoint_name = endpoint.lstrip("_")
+        if endpoint == "_rubric" and self._include() & {"assessments", "peer_assessments"}:
+            endpoint_name = "rubric_assessments"
+        with server.stats_lock:
+            server.requests_by_endpoint[endpoint_name] += 1
+
+        for failing_pattern, n in server.fail_after.items():
+            if failing_pattern.search(parts.path):
+                with server.stats_lock:
+                    server.fail_counts[failing_pattern] += 1
+                    fail = server.fail_counts[failing_pattern] == n + 1
+                    server.failed += fail
+                if fail:
+                    return self._send(500, {"errors": [{"message": "Injected failure"}]})
+
+        if server.rate_limit and not server.rate_limit.start():
+            with server.stats_lock:
+                server.throttled += 1
+            return self._send_raw(403, b"403 Forbidden (Rate Limit Exceeded)",
+                                  server.rate_limit.remaining())
+
+        started = time.monotonic()
+        if server.latency:
+            # counts as server time, so it is charged to the rate limit
+            time.sleep(server.latency)
+        status, body, links = getattr(self, endpoint)(**match.groupdict())
+        cost = None
+        remaining = None
+        if server.rate_limit:
+            # Canvas charges CPU + database time; approximate with the time
+            # spent plus a little per item returned
+            items = len(body) if isinstance(body, list) else 1
+            cost = (time.monotonic() - started) * 100 + 0.05 * items
+            remaining = server.rate_limit.finish(cost)
+
+        self._send(status, body, links, cost, remaining)
+
+    def log_message(self, format, *args):
+        pass
+
+    # ~~ endpoints ~~
+
+    def _user_self(self):
+        return 200, {"id": 1, "name": "Mock Instructor"}, None
+
+    def _account(self, account_id):
+        return 200, {"id": int(account_id), "name": "Mock Account"}, None
+
+    def _account_courses(self, account_id):
+        return self._paginate(list(self.server.courses.values()))
+
+    def _course(self, course_id):
+        if int(course_id) not in self.server.courses:
+            return 404, {"errors": [{"message": "Not Found"}]}, None
+        return 200, self.server.courses[int(course_id)], None
+
+    def _assignments(self, course_id):
+        return self._paginate([self.server.data["assignment"]])
+
+    def _assignment(self, course_id, assignment_id):
+        if int(assignment_id) != self.server.data["assignment"]["id"]:
+            return 404, {"errors": [{"message": "Not Found"}]}, None
+        return 200, self.server.data["assignment"], None
+
+    def _peer_reviews(self, course_id, assignment_id):
+        return self._paginate(self.server.data["peer_reviews"])
+
+    def _users(self, course_id):
+        users = self.server.data["users"]
+        if "enrollments" not in self._include():
+            users = [{k: v for k, v in user.items() if k != "enrollments"} for user in users]
+        return self._paginate(users)
+
+    def _sections(self, course_id):
+        return self._paginate(self.server.data.get("sections", []))
+
+    def _rubric(self, course_id, rubric_id):
+        include = self._include()
+        data = self.server.data["rubric"]
+        rubric = {k: v for k, v in data.items() if k not in ("assessments", "associations")}
+        if "assessments" in include:
+            rubric["assessments"] = data["assessments"]
+        elif "peer_assessments" in include:
+            rubric["assessments"] = [
+                a for a in data["assessments"] if a["assessment_type"] == "peer_review"
+            ]
+        if include & {"associations", "assignment_associations"}:
+            rubric["associations"] = data["associations"]
+        return 200, rubric, None
+
+    def _submissions(self, course_id, assignment_id):
+        return self._paginate(self._with_includes(self.server.data["submissions"]))
+
+    def _student_submissions(self, course_id):
+        submissions = self.server.data["submissions"]
+        for name, field in (("submitted_since", "submitted_at"), ("graded_since", "graded_at")):
+            if name in self.query:
+                since = _parse_time(self.query[name][0])
+                submissions = [s for s in submissions if s[field] and _parse_time(s[field]) > since]
+        return self._paginate(self._with_includes(submissions))
+
+    # ~~ helpers ~~
+
+    def _include(self):
+        return set(self.query.get("include[]", []) + self.query.get("include", []))
+
+    def _with_includes(self, submissions):
+        include = self._include()
+        dropped = {"submission_comments", "user"} - include
+        if not dropped:
+            return submissions
+        return [{k: v for k, v in s.items() if k not in dropped} for s in submissions]
+
+    def _paginate(self, items):
+        server = self.server
+        per_page = int(self.query.get("per_page", [server.page_size])[0])
+        per_page = max(1, min(per_page, server.max_page_size))
+        page = int(self.query.get("page", ["1"])[0])
+        last_page = max(1, math.ceil(len(items) / per_page))
+
+        links = {"current": page, "first": 1, "last": last_page}
+        if page < last_page:
+            links["next"] = page + 1
+        if page > 1:
+            links["prev"] = page - 1
+
+        return 200, items[(page - 1) * per_page: page * per_page], links
+
+    def _link_header(self, links):
+        parts = urlsplit(self.path)
+        query = {k: v for k, v in self.query.items() if k not in ("page", "per_page")}
+        base = f"http://{self.headers['Host']}{parts.path}"
+        per_page = self.query.get("per_page", [self.server.page_size])[0]
+        header = []
+        for rel, page in links.items():
+            params = urlencode({**query, "page": page, "per_page": per_page}, doseq=True)
+            header.append(f'<{base}?{params}>; rel="{rel}"')
+        return ",".join(header)
+
+    def _send(self, status, body, links=None, cost=None, remaining=None):
+        payload = json.dumps(body).encode()
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if links:
+            headers["Link"] = self._link_header(links)
+        if cost is not None:
+            headers["X-Request-Cost"] = f"{cost:.4f}"
+            headers["X-Rate-Limit-Remaining"] = f"{remaining:.4f}"
+        if status == 200:
+            headers["ETag"] = f'W/"{hashlib.md5(payload).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                with self.server.stats_lock:
+                    self.server.not_modified += 1
+                return self._write(304, b"", headers)
+        self._write(status, payload, headers)
+
+    def _send_raw(self, status, payload, rate_limit_remaining):
+        headers = {
+            "Content-Type": "text/plain",
+            "X-Rate-Limit-Remaining": f"{rate_limit_remaining:.4f}",
+        }
+        self._write(status, payload, headers)
+
+    def _write(self, status, payload, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.server.stats_lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(payload)
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a synthetic course as a mock Canvas API.")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--criteria", type=int, default=5)
+    parser.add_argument("--reviews", type=int, default=4, help="reviews per student")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--rate-limit", action="store_true", help="apply Canvas style rate limiting")
+    parser.add_argument("--courses", type=int, default=1, help="courses in the account")
+    args = parser.parse_args()
+
+    data = generate_course(args.students, reviews_per_student=args.reviews, num_criteria=args.criteria)
+    server = MockCanvas(
+        data,
+        port=args.port,
+        page_size=args.page_size,
+        latency=args.latency,
+        rate_limit=LeakyBucket() if args.rate_limit else None,
+        num_courses=args.courses,
+    )
+    print(f"Mock Canvas serving course {data['course']['id']}, "
+          f"assignment {data['assignment']['id']} at {server.url}")
+    server.serve_forever()
@@ -0,0 +1,300 @@
+"""
+PEER REVIEW SCRIPT: synthetic
+
+Generates realistic fake Canvas data for a peer reviewed assignment, entirely
+offline. generate_course returns the raw JSON Canvas would send (users, peer
+reviews, rubric with assessments, submissions with comments and user), and
+as_canvas_objects wraps it in the canvasapi objects the scripts in /src work
+with.
+
+last edit:
+Oct 18, 2026
+"""
+
+from datetime import datetime, timedelta, timezone
+import random
+
+from canvasapi.rubric import Rubric
+from canvasapi.submission import Submission
+from canvasapi.user import User
+
+COURSE_ID = 1000
+ASSIGNMENT_ID = 2000
+RUBRIC_ID = 3000
+RUBRIC_ASSOCIATION_ID = 4000
+SECTION_ID = 5000
+
+WORDS = (
+    "clear argument evidence structure thesis writing citation analysis "
+    "strong weak needs more detail great well organized unclear revise"
+).split()
+
+
+def generate_course(
+    num_students,
+    reviews_per_student=4,
+    num_criteria=5,
+    completed_fraction=0.8,
+    nan_fraction=0.02,
+    invalid_fraction=0.005,
+    comments_per_submission=3,
+    other_assessments=0,
+    num_sections=3,
+    seed=0,
+):
+    """Generates the raw Canvas JSON for one course and peer reviewed assignment.
+
+    Args:
+        num_students (int): Number of students enrolled
+        reviews_per_student (int): Peer reviews assigned to each student
+        num_criteria (int): Number of rubric criteria
+        completed_fraction (float): Fraction of peer reviews that are completed
+        nan_fraction (float): Fraction of criterion points that are NaN
+        invalid_fraction (float): Fraction of criterion points that are missing
+        comments_per_submission (int): Average number of submission comments
+        other_assessments (int): Assessments made with the same rubric in other
+                                 assignments (a rubric reused across a
+                                 department), a fifth of them by graders
+        num_sections (int): Number of course sections, students are spread
+                            evenly across them
+        seed (int): Random seed, the same arguments always give the same data
+
+    Returns:
+        data (dict): 'course', 'assignment', 'sections', 'users' (including
+                     'enrollments'), 'peer_reviews', 'rubric' (including
+                     'assessments' and 'associations') and 'submissions'
+    """
+    rng = random.Random(seed)
+    start = datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+    sections = [
+        {"id": SECTION_ID + i, "course_id": COURSE_ID, "name": f"Section {i + 1:03d}"}
+        for i in range(num_sections)
+    ]
+    users = [_user(COURSE_ID * 100 + i) for i in range(num_students)]
+    for index, user in enumerate(users):
+        section = sections[index % num_sections] if sections else None
+        user["enrollments"] = [_enrollment(user["id"], section)] if section else []
+    criteria = [_criterion(i, rng) for i in range(num_criteria)]
+    points_possible = sum(criterion["points"] for criterion in criteria)
+
+    submissions = []
+    peer_reviews = []
+    assessments = []
+    reviews_per_student = min(reviews_per_student, max(num_students - 1, 0))
+
+    for index, user in enumerate(users):
+        submission_id = 500000 + index
+        submitted_at = start + timedelta(minutes=rng.randint(0, 20000))
+
+        # each student's work is reviewed by the next reviews_per_student students
+        reviewers = [users[(index + k) % num_students] for k in range(1, reviews_per_student + 1)]
+
+        comments = []
+        for _ in range(rng.randint(0, 2 * comments_per_submission)):
+            author = rng.choice(reviewers) if reviewers else user
+            comments.append(
+                {
+                    "id": len(comments) + submission_id * 10,
+                    "author_id": author["id"],
+                    "author_name": author["name"],
+                    "comment": _sentence(rng),
+                    "created_at": _iso(submitted_at + timedelta(hours=rng.randint(1, 200))),
+                    "edited_at": None,
+                    "media_comment": None,
+                    "author": {"id": author["id"], "display_name": author["name"]},
+                }
+            )
+
+        submissions.append(
+            {
+                "id": submission_id,
+                "user_id": user["id"],
+                "assignment_id": ASSIGNMENT_ID,
+                "score": round(rng.uniform(0, points_possible), 1),
+                "grade": None,
+                "workflow_state": rng.choice(["graded", "submitted"]),
+                "submitted_at": _iso(submitted_at),
+                "graded_at": _iso(submitted_at + timedelta(days=3)),
+                "attempt": 1,
+                "late": False,
+                "submission_comments": comments,
+                "user": {"id": user["id"], "name": user["name"], "sortable_name": user["sortable_name"]},
+            }
+        )
+
+        for reviewer in reviewers:
+            completed = rng.random() < completed_fraction
+            peer_reviews.append(
+                {
+                    "id": len(peer_reviews) + 1,
+                    "user_id": user["id"],
+                    "assessor_id": reviewer["id"],
+                    "asset_id": submission_id,
+                    "asset_type": "Submission",
+                    "workflow_state": "completed" if completed else "assigned",
+                }
+            )
+            if completed:
+                assessments.append(
+                    _assessment(len(assessments) + 1, reviewer, submission_id, criteria,
+                                nan_fraction, invalid_fraction, rng)
+                )
+
+    # the rubric's use in other assignments
+    associations = [_association(RUBRIC_ASSOCIATION_ID, ASSIGNMENT_ID)]
+    for index in range(other_assessments):
+        if index % 1000 == 0:
+            associations.append(
+                _association(RUBRIC_ASSOCIATION_ID + len(associations), ASSIGNMENT_ID + len(associations))
+            )
+        reviewer = rng.choice(users) if users else _user(0)
+        assessment = _assessment(len(assessments) + 1, reviewer, 900000 + index, criteria,
+                                 nan_fraction, invalid_fraction, rng)
+        assessment["rubric_association_id"] = associations[-1]["id"]
+        if index % 5 == 0:
+            assessment["assessment_type"] = "grading"
+        assessments.append(assessment)
+
+    rubric = {
+        "id": RUBRIC_ID,
+        "title": "Synthetic Rubric",
+        "context_id": COURSE_ID,
+        "context_type": "Course",
+        "points_possible": points_possible,
+        "data": criteria,
+        "assessments": assessments,
+        "associations": associations,
+    }
+
+    return {
+        "course": {"id": COURSE_ID, "name": "Synthetic Course"},
+        "assignment": {
+            "id": ASSIGNMENT_ID,
+            "course_id": COURSE_ID,
+            "name": "Synthetic Assignment",
+            "peer_reviews": True,
+            "rubric_settings": {"id": RUBRIC_ID, "points_possible": points_possible},
+        },
+        "sections": sections,
+        "users": users,
+        "peer_reviews": peer_reviews,
+        "rubric": rubric,
+        "submissions": submissions,
+    }
+
+
+def as_canvas_objects(data):
+    """Wraps generated data in the objects the /src scripts expect.
+
+    Args:
+        data (dict): as returned by generate_course
+
+    Returns:
+        objects (dict): 'students' (list of User), 'peer_reviews_json' (list of
+                        dict), 'rubric' (Rubric), 'assessments_json' (list of
+                        dict) and 'submissions' (list of Submission)
+    """
+    return {
+        "students": [User(None, user) for user in data["users"]],
+        "peer_reviews_json": [dict(peer_review) for peer_review in data["peer_reviews"]],
+        "rubric": Rubric(None, data["rubric"]),
+        "assessments_json": data["rubric"]["assessments"],
+        "submissions": [Submission(None, submission) for submission in data["submissions"]],
+    }
+
+
+def _user(user_id):
+    number = user_id % 100000
+    return {
+        "id": user_id,
+        "name": f"Student {number}",
+        "created_at": "2026-08-20T12:00:00Z",
+        "sortable_name": f"{number}, Student",
+        "short_name": f"Student {number}",
+        "sis_user_id": str(10000000 + number),
+        "integration_id": None,
+        "login_id": f"student{number}",
+    }
+
+
+def _enrollment(user_id, section):
+    return {
+        "id": user_id * 10,
+        "user_id": user_id,
+        "course_id": COURSE_ID,
+        "course_section_id": section["id"],
+        "type": "StudentEnrollment",
+        "role": "StudentEnrollment",
+        "enrollment_state": "active",
+    }
+
+
+def _criterion(index, rng):
+    points = float(rng.choice([5, 10, 15, 20, 25]))
+    return {
+        "id": f"_{1000 + index}",
+        "description": f"Criterion {index + 1}",
+        "long_description": "",
+        "points": points,
+        "criterion_use_range": False,
+        "ratings": [
+            {"id": f"_{1000 + index}_full", "description": "Full Marks", "points": points},
+            {"id": f"_{1000 + index}_none", "description": "No Marks", "points": 0.0},
+        ],
+    }
+
+
+def _assessment(assessment_id, reviewer, submission_id, criteria, nan_fraction, invalid_fraction, rng):
+    data = []
+    for criterion in criteria:
+        item = {
+            "id": None,
+            "criterion_id": criterion["id"],
+            "learning_outcome_id": None,
+            "description": criterion["description"],
+            "comments_enabled": True,
+            "comments": _sentence(rng) if rng.random() < 0.4 else "",
+        }
+        roll = rng.random()
+        if roll < invalid_fraction:
+            pass  # reviewer didn't fill this criterion in
+        elif roll < invalid_fraction + nan_fraction:
+            item["points"] = float("nan")
+        else:
+            item["points"] = float(rng.randint(0, int(criterion["points"])))
+        data.append(item)
+
+    score = sum(item.get("points", 0) for item in data if item.get("points") == item.get("points"))
+
+    return {
+        "id": assessment_id,
+        "rubric_id": RUBRIC_ID,
+        "rubric_association_id": RUBRIC_ASSOCIATION_ID,
+        "score": score,
+        "artifact_type": "Submission",
+        "artifact_id": submission_id,
+        "artifact_attempt": 1,
+        "assessment_type": "peer_review",
+        "assessor_id": reviewer["id"],
+        "data": data,
+    }
+
+
+def _association(association_id, assignment_id):
+    return {
+        "id": association_id,
+        "rubric_id": RUBRIC_ID,
+        "association_id": assignment_id,
+        "association_type": "Assignment",
+        "use_for_grading": True,
+        "purpose": "grading",
+    }
+
+
+def _sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))).capitalize() + "."
+
+
+def _iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
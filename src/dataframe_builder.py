@@ -8,37 +8,118 @@ last edit:
 Nov 29, 2022
 """
 
-import math
 from pprint import pprint
+import numpy as np
 import pandas as pd
 import sys
 from util import shut_down, print_error
 
-def make_comments_df(assignment, peer_reviews_json):
+def make_comments_df(submissions, chunk_size=10000):
+    """Makes a long table of submission comments with one row per comment, in
+       the order Canvas returns them, keyed by whose submission it is
+       (user_id, the assessee) and who wrote it (author_id, the assessor for
+       peer review comments).
 
-    peer_reviews_df = pd.DataFrame(peer_reviews_json)
+       Submissions are read one at a time (so a generator that streams pages
+       from Canvas can be passed in) and only the columns needed are kept.
+       Comments are buffered in lists until chunk_size have been read, then
+       that chunk is converted to typed columns and the buffer emptied. Only
+       the raw buffer is bounded by chunk_size: the typed chunks are all kept
+       and joined into the returned table.
+
+       Canvas sends no author_id for comments of deleted or anonymized users,
+       so author_id is a nullable integer column.
+
+    Args:
+        submissions (iterable of Submission - canvasapi): Submissions fetched
+                                    with include="submission_comments"
+        chunk_size (int): Number of comments to buffer before converting
+
+    Returns:
+        submission_comments_df (DataFrame): user_id | author_id | comment
+    """
+    buffer = {"user_id": [], "author_id": [], "comment": []}
+    chunks = []
+
+    for submission in submissions:
+        for comment in submission.submission_comments or []:
+            buffer["user_id"].append(submission.user_id)
+            buffer["author_id"].append(comment["author_id"])
+            buffer["comment"].append(comment["comment"])
 
-    submissions = assignment.get_submissions(include="submission_comments")
+        if len(buffer["comment"]) >= chunk_size:
+            chunks.append(_make_comments_chunk(buffer))
+            buffer = {column: [] for column in buffer}
 
-    submission_comments_json = []
+    if buffer["comment"] or not chunks:
+        chunks.append(_make_comments_chunk(buffer))
 
-    for i in submissions:
-        sub_comments = i.submission_comments
-        if sub_comments:
-            for j in sub_comments:
-                j.update({"submission_id": i.id, "user_id": i.user_id})
-                submission_comments_json.append(j)
-        
-    submission_comments_df = pd.DataFrame(submission_comments_json)[["submission_id", "user_id",
-                                                                "author_id", "author_name", "comment"]]  
+    return pd.concat(chunks, ignore_index=True)
 
-    submission_comments_df = submission_comments_df.groupby(['submission_id', 'user_id', 'author_id'])['comment'].apply(list).reset_index()
 
-    submission_comments_df = submission_comments_df.rename({"comment": "Submission Comments"}, axis=1)
+def _make_comments_chunk(buffer):
+    """Converts buffered comment columns to a typed DataFrame"""
+    return pd.DataFrame(
+        {
+            "user_id": np.array(buffer["user_id"], dtype="int64"),
+            "author_id": pd.array(buffer["author_id"], dtype="Int64"),
+            "comment": buffer["comment"],
+        }
+    )
+
+
+def attach_submission_comments(assessments_df, comments_df):
+    """Adds the 'Submission Comments' column to the assessments table: the
+       list of comments each assessor left on the assessee's submission (in
+       the order they were made). Used when writing the table out, so the
+       table itself doesn't need to hold a list per cell. Lists are only made
+       for the (assessee, assessor) pairs in the assessments table; comments
+       without an author never match one.
+
+    Args:
+        assessments_df (DataFrame): Assessments table from make_assessments_df
+        comments_df (DataFrame): Submission comments from make_comments_df
+
+    Returns:
+        assessments_df (DataFrame): Assessments table with the comments column
+    """
+    keys = ["user_id", "author_id"]
+    pairs = pd.MultiIndex.from_frame(
+        assessments_df[["user_id", "assessor_id"]].dropna().astype("int64"), names=keys
+    )
+    comments_df = comments_df[comments_df["author_id"].notna()]
+    comments_df = comments_df[pd.MultiIndex.from_frame(comments_df[keys]).isin(pairs)]
+    if comments_df.empty:
+        assessments_df = assessments_df.copy()
+        assessments_df["Submission Comments"] = np.nan
+        return assessments_df
+    comments_df = comments_df.astype({"author_id": "int64"})
+    sorted_df = comments_df.sort_values(keys, kind="stable")
+
+    # rows of a (user, author) pair are now next to each other (in their
+    # original order); find where each pair starts and split the comments there
+    key_values = sorted_df[keys].to_numpy()
+    is_start = np.ones(len(sorted_df), dtype=bool)
+    is_start[1:] = (key_values[1:] != key_values[:-1]).any(axis=1)
+    starts = np.flatnonzero(is_start)
+
+    comments = sorted_df["comment"].to_numpy(dtype=object)
+    aggregated_df = sorted_df.iloc[starts][keys].reset_index(drop=True)
+    aggregated_df["Submission Comments"] = [
+        group.tolist() for group in np.split(comments, starts[1:])
+    ]
+
+    assessments_df = pd.merge(
+        assessments_df,
+        aggregated_df,
+        how="left",
+        left_on=["assessor_id", "user_id"],
+        right_on=["author_id", "user_id"],
+    )
+    return assessments_df.drop(["author_id"], axis=1)
 
-    return submission_comments_df
 
-def make_assessments_df(assessments_json, peer_reviews_json, users, rubric, include_comment_data, assignment=None):
+def make_assessments_df(assessments_json, peer_reviews_json, users, rubric, include_comment_data):
     """ Makes assessments dataframe with following schema:
 
     ~~COLUMNS~~
@@ -56,11 +137,16 @@ def make_assessments_df(assessments_json, peer_reviews_json, users, rubric, incl
                                     criteria_points is the maximum possible
                                     score for that item.
 
+    Ids are int64, names and states categorical and criteria scores float32.
+    Submission comments are kept in their own table (see make_comments_df and
+    attach_submission_comments).
+
     Args:
         assessments_json (JSON): Completed assessments
         peer_reviews_json (JSON): Assigned peer reviews
         users (list of User - canvasapi): List of User obj
         rubric (Rubric - canvasapi): Rubric obj
+        include_comment_data (bool): Whether to add rubric comment columns
 
     Returns:
         assessments_df (DataFrame): Dataframe representing the assessments
@@ -69,9 +155,7 @@ def make_assessments_df(assessments_json, peer_reviews_json, users, rubric, incl
     peer_reviews_df = pd.DataFrame(peer_reviews_json)
     peer_reviews_df = peer_reviews_df[
         ["user_id", "assessor_id", "asset_id", "workflow_state"]
-    ]
-    peer_reviews_df["Assessor"] = None
-    peer_reviews_df["Assessee"] = None
+    ].astype({"workflow_state": "category"})
 
     if rubric and assessments_json:
         print("Peer Review has rubric...")
@@ -110,25 +194,19 @@ def make_assessments_df(assessments_json, peer_reviews_json, users, rubric, incl
     else:
         assessments_df = peer_reviews_df #.drop("asset_id", axis=1)
 
-    for index, row in assessments_df.iterrows():
-        assessments_df.at[index, "Assessor"] = _user_lookup(row["assessor_id"], users)
-        assessments_df.at[index, "Assessee"] = _user_lookup(row["user_id"], users)
+    # names go right after the state
+    user_names = _make_user_names(users)
+    names_at = assessments_df.columns.get_loc("workflow_state") + 1
+    assessments_df.insert(
+        names_at, "Assessor", _lookup_names(assessments_df["assessor_id"], user_names)
+    )
+    assessments_df.insert(
+        names_at + 1, "Assessee", _lookup_names(assessments_df["user_id"], user_names)
+    )
 
     #assessments_df = assessments_df.drop(["user_id", "assessor_id"], axis=1)
     assessments_df = assessments_df.rename(columns={"workflow_state": "State"})
 
-    if include_comment_data:
-        comments_df = make_comments_df(assignment, peer_reviews_json)
-        assessments_df = pd.merge(
-            assessments_df,
-            comments_df,
-            how="left",
-            left_on = ["assessor_id", "asset_id", "user_id"],
-            right_on = ["author_id", "submission_id", "user_id"]
-        ) 
-
-        assessments_df = assessments_df.drop(['submission_id', 'author_id'], axis=1)
-
     assessments_df = assessments_df.drop(['asset_id'], axis=1)
     return assessments_df
 
@@ -146,6 +224,8 @@ def make_overview_df(assessments_df, peer_reviews_json, students):
             peer reviews for a particular student (1...n) review_number will count up from 1
             to help identify one review from another.
 
+    Ids are int64, names categorical and review counts int32.
+
     Args:
         assessments_df (DataFrame): Completed assessments
         peer_reviews_json (JSON): Assigned peer reviews
@@ -159,41 +239,88 @@ def make_overview_df(assessments_df, peer_reviews_json, students):
 
     # make dataframe detailing # assigned, # completed peer reviews per student
     overview_df = _make_assigned_completed_df(students_df, peer_reviews_df)
+    overview_df = overview_df.drop(["SID"], axis=1)
 
-    # for each student check if they have any complete reviews and if so,
-    # add a column "Review #" and set the cell value to their score
-    for outer_index, outer_row in overview_df.iterrows():
-        num_scores_for_user = 0
-        for index, row in assessments_df.iterrows():
-            try:
-                if row["user_id"] == outer_row["user_id"] and row[5] is not None:
-                    num_scores_for_user += 1
-                    score = row[5]
-                    overview_df.at[outer_index, f"Review: {num_scores_for_user}"] = score
-            except:
-                pass
+    # number each student's reviews 1...n (in assessments order) and attach
+    # the total score of each one
+    reviews_df = _rank_reviews(assessments_df)
+    reviews_df = reviews_df[reviews_df["user_id"].isin(overview_df["user_id"])]
 
-    overview_df = overview_df.drop(["SID"], axis=1)
+    # one 'Review: n' column per review number
+    if reviews_df.empty:
+        return overview_df.reset_index(drop=True)
+
+    wide_df = reviews_df.pivot(index="user_id", columns="Review", values="Score")
+    wide_df = wide_df.sort_index(axis=1)
+    wide_df.columns = [f"Review: {int(n)}" for n in wide_df.columns]
+
+    overview_df = pd.merge(
+        overview_df, wide_df, how="left", left_on="user_id", right_index=True
+    )
+    return overview_df.reset_index(drop=True)
+
+
+def _rank_reviews(assessments_df):
+    """Numbers the reviews each assessee has received (1...n, in the order they
+       appear in assessments_df) and pairs each number with the total score
+       given in that review (NaN if the review is not complete).
+
+    Args:
+        assessments_df (DataFrame): Assessments table from make_assessments_df
 
-    return overview_df
+    Returns:
+        reviews_df (DataFrame): user_id | Review | Score
+    """
+    total_score_col = _total_score_column(assessments_df)
+    if total_score_col is None:
+        # no rubric -> no scores to report
+        return pd.DataFrame(columns=["user_id", "Review", "Score"])
+
+    reviews_df = assessments_df[["user_id", total_score_col]].rename(
+        columns={total_score_col: "Score"}
+    )
+    reviews_df.insert(1, "Review", reviews_df.groupby("user_id").cumcount() + 1)
+
+    return reviews_df
 
 
-def _user_lookup(key, users):
-    """Given a user id and a list of users, search list for user with
-       matching id. If found, return user name, else return string 'Not Found'
+def _total_score_column(assessments_df):
+    """Returns the name of the 'Total Score (n)' column or None if there is no
+       such column (ie. the assignment has no rubric).
+    """
+    for col in assessments_df.columns:
+        if str(col).startswith("Total Score ("):
+            return col
+    return None
+
+
+def _make_user_names(users):
+    """Materializes a list of users (students) into a dictionary matching user
+       id to user name. Iterates users exactly once, so a canvasapi paginated
+       list is only requested once.
 
     Args:
-        key (str): User id to match on
         users (list of obj): List of users objects (students)
 
     Return:
-        (str): User name if found, 'Not Found' otherwise
+        (dict): {user id: user name}
     """
-    for user in users:
-        if key == user.id:
-            return user.name
+    return {user.id: user.name for user in users}
 
-    return "User Not Found"
+
+def _lookup_names(user_ids, user_names):
+    """Given a column of user ids and a dictionary of user names, returns a
+       categorical column of matching user names. Ids that are not found are
+       given the string 'User Not Found'
+
+    Args:
+        user_ids (Series): User ids to match on
+        user_names (dict): {user id: user name} as from _make_user_names
+
+    Return:
+        (Series): User names
+    """
+    return user_ids.map(user_names).fillna("User Not Found").astype("category")
 
 
 def _expand_criteria_to_columns(assessments_df, list_of_rubric_criteria, include_comment_data):
@@ -224,28 +351,43 @@ def _expand_criteria_to_columns(assessments_df, list_of_rubric_criteria, include
         assessments_df (DataFrame): DataFrame as described above.
     """
 
-    # For each row, step through row['data'] object. For every criteria,
-    # take the points that have been awarded and put into column with that
-    # criterion id (expanding that data cell into separate columns)
-
-    for index, row in assessments_df.iterrows():
-        for item in row["data"]:
-            points_error_flag = False
-            try:
-                value = item["points"]
-                if math.isnan(value):
-                    value = None
-            except Exception as e:
-                points_error_flag = True
-                value = None
-
-            col = item["criterion_id"]
-            assessments_df.at[index, col] = value
-        
-        if points_error_flag:
-            msg = "There is at least one row of data where a reviewing student did not enter valid data into the rubric. Please review the final output."
-            print_error(msg)
-            
+    # Flatten every row's 'data' list into one long table with a row per
+    # (assessment, criterion):
+    #   row | criterion_id | points | comments
+    #   0   | _1220        | 12.0   | "Well written"
+    criteria_df = pd.DataFrame(
+        [
+            (index, item["criterion_id"], item.get("points"), item.get("comments"))
+            for index, data in assessments_df["data"].items()
+            for item in data
+        ],
+        columns=["row", "criterion_id", "points", "comments"],
+        dtype=object,
+    )
+    criteria_df["row"] = criteria_df["row"].infer_objects()
+    # if a criterion appears twice in one assessment, the last entry wins
+    criteria_df = criteria_df.drop_duplicates(subset=["row", "criterion_id"], keep="last")
+
+    # NaN points are left blank; anything else that isn't a number (missing,
+    # None, text - even "4"...) is also left blank but reported as invalid
+    is_number = np.array(
+        [isinstance(value, (int, float)) for value in criteria_df["points"]], dtype=bool
+    )
+    num_invalid = int((~is_number).sum())
+    criteria_df["points"] = criteria_df["points"].where(is_number).astype("float32")
+
+    if num_invalid:
+        msg = f"There are {num_invalid} rubric entries where a reviewing student did not enter valid data into the rubric. Please review the final output."
+        print_error(msg)
+
+    # keep criteria columns in the order they first appear in the data
+    criterion_ids = criteria_df["criterion_id"].drop_duplicates().tolist()
+
+    points_df = criteria_df.pivot(index="row", columns="criterion_id", values="points")
+    points_df = points_df.reindex(columns=criterion_ids)
+    points_df.columns = list(criterion_ids)
+    assessments_df = assessments_df.join(points_df)
+
     # Make object matching criterion id (keys) to more descriptive column names
     # EX.
     # {'_1220': 'Quality of Writing (25.0)',
@@ -262,16 +404,10 @@ def _expand_criteria_to_columns(assessments_df, list_of_rubric_criteria, include
     assessments_df = assessments_df.rename(columns=new_names)
 
     if include_comment_data:
-        for index, row in assessments_df.iterrows():
-            for item in row["data"]:
-                try:
-                    comments = item["comments"]
-                except Exception as e:
-                    comments = None
-
-                comments_col = f"{item['criterion_id']} comment"
-                assessments_df.at[index, comments_col] = comments
-
+        comments_df = criteria_df.pivot(index="row", columns="criterion_id", values="comments")
+        comments_df = comments_df.reindex(columns=criterion_ids)
+        comments_df.columns = [f"{crit_id} comment" for crit_id in criterion_ids]
+        assessments_df = assessments_df.join(comments_df)
 
         new_names = {}
         for crit in list_of_rubric_criteria:
@@ -288,34 +424,24 @@ def _expand_criteria_to_columns(assessments_df, list_of_rubric_criteria, include
     return assessments_df
 
 
-def _make_students_df(paginated_list_of_students):
-    """Given a paginated list of canvasapi objects, iterate through each item,
-       take the JSON used to create that object and append to an output list.
-       Finally, convert that list to a DataFrame and return.
+def _make_students_df(students):
+    """Makes a table of the given students with the columns the overview uses,
+       built a column at a time.
 
     Args:
-        paginated_list_of_student (paginated list of type User -- canvasapi): List of User objects
+        students (list of User - canvasapi, or records read like them): Students
 
     Returns:
-        students_df (DataFrame): table containing each student in given course
+        students_df (DataFrame): id | name | sis_user_id, one row per student
     """
-    students = []
-    for student in paginated_list_of_students:
-        # replaced depreciated student.attributes sytax
-        attributes = {
-            "created_at": student.created_at,
-            "id": student.id,
-            #"integration_id": student.integration_id,
-            "login_id": student.login_id,
-            "name": student.name,
-            "short_name": student.short_name,
-            "sis_user_id": student.sis_user_id,
-            "sortable_name": student.sortable_name,
+    students = list(students)
+    return pd.DataFrame(
+        {
+            "id": [student.id for student in students],
+            "name": [student.name for student in students],
+            "sis_user_id": [getattr(student, "sis_user_id", None) for student in students],
         }
-        students.append(attributes)
-
-    students_df = pd.DataFrame(students)
-    return students_df
+    )
 
 
 def _make_assigned_completed_df(students_df, peer_reviews_df):
@@ -336,37 +462,29 @@ def _make_assigned_completed_df(students_df, peer_reviews_df):
     df = pruned_df.rename(
         columns={"id": "user_id", "name": "Name", "sis_user_id": "SID"}
     )
+    df["Name"] = df["Name"].astype("category")
+
+    # count reviews per assessor per workflow state in one pass:
+    #   assessor_id | assigned | completed
+    #   2907        | 1        | 2
+    state_counts = (
+        peer_reviews_df.groupby(["assessor_id", "workflow_state"])
+        .size()
+        .unstack(fill_value=0)
+    )
+    counts_df = pd.DataFrame(
+        {
+            "Num Assigned Peer Reviews": state_counts.sum(axis=1),
+            "Num Completed Peer Reviews": state_counts.get(
+                "completed", pd.Series(0, index=state_counts.index)
+            ),
+        }
+    )
 
-    df.insert(3, "Num Assigned Peer Reviews", None)
-    df.insert(4, "Num Completed Peer Reviews", None)
+    df = pd.merge(df, counts_df, how="left", left_on="user_id", right_index=True)
 
-    for index, row in df.iterrows():
-        lookup = _lookup_reviews(row["user_id"], peer_reviews_df)
-        df.at[index, "Num Assigned Peer Reviews"] = lookup["Assigned"]
-        df.at[index, "Num Completed Peer Reviews"] = lookup["Completed"]
+    # students with no reviews assigned get 0
+    count_columns = ["Num Assigned Peer Reviews", "Num Completed Peer Reviews"]
+    df[count_columns] = df[count_columns].fillna(0).astype("int32")
 
     return df
-
-
-def _lookup_reviews(uid, peer_reviews):
-    """Given a user id (uid), finds number of assigned and completed peer reviews
-       for that given student in the peer_reviews table. Returns dictionary with
-       'Assigned' and 'Completed' counts.
-
-    Args:
-        uid (int): User id to search for
-        peer_reviews (DataFrame): Peer reviews table
-
-    Returns:
-        Dictionary with two keys, 'Assigned' and 'Completed' with
-        number of assigned/completed peer reviews as values
-
-    """
-    assigned_subset = peer_reviews[peer_reviews["assessor_id"] == uid]
-    completed_subset = assigned_subset[assigned_subset["workflow_state"] == "completed"]
-
-    assigned = len(assigned_subset)
-    completed = len(completed_subset)
-
-    return {"Assigned": assigned, "Completed": completed}
-
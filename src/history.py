@@ -0,0 +1,577 @@
+"""
+PEER REVIEW SCRIPT: history
+
+Local history of report runs, kept if settings.HISTORY is on (it is off by
+default). Each run's raw data (the roster, the assigned peer reviews, the
+completed assessments with the points and comments given for each criterion,
+submission comments and grades) is added to a SQLite database
+(settings.HISTORY_PATH), keyed by course, assignment and the time of the run.
+Rows are only ever added: the database refuses updates and deletes, so every
+past run stays exactly as it was fetched.
+
+The tables are indexed by assessor, assessee and criterion, so questions
+across runs ("when was this review completed?", "how did this student's
+scores on a criterion change?") are a single query. Any past report can be
+rebuilt from the database alone, without asking Canvas.
+
+Usage:
+    python src/history.py list [--course 12345] [--assignment 678]
+    python src/history.py rebuild 42
+    python src/history.py review 12345 678 <assessor id> <assessee id>
+
+last edit:
+Oct 18, 2026
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from review_graph import _section_id
+import settings
+
+SCHEMA_VERSION = 1
+
+_MISSING = object()
+
+# scores and points are declared without a type so they are stored exactly as
+# Canvas sent them (an integer stays an integer, which changes how it's written)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    course_id INTEGER NOT NULL,
+    course_name TEXT,
+    assignment_id INTEGER NOT NULL,
+    assignment_name TEXT,
+    created_at TEXT NOT NULL,
+    include_comments INTEGER NOT NULL,
+    include_assignment_score INTEGER NOT NULL,
+    rubric_id INTEGER,
+    rubric TEXT,
+    UNIQUE (course_id, assignment_id, created_at)
+);
+
+CREATE TABLE IF NOT EXISTS sections (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    section_id INTEGER NOT NULL,
+    name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS students (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    user_id INTEGER NOT NULL,
+    name TEXT,
+    sortable_name TEXT,
+    short_name TEXT,
+    login_id TEXT,
+    sis_user_id TEXT,
+    created_at TEXT,
+    section_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS peer_reviews (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    assessor_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    asset_id INTEGER,
+    workflow_state TEXT
+);
+
+CREATE TABLE IF NOT EXISTS assessments (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    assessment INTEGER NOT NULL,
+    assessor_id INTEGER,
+    user_id INTEGER,
+    artifact_id INTEGER,
+    score,
+    PRIMARY KEY (run_id, assessment)
+);
+
+CREATE TABLE IF NOT EXISTS criterion_scores (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    assessment INTEGER NOT NULL,
+    criterion_id TEXT,
+    points,
+    points_valid INTEGER NOT NULL,
+    comments TEXT
+);
+
+CREATE TABLE IF NOT EXISTS submission_comments (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    user_id INTEGER NOT NULL,
+    author_id INTEGER,
+    comment TEXT
+);
+
+CREATE TABLE IF NOT EXISTS grades (
+    run_id INTEGER NOT NULL REFERENCES runs,
+    user_id INTEGER,
+    name TEXT,
+    score,
+    workflow_state TEXT
+);
+
+CREATE INDEX IF NOT EXISTS runs_by_assignment ON runs (course_id, assignment_id, created_at);
+CREATE INDEX IF NOT EXISTS peer_reviews_by_run ON peer_reviews (run_id);
+CREATE INDEX IF NOT EXISTS peer_reviews_by_assessor ON peer_reviews (assessor_id, user_id);
+CREATE INDEX IF NOT EXISTS peer_reviews_by_assessee ON peer_reviews (user_id);
+CREATE INDEX IF NOT EXISTS assessments_by_assessor ON assessments (assessor_id, user_id);
+CREATE INDEX IF NOT EXISTS assessments_by_assessee ON assessments (user_id);
+CREATE INDEX IF NOT EXISTS criterion_scores_by_assessment ON criterion_scores (run_id, assessment);
+CREATE INDEX IF NOT EXISTS criterion_scores_by_criterion ON criterion_scores (criterion_id);
+CREATE INDEX IF NOT EXISTS students_by_run ON students (run_id);
+CREATE INDEX IF NOT EXISTS sections_by_run ON sections (run_id);
+CREATE INDEX IF NOT EXISTS submission_comments_by_run ON submission_comments (run_id);
+CREATE INDEX IF NOT EXISTS grades_by_run ON grades (run_id);
+"""
+
+TABLES = [
+    "runs", "sections", "students", "peer_reviews", "assessments", "criterion_scores",
+    "submission_comments", "grades",
+]
+
+
+def save_run(course, assignment, students, assignment_data, assessments_json, sections,
+             include_comments, include_assignment_score):
+    """Adds one report run's raw data to the history.
+
+    Args:
+        course (object): Course object - canvasapi
+        assignment (object): Assignment object - canvasapi
+        students (list of User - canvasapi): Students enrolled in the course
+        assignment_data (dict): Fetched data for the assignment (see
+                                peer_review._fetch_report_data)
+        assessments_json (list of dict): The assignment's completed assessments
+        sections (dict): {section id: section name} (None if not fetched)
+        include_comments (bool): Whether the run includes comment data
+        include_assignment_score (bool): Whether the run includes grades
+
+    Returns:
+        run_id (int): Id of the run in the history
+    """
+    rubric = assignment_data.get("rubric")
+    peer_reviews_json = assignment_data["peer_reviews_json"]
+
+    # assessments name the submission (artifact) rather than its author
+    assessee_of = {review["asset_id"]: review["user_id"] for review in peer_reviews_json}
+
+    with _connect() as connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (course_id, course_name, assignment_id, assignment_name, created_at,"
+            " include_comments, include_assignment_score, rubric_id, rubric)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                course.id,
+                course.name,
+                assignment.id,
+                assignment.name,
+                datetime.now().isoformat(timespec="microseconds"),
+                include_comments,
+                include_assignment_score,
+                getattr(rubric, "id", None),
+                _rubric_json(rubric),
+            ),
+        )
+        run_id = cursor.lastrowid
+
+        connection.executemany(
+            "INSERT INTO sections VALUES (?, ?, ?)",
+            [(run_id, section_id, name) for section_id, name in (sections or {}).items()],
+        )
+        connection.executemany(
+            "INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    student.id,
+                    student.name,
+                    getattr(student, "sortable_name", None),
+                    getattr(student, "short_name", None),
+                    getattr(student, "login_id", None),
+                    getattr(student, "sis_user_id", None),
+                    getattr(student, "created_at", None),
+                    _section_id(student),
+                )
+                for student in students
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO peer_reviews VALUES (?, ?, ?, ?, ?)",
+            [
+                (run_id, review["assessor_id"], review["user_id"], review.get("asset_id"),
+                 review.get("workflow_state"))
+                for review in peer_reviews_json
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO assessments VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, number, assessment.get("assessor_id"),
+                 assessee_of.get(assessment.get("artifact_id")), assessment.get("artifact_id"),
+                 _number(assessment.get("score")))
+                for number, assessment in enumerate(assessments_json)
+            ],
+        )
+        connection.executemany(
+            "INSERT INTO criterion_scores VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, number, item.get("criterion_id"), *_points(item), item.get("comments"))
+                for number, assessment in enumerate(assessments_json)
+                for item in assessment.get("data") or []
+            ],
+        )
+
+        comments_df = assignment_data.get("comments_df")
+        if comments_df is not None:
+            connection.executemany(
+                "INSERT INTO submission_comments VALUES (?, ?, ?, ?)",
+                zip(
+                    [run_id] * len(comments_df),
+                    comments_df["user_id"].tolist(),
+                    [
+                        None if author_id is pd.NA else author_id
+                        for author_id in comments_df["author_id"].tolist()
+                    ],
+                    comments_df["comment"].tolist(),
+                ),
+            )
+
+        connection.executemany(
+            "INSERT INTO grades VALUES (?, ?, ?, ?, ?)",
+            [
+                (run_id, getattr(submission, "user_id", None),
+                 (getattr(submission, "user", None) or {}).get("name"),
+                 _number(getattr(submission, "score", None)),
+                 getattr(submission, "workflow_state", None))
+                for submission in assignment_data.get("grade_submissions") or []
+            ],
+        )
+
+    return run_id
+
+
+def list_runs(course_id=None, assignment_id=None):
+    """Lists the runs in the history, oldest first.
+
+    Args:
+        course_id (int): (optional) Only runs of this course
+        assignment_id (int): (optional) Only runs of this assignment
+
+    Returns:
+        runs (DataFrame): run_id | course_id | course_name | assignment_id |
+                          assignment_name | created_at | reviews | completed
+    """
+    query = (
+        "SELECT runs.run_id, course_id, course_name, assignment_id, assignment_name, created_at,"
+        " COUNT(peer_reviews.run_id) AS reviews,"
+        " COALESCE(SUM(peer_reviews.workflow_state = 'completed'), 0) AS completed"
+        " FROM runs LEFT JOIN peer_reviews ON peer_reviews.run_id = runs.run_id"
+        " WHERE (:course_id IS NULL OR course_id = :course_id)"
+        " AND (:assignment_id IS NULL OR assignment_id = :assignment_id)"
+        " GROUP BY runs.run_id ORDER BY created_at"
+    )
+    with _connect() as connection:
+        return pd.read_sql_query(
+            query, connection, params={"course_id": course_id, "assignment_id": assignment_id}
+        )
+
+
+def review_history(course_id, assignment_id, assessor_id, user_id):
+    """The state of one peer review in every run of an assignment, eg. to see
+       when it was completed.
+
+    Args:
+        course_id (int): Course of the assignment
+        assignment_id (int): The assignment
+        assessor_id (int): Canvas id of the assessor
+        user_id (int): Canvas id of the assessee
+
+    Returns:
+        history (DataFrame): run_id | created_at | workflow_state | score
+                             (state and score are blank in runs where the
+                             review wasn't assigned or completed)
+    """
+    query = (
+        "SELECT runs.run_id, runs.created_at, peer_reviews.workflow_state, assessments.score"
+        " FROM runs"
+        " LEFT JOIN peer_reviews ON peer_reviews.run_id = runs.run_id"
+        " AND peer_reviews.assessor_id = :assessor_id AND peer_reviews.user_id = :user_id"
+        " LEFT JOIN assessments ON assessments.run_id = runs.run_id"
+        " AND assessments.assessor_id = :assessor_id AND assessments.user_id = :user_id"
+        " WHERE course_id = :course_id AND assignment_id = :assignment_id"
+        " ORDER BY runs.created_at"
+    )
+    params = {
+        "course_id": course_id,
+        "assignment_id": assignment_id,
+        "assessor_id": assessor_id,
+        "user_id": user_id,
+    }
+    with _connect() as connection:
+        return pd.read_sql_query(query, connection, params=params)
+
+
+def load_run(run_id):
+    """Loads a run's data from the history in the form the report builders
+       take (see peer_review._make_report).
+
+    Args:
+        run_id (int): Id of the run
+
+    Returns:
+        run (dict): 'course', 'assignment', 'students', 'assignment_data',
+                    'sections', 'include_comments' and
+                    'include_assignment_score'
+    """
+    with _connect() as connection:
+        cursor = connection.cursor()
+        cursor.row_factory = sqlite3.Row
+        run = cursor.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if run is None:
+            raise KeyError(f"No run {run_id} in the history")
+
+        # plain tuples for the (large) per-run tables: much faster than Rows
+        def rows(table, columns, order="rowid"):
+            return connection.execute(
+                f"SELECT {columns} FROM {table} WHERE run_id = ? ORDER BY {order}", (run_id,)
+            ).fetchall()
+
+        sections = dict(rows("sections", "section_id, name"))
+        students = [
+            _student(*row)
+            for row in rows(
+                "students",
+                "user_id, name, sortable_name, short_name, login_id, sis_user_id, created_at, section_id",
+            )
+        ]
+        peer_reviews_json = [
+            {"user_id": user_id, "assessor_id": assessor_id, "asset_id": asset_id,
+             "workflow_state": workflow_state}
+            for assessor_id, user_id, asset_id, workflow_state in rows(
+                "peer_reviews", "assessor_id, user_id, asset_id, workflow_state"
+            )
+        ]
+
+        assessments = [
+            {"assessor_id": assessor_id, "artifact_id": artifact_id, "score": score, "data": []}
+            for assessor_id, artifact_id, score in rows(
+                "assessments", "assessor_id, artifact_id, score", "assessment"
+            )
+        ]
+        for number, criterion_id, points, points_valid, comments in rows(
+            "criterion_scores", "assessment, criterion_id, points, points_valid, comments"
+        ):
+            item = {"criterion_id": criterion_id, "comments": comments}
+            if points_valid:
+                item["points"] = points if points is not None else math.nan
+            assessments[number]["data"].append(item)
+
+        assignment_data = {"peer_reviews_json": peer_reviews_json, "rubric": None}
+        if run["rubric"] is not None:
+            rubric = json.loads(run["rubric"])
+            assignment_data["rubric"] = SimpleNamespace(
+                id=run["rubric_id"],
+                points_possible=rubric["points_possible"],
+                data=rubric["data"],
+                assessments=assessments,
+                # every stored assessment is the assignment's
+                associations=None,
+            )
+
+        if run["include_comments"]:
+            comments = rows("submission_comments", "user_id, author_id, comment")
+            assignment_data["comments_df"] = pd.DataFrame(
+                {
+                    "user_id": pd.array([row[0] for row in comments], dtype="int64"),
+                    "author_id": pd.array([row[1] for row in comments], dtype="Int64"),
+                    "comment": [row[2] for row in comments],
+                }
+            )
+
+        if run["include_assignment_score"]:
+            assignment_data["grade_submissions"] = [
+                SimpleNamespace(
+                    user_id=user_id, user={"name": name}, score=score, workflow_state=workflow_state
+                )
+                for user_id, name, score, workflow_state in rows(
+                    "grades", "user_id, name, score, workflow_state"
+                )
+            ]
+
+    return {
+        "course": SimpleNamespace(id=run["course_id"], name=run["course_name"]),
+        "assignment": SimpleNamespace(id=run["assignment_id"], name=run["assignment_name"]),
+        "students": students,
+        "assignment_data": assignment_data,
+        "sections": sections,
+        "include_comments": bool(run["include_comments"]),
+        "include_assignment_score": bool(run["include_assignment_score"]),
+    }
+
+
+def rebuild(run_id):
+    """Writes the output tables of a past run again, from the history alone.
+
+    Args:
+        run_id (int): Id of the run
+
+    Returns:
+        output_paths (list of string): Paths of the files written
+    """
+    # imported here: peer_review imports this module to save runs
+    from peer_review import _make_report
+
+    run = load_run(run_id)
+    return _make_report(
+        run["course"],
+        run["assignment"],
+        run["students"],
+        run["assignment_data"],
+        run["include_comments"],
+        run["include_assignment_score"],
+        sections=run["sections"],
+        save_history=False,
+    )
+
+
+def _connect():
+    """Opens the history database, creating it if needed. Use as a context
+       manager: the changes made in the block are committed together.
+    """
+    os.makedirs(os.path.dirname(settings.HISTORY_PATH), exist_ok=True)
+    # several reports (threads of the worker, processes of a sweep) may add
+    # runs at once: wait for each other rather than fail
+    connection = sqlite3.connect(settings.HISTORY_PATH, timeout=60)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        with connection:
+            connection.executescript(SCHEMA + _append_only_triggers())
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.execute("PRAGMA journal_mode = WAL")
+    return _Connection(connection)
+
+
+class _Connection:
+    """sqlite3 connection that commits (or rolls back) and closes at the end
+       of a with block
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+        return False
+
+
+def _append_only_triggers():
+    return "".join(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_no_update BEFORE UPDATE ON {table}
+        BEGIN SELECT RAISE(ABORT, 'the history is append-only'); END;
+        CREATE TRIGGER IF NOT EXISTS {table}_no_delete BEFORE DELETE ON {table}
+        BEGIN SELECT RAISE(ABORT, 'the history is append-only'); END;
+        """
+        for table in TABLES
+    )
+
+
+def _student(user_id, name, sortable_name, short_name, login_id, sis_user_id, created_at, section_id):
+    enrollments = []
+    if section_id is not None:
+        enrollments = [{"type": "StudentEnrollment", "course_section_id": section_id}]
+    return SimpleNamespace(
+        id=user_id,
+        name=name,
+        sortable_name=sortable_name,
+        short_name=short_name,
+        login_id=login_id,
+        sis_user_id=sis_user_id,
+        created_at=created_at,
+        enrollments=enrollments,
+    )
+
+
+def _rubric_json(rubric):
+    if rubric is None:
+        return None
+    return json.dumps({"points_possible": rubric.points_possible, "data": rubric.data})
+
+
+def _points(item):
+    """A criterion's points as stored, and whether they are valid: a number
+       (NaN included, stored as NULL) or text of one. Anything else is reported
+       as invalid when the report is built (see
+       dataframe_builder._expand_criteria_to_columns).
+    """
+    points = item.get("points", _MISSING)
+    # almost always a float
+    if type(points) is float:
+        return (points if points == points else None), True
+    if points is _MISSING:
+        return None, False
+    if isinstance(points, str):
+        try:
+            points = float(points)
+        except ValueError:
+            return None, False
+        if points != points:
+            return None, False
+    if isinstance(points, (int, float)) and not isinstance(points, bool):
+        return _number(points), True
+    return None, False
+
+
+def _number(value):
+    """A number as stored (sqlite stores NaN as NULL)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return None if value != value else value
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query and rebuild past peer review reports.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list the runs in the history")
+    list_parser.add_argument("--course", type=int)
+    list_parser.add_argument("--assignment", type=int)
+
+    rebuild_parser = commands.add_parser("rebuild", help="write a past run's tables again")
+    rebuild_parser.add_argument("run_id", type=int)
+
+    review_parser = commands.add_parser("review", help="one review's state in every run")
+    review_parser.add_argument("course", type=int)
+    review_parser.add_argument("assignment", type=int)
+    review_parser.add_argument("assessor", type=int)
+    review_parser.add_argument("assessee", type=int)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print(list_runs(args.course, args.assignment).to_string(index=False))
+    elif args.command == "review":
+        print(review_history(args.course, args.assignment, args.assessor, args.assessee).to_string(index=False))
+    else:
+        try:
+            output_paths = rebuild(args.run_id)
+        except KeyError as e:
+            print(e.args[0])
+            sys.exit(1)
+        for path in output_paths:
+            print(path)
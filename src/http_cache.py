@@ -0,0 +1,260 @@
+"""
+PEER REVIEW SCRIPT: http_cache
+
+Persistent on-disk cache for Canvas API GET responses. Responses are kept in
+a SQLite file under the project directory, keyed by request URL (which
+includes the query parameters) and the token used. How long a response is
+served without asking Canvas again depends on the endpoint (see
+settings.CACHE_TTLS). After that, if Canvas sent an ETag or Last-Modified
+header, the response is revalidated with a conditional request and only
+downloaded again if it changed. The least recently used responses are evicted
+once the cache grows past its size limit.
+
+last edit:
+Oct 18, 2026
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# headers describing how the body was sent, which don't apply to the stored
+# (already decoded) body
+_UNCACHED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ResponseCache:
+    """SQLite backed store of HTTP responses with LRU eviction.
+
+    Args:
+        directory (string): Directory to keep the cache file in
+        max_bytes (int): Total size of response bodies to keep
+        ttls (list of (string, int)): (url regex, seconds) pairs, first match
+                                      wins. Urls matching none get 0 seconds
+                                      (always revalidate)
+    """
+
+    def __init__(self, directory, max_bytes, ttls=()):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "responses.sqlite")
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                stored_at REAL,
+                accessed_at REAL
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+        )
+        self._connection.commit()
+
+    def ttl(self, url):
+        """Returns the number of seconds a response for url stays fresh"""
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return 0
+
+    def get(self, key):
+        """Returns the stored entry for key as a dict (url, status, headers,
+        body, stored_at) or None if there isn't one. Marks it as recently used.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._connection.commit()
+
+        url, status, headers, body, stored_at = row
+        return {
+            "url": url,
+            "status": status,
+            "headers": json.loads(headers),
+            "body": body,
+            "stored_at": stored_at,
+        }
+
+    def put(self, key, url, status, headers, body):
+        """Stores a response under key, then evicts least recently used
+        responses until the cache fits in max_bytes.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(dict(headers)), body, len(body), now, now),
+            )
+            self._evict()
+            self._connection.commit()
+
+    def touch(self, key):
+        """Marks a stored response as fresh again (after a 304 Not Modified)"""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+            self._connection.commit()
+
+    def clear(self):
+        """Removes every stored response"""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def _evict(self):
+        (total,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+
+        rows = self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evict = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evict)
+
+
+class CachingAdapter(BaseAdapter):
+    """Transport adapter that answers GET requests from a ResponseCache when it
+    can and passes everything else on to an inner adapter (which does the
+    actual network I/O).
+
+    Args:
+        inner (BaseAdapter): Adapter used for requests that go to the network
+        cache (ResponseCache): Where responses are stored
+    """
+
+    def __init__(self, inner, cache):
+        super().__init__()
+        self.inner = inner
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return self.inner.send(request, **kwargs)
+
+        key = _cache_key(request)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            age = time.time() - entry["stored_at"]
+            if age < self.cache.ttl(request.url):
+                return _build_response(request, entry)
+
+            # stale - ask Canvas whether it has changed
+            headers = CaseInsensitiveDict(entry["headers"])
+            if "ETag" in headers:
+                request.headers["If-None-Match"] = headers["ETag"]
+            if "Last-Modified" in headers:
+                request.headers["If-Modified-Since"] = headers["Last-Modified"]
+
+        response = self.inner.send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(key)
+            return _build_response(request, entry)
+
+        if response.status_code == 200:
+            headers = {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in _UNCACHED_HEADERS
+            }
+            if kwargs.get("stream"):
+                # the caller reads a streamed body: store it once they have
+                # read all of it
+                response.raw = _TeeReader(
+                    response.raw,
+                    lambda body: self.cache.put(key, request.url, 200, headers, body),
+                )
+            else:
+                self.cache.put(key, request.url, response.status_code, headers, response.content)
+
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class _TeeReader:
+    """Wraps the raw body of a streamed response, keeping a copy of what is
+    read from it. Once the whole body has been read the copy is passed to
+    on_complete; a body that is only read in part is never stored.
+
+    Args:
+        raw (HTTPResponse - urllib3): The response's raw body
+        on_complete (function): Called with the (decoded) body
+    """
+
+    def __init__(self, raw, on_complete):
+        self._raw = raw
+        self._on_complete = on_complete
+        self._body = bytearray()
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._body += chunk
+            yield chunk
+        body, self._body = bytes(self._body), bytearray()
+        self._on_complete(body)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+def _cache_key(request):
+    """Key identifying a request: its method, full url (including query string)
+    and a hash of the token it was made with, so different users never share
+    responses.
+    """
+    token = request.headers.get("Authorization", "")
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    return hashlib.sha256(f"{request.method} {request.url} {token_hash}".encode()).hexdigest()
+
+
+def _build_response(request, entry):
+    """Builds a requests.Response from a stored cache entry"""
+    response = Response()
+    response.status_code = entry["status"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response._content = entry["body"]
+    response._content_consumed = True
+    response.url = entry["url"]
+    response.request = request
+    response.encoding = "utf-8"
+    response.reason = "OK"
+    response.from_cache = True
+    return response
@@ -0,0 +1,63 @@
+"""
+PEER REVIEW SCRIPT: http_session
+
+Configures the HTTP session shared by every canvasapi object created from
+one Canvas client.
+
+last edit:
+Oct 18, 2026
+"""
+
+from requests.adapters import HTTPAdapter
+
+from http_cache import CachingAdapter
+from throttle import ThrottledAdapter
+
+
+def get_session(canvas):
+    """Returns the requests.Session used by the given Canvas client. Every
+       object (course, assignment, rubric...) created from this client makes
+       its requests through this one keep-alive session.
+
+    Args:
+        canvas (Canvas - canvasapi): Canvas client
+
+    Returns:
+        session (requests.Session): The client's session
+    """
+    return canvas._Canvas__requester._session
+
+
+def configure_session(canvas, pool_size, cache=None, budget=None, max_retries_throttled=6):
+    """Sizes the connection pool of the Canvas client's session so that
+       pool_size requests can be in flight at once without opening (and
+       throwing away) extra connections. If a cache is given, GET requests
+       are answered from / stored in it. If a budget is given, requests that
+       reach Canvas (cache hits don't) are scheduled by it and rate limited
+       requests are retried.
+
+    Args:
+        canvas (Canvas - canvasapi): Canvas client
+        pool_size (int): Number of concurrent requests to keep connections for
+        cache (ResponseCache): (optional) On-disk response cache
+        budget (RequestBudget): (optional) Shared rate limit budget
+        max_retries_throttled (int): Retries for rate limited requests
+
+    Returns:
+        session (requests.Session): The configured session
+    """
+    session = get_session(canvas)
+    if budget is not None:
+        adapter = ThrottledAdapter(
+            budget,
+            max_retries_throttled=max_retries_throttled,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+        )
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    if cache is not None:
+        adapter = CachingAdapter(adapter, cache)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -11,6 +11,9 @@ Nov 29, 2022
 import getpass
 import settings
 from util import shut_down
+from http_session import configure_session
+from http_cache import ResponseCache
+from throttle import shared_budget
 from canvasapi import Canvas
 from termcolor import cprint
 import os
@@ -20,26 +23,42 @@ load_dotenv()
 URL = os.getenv('API_INSTANCE')
 KEY = os.getenv('API_TOKEN')
 
-def get_user_inputs():
-    """Prompt user for required inputs. Queries Canvas API throughout to check for
-    access and validity errors. Errors stop execution and print to screen.
+def make_canvas():
+    """Creates the Canvas client for the url and token in .env, with its session
+    configured for concurrent requests, (if enabled) the response cache and
+    (if enabled) rate limit aware scheduling shared by every client in the
+    process.
 
     Returns:
-        Dictionary containing inputs
+        canvas (Canvas - canvasapi): Canvas client
     """
+    canvas = Canvas(URL, KEY)
 
-    # prompt user for url and token
-    url = URL
-    token = KEY
+    cache = None
+    if settings.HTTP_CACHE:
+        cache = ResponseCache(settings.CACHE_DIR, settings.CACHE_MAX_BYTES, settings.CACHE_TTLS)
+    budget = None
+    if settings.THROTTLE:
+        budget = shared_budget(settings.MAX_WORKERS)
+    configure_session(canvas, settings.MAX_WORKERS, cache, budget, settings.THROTTLE_MAX_RETRIES)
 
-    # Canvas object to provide access to Canvas API
-    canvas = Canvas(url, token)
+    return canvas
 
-    # get user object
+
+def get_current_user(canvas):
+    """Gets the user the token belongs to, which also checks that the token and
+    instance url are valid. Shuts down if they aren't.
+
+    Args:
+        canvas (Canvas - canvasapi): Canvas client
+
+    Returns:
+        user (User - canvasapi): holder of the token
+    """
     try:
         user = canvas.get_user("self")
         cprint(f"\nHello, {user.name}!", "green")
-        # shut_down('TEMP KILL SWITCH')
+        return user
     except Exception as e:
         shut_down(
             """
@@ -48,6 +67,21 @@ def get_user_inputs():
             """
         )
 
+
+def get_user_inputs():
+    """Prompt user for required inputs. Queries Canvas API throughout to check for
+    access and validity errors. Errors stop execution and print to screen.
+
+    Returns:
+        Dictionary containing inputs
+    """
+
+    # Canvas object to provide access to Canvas API
+    canvas = make_canvas()
+
+    # get user object
+    user = get_current_user(canvas)
+
     # get course object
     try:
         course_number = input("Course Number: ")
@@ -55,13 +89,18 @@ def get_user_inputs():
     except Exception as e:
         shut_down("ERROR: Course not found. Please check course number.")
 
-    # get assignment object
+    # get assignment object(s)
     try:
-        assignment_number = input("Assignment Number: ")
-        assignment = course.get_assignment(assignment_number)
+        assignment_number = input(
+            "Assignment Number (separate several with commas, or 'all' for every peer review assignment): "
+        )
+        assignments = get_assignments(course, assignment_number)
     except Exception as e:
         shut_down("ERROR: Assignment not found. Please check assignment number.")
 
+    if not assignments:
+        shut_down("ERROR: Course has no assignments with peer reviews enabled.")
+
     # get whether to include assignment grades
     try:
         include_assignment_score = input(
@@ -90,12 +129,16 @@ def get_user_inputs():
 
     # prompt user for confirmation
     _prompt_for_confirmation(
-        user.name, course.name, assignment.name, include_assignment_score, include_comment_data
+        user.name,
+        course.name,
+        ", ".join(assignment.name for assignment in assignments),
+        include_assignment_score,
+        include_comment_data,
     )
 
     # set course and assignment objects to global variables
     settings.COURSE = course
-    settings.ASSIGNMENT = assignment
+    settings.ASSIGNMENTS = assignments
     settings.INCLUDE_ASSIGNMENT_SCORE = include_assignment_score
     settings.INCLUDE_COMMENTS = include_comment_data
 
@@ -106,6 +149,33 @@ def get_user_inputs():
     }
 
 
+def get_assignments(course, assignment_number):
+    """Gets the assignment(s) described by the user's input. Input is either a
+    single assignment number, several separated by commas, or 'all' to get every
+    assignment in the course that has peer reviews enabled.
+
+    Args:
+        course (object): Course object - canvasapi
+        assignment_number (string): user input
+
+    Returns:
+        assignments (list of Assignment - canvasapi): the requested assignments
+
+    """
+    if assignment_number.strip().lower() == "all":
+        return [
+            assignment
+            for assignment in course.get_assignments()
+            if getattr(assignment, "peer_reviews", False)
+        ]
+
+    return [
+        course.get_assignment(number.strip())
+        for number in assignment_number.split(",")
+        if number.strip()
+    ]
+
+
 def _prompt_for_confirmation(
     user_name, course_name, assignment_name, include_assignment_score, include_comment_data
 ):
@@ -115,7 +185,7 @@ def _prompt_for_confirmation(
     Args:
         user_name (string): name of user (aka. holder of token)
         course_name (string): name of course returned from Canvas
-        assignment_name (string): name of assignment returned from Canvas
+        assignment_name (string): name of assignment(s) returned from Canvas
         include_assignment_score (boolean): whether to include the assignment score (non-peer-review)
 
     Returns:
@@ -125,7 +195,7 @@ def _prompt_for_confirmation(
     cprint("\nConfirmation:", "blue")
     print(f"USER:  {user_name}")
     print(f"COURSE:  {course_name}")
-    print(f"ASSIGNMENT:  {assignment_name}")
+    print(f"ASSIGNMENT(S):  {assignment_name}")
     print(f"INCLUDE ASSIGNMENT SCORE: {include_assignment_score}")
     print(f"INCLUDE COMMENT DATA: {include_comment_data}")
     print("\n")
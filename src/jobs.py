@@ -0,0 +1,153 @@
+"""
+PEER REVIEW SCRIPT: jobs
+
+Headless entry point. Runs every report described in a jobs file without any
+prompts, so it can be run from cron. The token is checked once and every job
+runs over the same Canvas client. A job that fails is reported and the
+remaining jobs still run.
+
+Usage:
+    python src/jobs.py jobs.json
+
+jobs.json:
+    {
+        "jobs": [
+            {
+                "course": 12345,
+                "assignments": [678, 679],      (or "all")
+                "include_comments": true,       (optional, default false)
+                "include_assignment_score": false  (optional, default false)
+            }
+        ]
+    }
+
+last edit:
+Oct 18, 2026
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from termcolor import cprint
+
+from interface import make_canvas, get_current_user, get_assignments
+from peer_review import run_report
+from util import shut_down, print_error
+import settings
+
+
+def main(jobs_path):
+    """Runs every job in the jobs file and prints a summary.
+
+    Args:
+        jobs_path (string): path to the jobs file
+
+    Returns:
+        results (list of dict): one per job with 'job', 'success', 'seconds'
+                                and (if it failed) 'error'
+    """
+    jobs = _load_jobs(jobs_path)
+
+    canvas = make_canvas()
+    get_current_user(canvas)
+
+    results = []
+    for job in jobs:
+        results.append(run_job(canvas, job))
+
+    _print_summary(results)
+    return results
+
+
+def run_job(canvas, job):
+    """Runs one job, catching any failure (including shut_down) so the caller
+       can carry on with the next one. Everything the job needs is passed to
+       run_report, nothing is kept in settings, so jobs can run concurrently
+       (see worker.py).
+
+    Args:
+        canvas (Canvas - canvasapi): Canvas client shared by all jobs
+        job (dict): job from the jobs file
+
+    Returns:
+        result (dict): 'job', 'success', 'seconds' and either 'outputs' (paths
+                       of the files written) or 'error'
+    """
+    start = time.perf_counter()
+    label = f"course {job['course']}, assignments {job.get('assignments', 'all')}"
+    cprint(f"\nRunning job: {label}", "blue")
+
+    try:
+        course = canvas.get_course(job["course"])
+
+        assignments = job.get("assignments", "all")
+        if isinstance(assignments, list):
+            assignments = ",".join(str(assignment) for assignment in assignments)
+        assignments = get_assignments(course, str(assignments))
+        if not assignments:
+            raise ValueError("Course has no assignments with peer reviews enabled.")
+
+        outputs = run_report(
+            course,
+            assignments,
+            job.get("include_comments", False),
+            job.get("include_assignment_score", False),
+        )
+    except (Exception, SystemExit) as e:
+        if isinstance(e, SystemExit):
+            # shut_down has already printed its message before exiting
+            error = "shut down, see message above"
+        else:
+            error = str(e) or type(e).__name__
+            print_error(f"ERROR: {error}")
+        return {
+            "job": label,
+            "success": False,
+            "seconds": time.perf_counter() - start,
+            "error": error,
+        }
+
+    return {
+        "job": label,
+        "success": True,
+        "seconds": time.perf_counter() - start,
+        "outputs": outputs,
+    }
+
+
+def _load_jobs(jobs_path):
+    """Reads and checks the jobs file. Shuts down if it can't be used."""
+    try:
+        with open(jobs_path) as f:
+            jobs = json.load(f)["jobs"]
+    except (OSError, ValueError, KeyError) as e:
+        shut_down(f"ERROR: could not read jobs file {jobs_path} ({e}).")
+
+    for job in jobs:
+        if "course" not in job:
+            shut_down(f"ERROR: every job needs a course ({job}).")
+
+    return jobs
+
+
+def _print_summary(results):
+    cprint("\nSummary:", "blue")
+    for result in results:
+        status = "OK" if result["success"] else f"FAILED ({result['error']})"
+        colour = "green" if result["success"] else "red"
+        cprint(f"{result['seconds']:8.1f}s  {result['job']}: {status}", colour)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run peer review reports without prompts.")
+    parser.add_argument("jobs_path", help="path to the jobs file (JSON)")
+    parser.add_argument("--history", action="store_true", help="add the runs to the history database")
+    args = parser.parse_args()
+
+    if args.history:
+        settings.HISTORY = True
+
+    results = main(args.jobs_path)
+    sys.exit(0 if all(result["success"] for result in results) else 1)
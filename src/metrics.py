@@ -0,0 +1,345 @@
+"""
+PEER REVIEW SCRIPT: metrics
+
+Per-stage instrumentation of a report run. Each stage (eg. fetching the
+students, building the overview table) records its wall time, the HTTP
+requests it made (with how many were pages of a paginated list, how many were
+answered by the response cache and the bytes received), the rows it produced
+and the process' peak memory use (max RSS) when it finished. The metrics are
+written as JSON next to the report's output tables.
+
+Requests are attributed to the stage running in the thread that made them, so
+stages fetched concurrently are still counted separately. Max RSS never goes
+down, so it only shows which stage pushed memory use up. For the peak
+allocated within each stage, memory can be traced with tracemalloc instead,
+but that slows Python down several times over; for stages that run at the
+same time as others (the fetch stages) the traced peak is that of everything
+running.
+
+A Recorder can also print a live progress line (pages, throughput and an ETA
+from the Link headers) while paginating. A disabled Recorder does nothing:
+no hook is installed on the session and stages cost one function call.
+
+last edit:
+Oct 18, 2026
+"""
+
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# stage running in the current thread, for the session response hook
+_local = threading.local()
+
+# held while a session's response hooks are changed (reports running at once
+# in the worker share one session)
+_hooks_lock = threading.Lock()
+
+# seconds between progress line updates
+PROGRESS_INTERVAL = 0.5
+
+
+class Stage:
+    """Measurements for one stage. Set rows before the stage ends."""
+
+    def __init__(self, recorder, name, assignment_id):
+        self.recorder = recorder
+        self.name = name
+        self.assignment_id = assignment_id
+        self.seconds = None
+        self.requests = 0
+        self.pages = 0
+        self.cached = 0
+        self.bytes = 0
+        self.rows = None
+        self.peak_bytes = None
+        self.max_rss_bytes = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, "stage", None)
+        _local.stage = self
+        self.recorder._stage_started()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        _local.stage = self._previous
+        self.peak_bytes = self.recorder._stage_finished()
+        self.max_rss_bytes = _max_rss_bytes()
+        self.recorder._add(self)
+        return False
+
+    def as_dict(self):
+        return {
+            "stage": self.name,
+            "assignment_id": self.assignment_id,
+            "seconds": round(self.seconds, 4),
+            "requests": self.requests,
+            "pages": self.pages,
+            "cached": self.cached,
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "peak_bytes": self.peak_bytes,
+            "max_rss_bytes": self.max_rss_bytes,
+        }
+
+
+class _NullStage:
+    """Stage of a disabled Recorder: measures nothing"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Recorder:
+    """Collects the stages of one report run.
+
+    Args:
+        metrics (bool): Whether to record metrics (written by write)
+        progress (bool): Whether to print a live progress line while fetching
+        trace_memory (bool): Whether to trace the peak memory allocated in each
+                             stage with tracemalloc (slow)
+    """
+
+    def __init__(self, metrics=False, progress=False, trace_memory=False):
+        self.metrics = metrics
+        self.progress = progress
+        self.enabled = metrics or progress
+        self.stages = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._created_at = datetime.now().isoformat(timespec="seconds")
+        self._active = 0
+        self._traced = False
+        self._session = None
+
+        # progress line state
+        self._pages = 0
+        self._requests = 0
+        self._bytes = 0
+        self._paginations = {}
+        self._printed_at = 0.0
+        self._printed = False
+
+        if self.metrics and trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._traced = True
+
+    def attach(self, session):
+        """Installs the response hook that counts requests on the session (a
+           requests.Session shared by the Canvas client), until detach is
+           called. Does nothing if the recorder is disabled or already
+           attached.
+        """
+        if not self.enabled or self._session is not None:
+            return
+        self._session = session
+        with _hooks_lock:
+            # a new list rather than appending, so a request being prepared
+            # in another thread never iterates a list that is changing
+            session.hooks["response"] = session.hooks["response"] + [self._on_response]
+
+    def detach(self):
+        """Removes the response hook installed by attach (if any)"""
+        if self._session is None:
+            return
+        with _hooks_lock:
+            self._session.hooks["response"] = [
+                hook for hook in self._session.hooks["response"] if hook != self._on_response
+            ]
+        self._session = None
+
+    def stage(self, name, assignment_id=None):
+        """Context manager measuring one stage:
+
+            with recorder.stage("students") as stage:
+                students = _get_students(course)
+                stage.rows = len(students)
+
+        Args:
+            name (string): Stage name
+            assignment_id (int): (optional) Assignment the stage belongs to,
+                                 None for stages shared by every assignment
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return Stage(self, name, assignment_id)
+
+    def timed(self, name, function, *args, assignment_id=None):
+        """Calls function(*args) as a stage and returns what it returns. The
+           stage's rows are the length of the result (if it is a list or
+           table).
+        """
+        with self.stage(name, assignment_id) as stage:
+            result = function(*args)
+            if hasattr(result, "__len__") and not isinstance(result, dict):
+                stage.rows = len(result)
+        return result
+
+    def end_progress(self):
+        """Ends the progress line (if one was printed)"""
+        if self._printed:
+            sys.stderr.write("\n")
+            sys.stderr.flush()
+            self._printed = False
+
+    def write(self, directory, file_name, course_id, assignment_id):
+        """Writes the shared stages and those of the given assignment as JSON.
+           Does nothing unless metrics are being recorded.
+
+        Args:
+            directory (string): Directory to write to (created if needed)
+            file_name (string): Name of the file (without extension)
+            course_id (int): Course of the report
+            assignment_id (int): Assignment of the report
+        """
+        if not self.metrics:
+            return
+
+        with self._lock:
+            stages = [
+                stage.as_dict()
+                for stage in self.stages
+                if stage.assignment_id in (None, assignment_id)
+            ]
+
+        totals = {
+            key: sum(stage[key] for stage in stages)
+            for key in ("requests", "pages", "cached", "bytes")
+        }
+        peaks = [stage["peak_bytes"] for stage in stages if stage["peak_bytes"] is not None]
+        totals["peak_bytes"] = max(peaks, default=None)
+        totals["max_rss_bytes"] = _max_rss_bytes()
+
+        report = {
+            "created_at": self._created_at,
+            "course_id": course_id,
+            "assignment_id": assignment_id,
+            "seconds": round(time.perf_counter() - self._start, 4),
+            "totals": totals,
+            "stages": stages,
+        }
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{file_name}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+    def close(self):
+        """Stops memory tracing if this recorder started it"""
+        self.end_progress()
+        if self._traced:
+            tracemalloc.stop()
+            self._traced = False
+
+    def _stage_started(self):
+        with self._lock:
+            # only reset the peak when nothing else is being measured, so the
+            # peak of a stage always covers the whole stage
+            if self._traced and self._active == 0:
+                tracemalloc.reset_peak()
+            self._active += 1
+
+    def _stage_finished(self):
+        with self._lock:
+            self._active -= 1
+            if self._traced:
+                return tracemalloc.get_traced_memory()[1]
+            return None
+
+    def _add(self, stage):
+        with self._lock:
+            self.stages.append(stage)
+
+    def _on_response(self, response, *args, **kwargs):
+        """requests response hook: counts the response against the stage of
+           this recorder running in this thread (if any).
+        """
+        stage = getattr(_local, "stage", None)
+        if stage is not None and stage.recorder is self:
+            self._count(stage, response, kwargs.get("stream", False))
+
+    def _count(self, stage, response, streamed):
+        if streamed:
+            # reading a streamed body here would defeat the point
+            size = int(response.headers.get("Content-Length", 0))
+        else:
+            size = len(response.content)
+        paginated = bool(response.links)
+        with self._lock:
+            stage.requests += 1
+            stage.bytes += size
+            stage.pages += paginated
+            stage.cached += getattr(response, "from_cache", False)
+
+            if self.progress:
+                self._requests += 1
+                self._bytes += size
+                if paginated:
+                    self._pages += 1
+                    self._track_pagination(stage, response)
+                self._print_progress()
+
+    def _track_pagination(self, stage, response):
+        """Remembers the current and last page of the pagination this response
+           belongs to (from its Link header), for the ETA.
+        """
+        current = _page_number(response.url)
+        last = _page_number(response.links.get("last", {}).get("url"))
+        if current is None or last is None:
+            return
+        key = (id(stage), urlsplit(response.url).path)
+        self._paginations[key] = (current, last)
+
+    def _print_progress(self):
+        now = time.perf_counter()
+        if now - self._printed_at < PROGRESS_INTERVAL:
+            return
+        self._printed_at = now
+
+        elapsed = now - self._start
+        rate = self._pages / elapsed if elapsed else 0.0
+        remaining = sum(max(last - current, 0) for current, last in self._paginations.values())
+        eta = f"{remaining / rate:.0f}s" if rate and remaining else "-"
+
+        sys.stderr.write(
+            f"\r{self._pages} pages, {self._requests} requests, "
+            f"{self._bytes / 2**20:.1f} MiB ({rate:.1f} pages/s, "
+            f"{self._bytes / 2**20 / elapsed:.2f} MiB/s), ETA {eta}    "
+        )
+        sys.stderr.flush()
+        self._printed = True
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _page_number(url):
+    if not url:
+        return None
+    try:
+        return int(parse_qs(urlsplit(url).query)["page"][0])
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,418 @@
+"""
+PEER REVIEW SCRIPT: pagination
+
+Checkpointed, resumable pagination. Large lists (submissions, peer reviews,
+the roster) take many pages, and a single failed page used to lose every page
+before it. Pages are fetched here one at a time and each completed page is
+appended to a checkpoint file on disk, with the link to the next page (the
+pagination cursor). If fetching fails part way through, the next run of the
+same request reads the pages already fetched from the checkpoint and carries
+on from the next page.
+
+Transient failures (connection errors, timeouts, 5xx and 429 responses) are
+retried with full jitter exponential backoff before giving up. A checkpoint is
+deleted once its list has been fetched completely, and ignored once it is
+older than settings.CHECKPOINT_MAX_AGE (a few minutes by default).
+
+Canvas paginates by page number, so if items were added to or removed from
+the list between the failed run and the resumed one, items shift between
+pages. Items of the fresh pages already read from the checkpoint (same id) are
+dropped, and a warning is printed; an item that shifted back onto an
+already fetched page is missed, which is why checkpoints are kept only
+briefly. Checkpointing is off unless settings.CHECKPOINT is on.
+Checkpoints left behind by runs that were never resumed are deleted the first
+time a checkpoint is opened in a process, once they are that old.
+
+Checkpoint files hold the raw JSON of each page, one page per line, so a
+write cut short only loses that page. Pages are flushed to the file but not
+synced to disk: a crash of the whole machine can lose the last pages, which
+are then fetched again.
+
+Items come either as canvasapi objects (iter_items) or, for the large lists
+the reports read, as records taken straight from the JSON with only the
+fields the tables use (iter_records), which skips building an object per item.
+
+last edit:
+Oct 18, 2026
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import requests
+from canvasapi.exceptions import CanvasException
+
+from util import print_error
+import settings
+
+# checkpoints being written in this process (two reports fetching the same
+# list at once, eg. in the worker, don't share a file)
+_active = set()
+_active_lock = threading.Lock()
+
+# checkpoint directories already cleared of stale checkpoints in this process
+_swept = set()
+
+
+def iter_items(paginated_list):
+    """Yields the items of a canvasapi paginated list, a page at a time,
+       checkpointing each page (see module docstring). Nothing is requested
+       until the first item is asked for.
+
+    Args:
+        paginated_list (PaginatedList - canvasapi): List to fetch (must not
+                                                    have been iterated yet)
+
+    Yields:
+        Items of the list (canvasapi objects of the list's type)
+    """
+    for page in iter_pages(paginated_list):
+        yield from page
+
+
+def iter_records(paginated_list, fields, as_objects=False):
+    """Like iter_items, but yields the items as they are in the JSON, reduced
+       to the given fields, rather than as canvasapi objects. The pages are
+       requested straight from the session: canvasapi neither builds an
+       object per item (parsing every date-like value on the way) nor
+       formats each request and response for its debug log. Attributes
+       canvasapi adds to the objects it builds (eg. course_id) aren't
+       included.
+
+    Args:
+        paginated_list (PaginatedList - canvasapi): List to fetch
+        fields (dict): {field: None to keep its value as is, or a tuple of
+                       the keys to keep of a nested object (or of each
+                       object in a nested list)}. Missing fields are None
+        as_objects (bool): Whether to yield each item as a SimpleNamespace
+                           (read like a canvasapi object) instead of a dict
+
+    Yields:
+        Items of the list (dict or SimpleNamespace)
+    """
+    for page in iter_pages(paginated_list, fields):
+        if as_objects:
+            yield from (SimpleNamespace(**record) for record in page)
+        else:
+            yield from page
+
+
+def iter_pages(paginated_list, fields=None):
+    """Yields the pages of a canvasapi paginated list as lists of items. See
+       iter_items, or iter_records if fields are given.
+    """
+    params = paginated_list._first_params
+    checkpoint = _Checkpoint.open(
+        paginated_list._requester, paginated_list._first_url, params, fields
+    )
+
+    try:
+        url = paginated_list._first_url
+        # keys of the items read from the checkpoint
+        resumed = set()
+        if checkpoint is not None and checkpoint.pages:
+            # pages fetched by an earlier run that failed part way through
+            # (records are checkpointed already reduced)
+            for data in checkpoint.pages:
+                items = _make_items(paginated_list, data) if fields is None else data
+                resumed.update(_item_key(item) for item in items)
+                yield items
+            resumed.discard(None)
+            url = checkpoint.next_url
+            params = {}
+
+        while url is not None:
+            data, url = _get_page(paginated_list, url, params, direct=fields is not None)
+            if fields is None:
+                items = _make_items(paginated_list, data)
+            else:
+                items = _make_records(paginated_list, data, fields)
+            if checkpoint is not None:
+                checkpoint.add(data if fields is None else items, url)
+            # the next page's url has the parameters in it
+            params = {}
+            if resumed:
+                fresh = [item for item in items if _item_key(item) not in resumed]
+                if len(fresh) < len(items):
+                    print_error(
+                        f"{len(items) - len(fresh)} item(s) of {paginated_list._first_url} were "
+                        "fetched twice while resuming (the list changed since the failed run); "
+                        "the copies were dropped, but items may also have been missed"
+                    )
+                    items = fresh
+            yield items
+
+        if checkpoint is not None:
+            checkpoint.remove()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+class PageError(CanvasException):
+    """Canvas answered a (direct) page request with an error status
+
+    Args:
+        url (string): Url of the page
+        response (Response): Canvas' response
+    """
+
+    def __init__(self, url, response):
+        super().__init__(f"{url}: {response.status_code} {response.reason}")
+        self.status_code = response.status_code
+
+
+def _get_page(paginated_list, url, params, direct=False):
+    """Requests one page, retrying transient failures with backoff. If direct,
+       the page is requested from the session rather than through canvasapi.
+
+    Returns:
+        data (list): The page's JSON
+        next_url (string): Url of the next page (relative to the API) or None
+    """
+    requester = paginated_list._requester
+    for attempt in range(settings.PAGE_RETRIES + 1):
+        try:
+            response = _request(paginated_list, url, params, direct)
+            break
+        except (CanvasException, requests.ConnectionError, requests.Timeout) as e:
+            if not _is_transient(e) or attempt == settings.PAGE_RETRIES:
+                raise
+            delay = min(settings.PAGE_BACKOFF_CAP, settings.PAGE_BACKOFF_BASE * 2 ** attempt)
+            time.sleep(random.uniform(0, delay))
+
+    next_link = response.links.get("next")
+    next_url = None
+    if next_link:
+        # canvasapi requests urls relative to the API's base url
+        next_url = re.sub(f"^{re.escape(requester.base_url)}", "", next_link["url"])
+    return response.json(), next_url
+
+
+def _request(paginated_list, url, params, direct):
+    requester = paginated_list._requester
+    method = paginated_list._request_method
+    if not direct or method != "GET" or paginated_list._url_override:
+        return requester.request(method, url, _url=paginated_list._url_override, **params)
+
+    response = requester._session.get(
+        f"{requester.base_url}{url}",
+        params=_query(params),
+        headers={"Authorization": f"Bearer {requester.access_token}"},
+    )
+    if response.status_code != 200:
+        raise PageError(url, response)
+    return response
+
+
+def _query(params):
+    """Query string of a paginated list's parameters, as canvasapi sends them"""
+    query = list(params.get("_kwargs") or [])
+    query.extend((key, value) for key, value in params.items() if key != "_kwargs")
+    for i, (key, value) in enumerate(query):
+        if isinstance(value, bool):
+            query[i] = (key, str(value).lower())
+        elif isinstance(value, datetime):
+            query[i] = (key, value.isoformat())
+    return query
+
+
+def _is_transient(error):
+    """Whether a failed request is worth retrying: network errors, 5xx and 429
+       responses, and the errors canvasapi doesn't give a more specific type
+       (the same). Errors like a bad token (401) or a missing resource (404)
+       will fail again.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, PageError):
+        return error.status_code >= 500 or error.status_code == 429
+    return type(error) is CanvasException
+
+
+def _make_items(paginated_list, data):
+    """Makes the canvasapi objects of one page, as PaginatedList does"""
+    if paginated_list._root:
+        data = data[paginated_list._root]
+    items = []
+    for element in data:
+        if element is not None:
+            element.update(paginated_list._extra_attribs)
+            items.append(paginated_list._content_class(paginated_list._requester, element))
+    return items
+
+
+def _make_records(paginated_list, data, fields):
+    """Reduces the items of one page to the given fields (see iter_records)"""
+    if paginated_list._root:
+        data = data[paginated_list._root]
+    return [_reduce(element, fields) for element in data if element is not None]
+
+
+def _item_key(item):
+    """Identifies an item of a list: its id, or for records without one the
+       whole record. None if it can't be identified.
+    """
+    if isinstance(item, dict):
+        if "id" in item:
+            return item["id"]
+        return json.dumps(item, sort_keys=True, default=str)
+    return getattr(item, "id", None)
+
+
+def _reduce(element, fields):
+    record = {}
+    for field, keys in fields.items():
+        value = element.get(field)
+        if keys is not None and value is not None:
+            if isinstance(value, list):
+                value = [{key: item.get(key) for key in keys} for item in value]
+            else:
+                value = {key: value.get(key) for key in keys}
+        record[field] = value
+    return record
+
+
+class _Checkpoint:
+    """Pages fetched so far for one request, in a file of JSON lines: a header
+       ({"url", "created_at"}) and then one {"data", "next_url"} per page.
+
+    Args:
+        path (string): Checkpoint file
+        key (string): Hash of the request the checkpoint is for
+        pages (list): Pages read from an existing checkpoint
+        next_url (string): Url of the page after those
+        file (file): The checkpoint file, open for adding pages
+    """
+
+    def __init__(self, path, key, pages, next_url, file):
+        self.path = path
+        self.key = key
+        self.pages = pages
+        self.next_url = next_url
+        self.file = file
+
+    @classmethod
+    def open(cls, requester, url, params, fields=None):
+        """Opens the checkpoint of a request (and of the fields kept of its
+           items, if reduced), resuming it if there is a recent one, or starts
+           a new one. Returns None if checkpoints are off or the request is
+           already being checkpointed in this process.
+        """
+        if not settings.CHECKPOINT:
+            return None
+        _remove_stale(settings.CHECKPOINT_DIR)
+
+        identity = json.dumps([requester.base_url, url, params, fields], sort_keys=True, default=str)
+        key = hashlib.sha256(identity.encode()).hexdigest()
+        with _active_lock:
+            if key in _active:
+                return None
+            _active.add(key)
+
+        path = os.path.join(settings.CHECKPOINT_DIR, f"{key}.jsonl")
+        pages, next_url, good_bytes = _read_checkpoint(path, identity)
+
+        os.makedirs(settings.CHECKPOINT_DIR, exist_ok=True)
+        if pages:
+            file = open(path, "r+")
+            # drop a page that was only partly written
+            file.truncate(good_bytes)
+            file.seek(good_bytes)
+        else:
+            file = open(path, "w")
+            _write_line(file, {"url": identity, "created_at": time.time()})
+
+        return cls(path, key, pages, next_url, file)
+
+    def add(self, data, next_url):
+        _write_line(self.file, {"data": data, "next_url": next_url})
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        with _active_lock:
+            _active.discard(self.key)
+
+
+def _remove_stale(directory):
+    """Deletes the checkpoints in directory that haven't been written to for
+       settings.CHECKPOINT_MAX_AGE (they would be ignored anyway), once per
+       process.
+    """
+    with _active_lock:
+        if directory in _swept:
+            return
+        _swept.add(directory)
+
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    cutoff = time.time() - settings.CHECKPOINT_MAX_AGE
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _read_checkpoint(path, identity):
+    """Reads the pages of a checkpoint file.
+
+    Returns:
+        pages (list): Pages fetched (empty if there is no usable checkpoint)
+        next_url (string): Url of the page after the last one read
+        good_bytes (int): Length of the file up to the end of that page
+    """
+    pages = []
+    next_url = None
+    good_bytes = 0
+    try:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["url"] != identity:
+                return [], None, 0
+            if time.time() - header["created_at"] > settings.CHECKPOINT_MAX_AGE:
+                return [], None, 0
+            good_bytes = f.tell()
+
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    page = json.loads(line)
+                except ValueError:
+                    break
+                pages.append(page["data"])
+                next_url = page["next_url"]
+                good_bytes += len(line)
+    except (OSError, ValueError, KeyError):
+        return [], None, 0
+
+    # a checkpoint of a complete list (removal failed) is as good as none
+    if next_url is None:
+        return [], None, 0
+    return pages, next_url, good_bytes
+
+
+def _write_line(file, value):
+    file.write(json.dumps(value) + "\n")
+    # a page only counts once it is in the file (a line cut short is dropped)
+    file.flush()
@@ -8,6 +8,7 @@ last edit:
 Nov 29, 2022
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from os.path import normcase
@@ -20,105 +21,410 @@ import time
 import json
 import os
 
-from dataframe_builder import make_assessments_df, make_overview_df
+from dataframe_builder import (
+    make_assessments_df,
+    make_overview_df,
+    make_comments_df,
+    attach_submission_comments,
+)
 from interface import get_user_inputs
-from util import shut_down
+from util import shut_down, print_error
+from metrics import Recorder
+import history
+from reliability import make_reliability_df
+from review_graph import ReviewGraph, make_coverage_df
+import incremental
+import pagination
+import rubric_assessments
 import settings
 
 # used to print formatted JSON to jupyter (for testing)
 import pprint as pp
 
+# the fields of each list's items that the tables (and history) use; only
+# these are kept of the JSON (see pagination.iter_records)
+STUDENT_FIELDS = {
+    "id": None,
+    "name": None,
+    "sortable_name": None,
+    "short_name": None,
+    "login_id": None,
+    "sis_user_id": None,
+    "created_at": None,
+    "enrollments": ("type", "course_section_id"),
+}
+PEER_REVIEW_FIELDS = {"user_id": None, "assessor_id": None, "asset_id": None, "workflow_state": None}
+SUBMISSION_FIELDS = {
+    "id": None,
+    "user_id": None,
+    "score": None,
+    "workflow_state": None,
+    "user": ("name",),
+    "submission_comments": ("author_id", "comment"),
+}
+
 
 def main():
 
     # get user inputs
     inputs = get_user_inputs()
 
-    # get peer reviews JSON - details each assigned review
-    peer_reviews_json = _get_peer_reviews_json(settings.ASSIGNMENT)
+    run_report(
+        settings.COURSE,
+        settings.ASSIGNMENTS,
+        settings.INCLUDE_COMMENTS,
+        settings.INCLUDE_ASSIGNMENT_SCORE,
+    )
+
+
+def run_report(course, assignments, include_comments, include_assignment_score):
+    """Fetches the data for, and writes the output tables of, each of the given
+       assignments of a course. Everything the report depends on is passed in,
+       so several reports can be run in one process (see jobs.py).
+
+    Args:
+        course (object): Course object - canvasapi
+        assignments (list of Assignment - canvasapi): Assignments to report on
+        include_comments (bool): Whether to include comment data
+        include_assignment_score (bool): Whether to output the given score table
 
-    # get students enrolled in course
-    students = _get_students(settings.COURSE)
+    Returns:
+        output_paths (list of string): Paths of the files written
+    """
+    # per-stage timings and request counts (see metrics.py); does nothing
+    # unless settings.METRICS or settings.PROGRESS are on
+    recorder = Recorder(settings.METRICS, settings.PROGRESS, settings.METRICS_TRACE_MEMORY)
 
-    # get rubric object
-    rubric = _get_rubric(settings.COURSE, settings.ASSIGNMENT)
+    output_paths = []
+    try:
+        recorder.attach(course._requester._session)
+
+        # fetch everything the reports need from Canvas (concurrently). The
+        # roster and any rubrics shared between assignments are fetched once.
+        data = _fetch_report_data(
+            course, assignments, include_comments, include_assignment_score, recorder
+        )
+        recorder.end_progress()
+
+        for assignment in assignments:
+            assignment_data = data["assignments"][assignment.id]
+
+            if not assignment_data["peer_reviews_json"]:
+                print_error(f"Assignment: {assignment.name} has no peer reviews assigned, skipping.")
+                continue
+
+            output_paths += _make_report(
+                course,
+                assignment,
+                data["students"],
+                assignment_data,
+                include_comments,
+                include_assignment_score,
+                recorder,
+                data["sections"],
+            )
+    finally:
+        recorder.detach()
+        recorder.close()
+
+    return output_paths
+
+
+def _make_report(course, assignment, students, assignment_data, include_comments, include_assignment_score,
+                 recorder=None, sections=None, save_history=True):
+    """Builds the output tables for one assignment from its fetched data and
+       writes them to /peer_review_data.
+
+    Args:
+        course (object): Course object - canvasapi
+        assignment (object): Assignment object - canvasapi
+        students (list of User - canvasapi): Students enrolled in the course
+        assignment_data (dict): Fetched data for this assignment (see
+                                _fetch_report_data)
+        include_comments (bool): Whether to include comment data
+        include_assignment_score (bool): Whether to output the given score table
+        recorder (Recorder): (optional) Records the time each stage takes
+        sections (dict): (optional) {section id: section name} of the course
+        save_history (bool): Whether to add the run to the history (if
+                             settings.HISTORY is on, see history.py)
+
+    Returns:
+        output_paths (list of string): Paths of the files written
+    """
+    if recorder is None:
+        recorder = Recorder()
+
+    peer_reviews_json = assignment_data["peer_reviews_json"]
+    rubric = assignment_data["rubric"]
 
     # get assessments JSON - details each complete assessment (could be empty)
-    assessments_json = _get_assessments_json(rubric)
+    assessments_json = _get_assessments_json(rubric, assignment)
+
+    if save_history and settings.HISTORY:
+        recorder.timed(
+            "save_history",
+            _save_history,
+            course,
+            assignment,
+            students,
+            assignment_data,
+            assessments_json,
+            sections,
+            include_comments,
+            include_assignment_score,
+            assignment_id=assignment.id,
+        )
 
     # make assessments dataframe - see docstring for schema
-    assessments_df = make_assessments_df(
-        assessments_json, peer_reviews_json, students, rubric, settings.INCLUDE_COMMENTS, settings.ASSIGNMENT
+    assessments_df = recorder.timed(
+        "make_assessments_df",
+        make_assessments_df,
+        assessments_json,
+        peer_reviews_json,
+        students,
+        rubric,
+        include_comments,
+        assignment_id=assignment.id,
     )
 
     # make overview dataframe - see docstring for schema
-    overview_df = make_overview_df(assessments_df, peer_reviews_json, students)
+    overview_df = recorder.timed(
+        "make_overview_df",
+        make_overview_df,
+        assessments_df,
+        peer_reviews_json,
+        students,
+        assignment_id=assignment.id,
+    )
+
+    # who reviews whom - see review_graph.py
+    coverage_df = None
+    if settings.COVERAGE:
+        review_graph = recorder.timed(
+            "make_review_graph",
+            ReviewGraph.from_peer_reviews,
+            peer_reviews_json,
+            students,
+            sections,
+            assignment_id=assignment.id,
+        )
+        coverage_df = recorder.timed(
+            "make_coverage_df",
+            make_coverage_df,
+            review_graph,
+            settings.COVERAGE_MIN_REVIEWS,
+            assignment_id=assignment.id,
+        )
+
+    # reviewer bias, agreement and outlier reviews - see reliability.py
+    reliability_df = None
+    if settings.RELIABILITY:
+        reliability_df = recorder.timed(
+            "make_reliability_df",
+            make_reliability_df,
+            assessments_df,
+            rubric,
+            assignment_id=assignment.id,
+        )
 
     # if asked for, get peer review assignment scores
-    if settings.INCLUDE_ASSIGNMENT_SCORE:
-        assignment_grades_df = _get_peer_review_grades(settings.ASSIGNMENT)
-        # output the dataframes to csv's in /peer_review_data directory
-        _create_output_tables(assessments_df, overview_df, assignment_grades_df)
+    assignment_grades_df = None
+    if include_assignment_score:
+        assignment_grades_df = recorder.timed(
+            "get_peer_review_grades",
+            _get_peer_review_grades,
+            assignment_data["grade_submissions"],
+            assignment_id=assignment.id,
+        )
 
-    else:
-        _create_output_tables(assessments_df, overview_df)
+    # output the dataframes to csv's in /peer_review_data directory
+    return _create_output_tables(
+        course,
+        assignment,
+        assessments_df,
+        overview_df,
+        assignment_grades_df,
+        assignment_data.get("comments_df") if include_comments else None,
+        recorder,
+        reliability_df,
+        coverage_df,
+    )
 
 
-def _get_rubric(course, assignment):
-    """ Parses rubric id from assignment object. If found, retrieves rubric with that
-        id from course object. Otherwise, shuts down with error message.
+def _fetch_report_data(course, assignments, include_comments, include_assignment_score, recorder=None,
+                       peer_reviews_required=None):
+    """Makes all of the Canvas API calls needed for the reports of the given
+       assignments. None of the calls depend on each other, so they are issued
+       concurrently over a pool of settings.MAX_WORKERS threads (sharing the
+       Canvas client's keep-alive session). The roster is fetched once for the
+       course and each rubric once no matter how many assignments use it.
+       Every paginated result is fully materialized before returning.
 
     Args:
         course (object): Course object - canvasapi
-        assignment (object): Assignment object - canvasapi
+        assignments (list of Assignment - canvasapi): Assignments to report on
+        include_comments (bool): Whether to fetch submission comments
+        include_assignment_score (bool): Whether to fetch submission grades
+        recorder (Recorder): (optional) Records each fetch as a stage
+        peer_reviews_required (bool): Whether to shut down if an assignment
+                                      has no peer reviews (default: only when
+                                      there is a single assignment)
 
     Returns:
-        rubric: Rubric object as specified by canvasapi python wrapper
+        data (dict): {'students': [...],
+                      'sections': {section id: section name} (empty
+                                  unless settings.COVERAGE or HISTORY is on),
+                      'assignments': {assignment id: {'peer_reviews_json',
+                                                      'rubric', and if asked
+                                                      for 'comments_df' and
+                                                      'grade_submissions'}}}
     """
+    # with a single assignment, no peer reviews is an error (as it always
+    # has been); with many, that assignment is skipped instead
+    if peer_reviews_required is None:
+        peer_reviews_required = len(assignments) == 1
+
+    if recorder is None:
+        recorder = Recorder()
+
+    rubric_ids = {assignment.id: _get_rubric_id(assignment) for assignment in assignments}
+
+    with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+        students_future = executor.submit(recorder.timed, "get_students", _get_students, course)
+        # only the coverage table and the history use the sections
+        sections_future = None
+        if settings.COVERAGE or settings.HISTORY:
+            sections_future = executor.submit(recorder.timed, "get_sections", _get_sections, course)
+
+        rubric_futures = {
+            rubric_id: executor.submit(recorder.timed, "get_rubric", _get_rubric, course, rubric_id)
+            for rubric_id in set(rubric_ids.values())
+            if rubric_id is not None
+        }
+
+        assignment_futures = {}
+        for assignment in assignments:
+            futures = {
+                "peer_reviews_json": executor.submit(
+                    recorder.timed, "get_peer_reviews", _get_peer_reviews_json,
+                    assignment, peer_reviews_required, assignment_id=assignment.id,
+                ),
+            }
+            if include_comments or include_assignment_score:
+                futures["submission_data"] = executor.submit(
+                    recorder.timed, "get_submissions", _get_submission_data,
+                    course, assignment, include_comments, include_assignment_score,
+                    assignment_id=assignment.id,
+                )
+            assignment_futures[assignment.id] = futures
+
+        rubrics = {rubric_id: future.result() for rubric_id, future in rubric_futures.items()}
+
+        assignments_data = {}
+        for assignment_id, futures in assignment_futures.items():
+            assignment_data = {"peer_reviews_json": futures["peer_reviews_json"].result()}
+            if "submission_data" in futures:
+                assignment_data.update(futures["submission_data"].result())
+            assignment_data["rubric"] = rubrics.get(rubric_ids[assignment_id])
+            assignments_data[assignment_id] = assignment_data
+
+        return {
+            "students": students_future.result(),
+            "sections": sections_future.result() if sections_future is not None else {},
+            "assignments": assignments_data,
+        }
+
+
+def _get_rubric_id(assignment):
+    """ Parses rubric id from assignment object. Returns None (and says so) if the
+        assignment has no rubric.
+
+    Args:
+        assignment (object): Assignment object - canvasapi
 
-    # get rubric id from assignment attributes
-    # throw error and shut down if assignment has no rubric
+    Returns:
+        rubric_id (int): Id of the assignment's rubric or None
+    """
     try:
-        rubric_id = assignment.rubric_settings["id"]
-        rubric = course.get_rubric(rubric_id, include=["assessments"], style="full")
-        return rubric
+        return assignment.rubric_settings["id"]
 
         # depreciated sytax - remove soon
         # rubric_id = assignment.attributes['rubric_settings']['id']
     except Exception as e:
         print(f"Assignment: {assignment.name} has no rubric")
-        return(None)
+        return None
 
-    # get rubric object from course
-    
 
-    
+def _get_rubric(course, rubric_id):
+    """ Retrieves rubric with the given id (including its peer review
+        assessments, see rubric_assessments.py) from course object. Returns
+        None if the rubric can't be retrieved.
+
+    Args:
+        course (object): Course object - canvasapi
+        rubric_id (int): Id of the rubric
+
+    Returns:
+        rubric: Rubric object as specified by canvasapi python wrapper
+    """
+    try:
+        return rubric_assessments.get_rubric(course, rubric_id)
+    except Exception as e:
+        print_error(f"Rubric {rubric_id} could not be retrieved")
+        return None
 
 
 def _get_students(course):
-    """ Gets a paginated list of students enrolled in the course using the
-        course param and shuts down with error if that list is empty.
+    """ Gets the list of students enrolled in the course using the course param
+        and shuts down with error if that list is empty. The paginated list is
+        materialized once here so that later lookups don't request it again.
+        Each student comes with their enrollments (for their section).
+        Students are read straight from the JSON, keeping STUDENT_FIELDS.
 
     Args:
         course (object): Course object - canvasapi
 
     Returns:
-        students: Paginated list of students in this course
+        students (list of SimpleNamespace): Students in this course
     """
-    students = course.get_users(enrollment_type=["student"])
+    students = list(
+        pagination.iter_records(
+            course.get_users(enrollment_type=["student"], include=["enrollments"]),
+            STUDENT_FIELDS,
+            as_objects=True,
+        )
+    )
     if not students:
         shut_down("ERROR: Course must have students enrolled.")
 
     return students
 
 
-def _get_assessments_json(rubric):
-    """Gets completed assessments data from rubric object. If there rubric
-       object is missing assessments field, shuts down with error otherwise
-       returns JSON.
+def _get_sections(course):
+    """ Gets the names of the course's sections. Returns an empty dictionary
+        (and says so) if they can't be retrieved.
+
+    Args:
+        course (object): Course object - canvasapi
+
+    Returns:
+        sections (dict): {section id: section name}
+    """
+    try:
+        return {section.id: section.name for section in course.get_sections()}
+    except Exception as e:
+        print_error("Course sections could not be retrieved")
+        return {}
+
+
+def _get_assessments_json(rubric, assignment):
+    """Gets the assignment's completed assessments data from rubric object. If
+       there rubric object is missing assessments field, shuts down with error
+       otherwise returns JSON.
 
     Args:
         rubric (object): Rubric object - canvasapi
+        assignment (object): Assignment object - canvasapi
 
     Returns:
         assessments_json: JSON data of all completed assessments
@@ -126,7 +432,7 @@ def _get_assessments_json(rubric):
 
     if rubric:
         try:
-            assessments_json = rubric.assessments
+            assessments_json = rubric_assessments.assessments_for_assignment(rubric, assignment)
 
             # depreciated sytax - remove soon
             # assessments_json = rubric.attributes['assessments']
@@ -139,13 +445,15 @@ def _get_assessments_json(rubric):
         return(None)
 
 
-def _get_peer_reviews_json(assignment):
+def _get_peer_reviews_json(assignment, required=True):
     """Makes request to Canvas API to get peer review object. Shuts down with
-       error if server responds with error or if response is empty. Otherwise
-       returns JSON.
+       error if server responds with error or if response is empty (unless
+       required is False, then an empty list is returned). Otherwise returns
+       JSON, reduced to PEER_REVIEW_FIELDS.
 
     Args:
         assignment (object): Canvas assignment object
+        required (bool): Whether to shut down if there are no peer reviews
     Returns:
         assessments_json: peer reviews JSON obj for the given course + assignment
     """
@@ -154,78 +462,260 @@ def _get_peer_reviews_json(assignment):
 
 
     try:
-        peer_reviews = assignment.get_peer_reviews()
-        peer_reviews = [i.__dict__ for i in peer_reviews]
+        peer_reviews = list(
+            pagination.iter_records(assignment.get_peer_reviews(), PEER_REVIEW_FIELDS)
+        )
     except Exception as e:
         shut_down(
-            "ERROR: Could not get peer reviews specified course and assignment (API responded with error)."
+            "ERROR: Could not get peer reviews specified course and assignment (API responded with error). "
+            "Pages fetched so far are kept, run again to resume."
         )
 
-    if not peer_reviews:
+    if not peer_reviews and required:
         shut_down("ERROR: Assignment must have at least one peer review assigned.")
 
     return peer_reviews
 
 
-def _get_peer_review_grades(assignment):
-    """[summary]
+def _get_submission_data(course, assignment, include_comments, include_assignment_score):
+    """Fetches the assignment's submissions once, with everything both the
+       comments table and the given score table need, and feeds them to both.
+       If only comments are needed they are streamed (see
+       _get_submission_comments); otherwise the submissions are materialized
+       once and shared.
 
     Args:
-        course (Canvas Object): The course
-        assignment_id (int): The assignment id for the peer review 
+        course (object): Canvas course object
+        assignment (object): Canvas assignment object
+        include_comments (bool): Whether to make the comments table
+        include_assignment_score (bool): Whether to keep submissions for the
+                                         given score table
 
     Returns:
-        assignment_grades_df (dataframe): a dataframe for any submitted grades for assignment for user
+        data (dict): 'comments_df' and/or 'grade_submissions' as asked for
     """
-    peer_review_submissions = assignment.get_submissions(include="user")
+    if not include_assignment_score:
+        return {"comments_df": _get_submission_comments(course, assignment)}
 
-    # create a dataframe
-    assignment_grades = []
+    include = ["submission_comments", "user"] if include_comments else ["user"]
+    submissions = _get_submissions(course, assignment, include)
 
-    for i in peer_review_submissions:
-        i_dict = _create_dict_from_object(i, ["user_id", "user", "score", "workflow_state"])
-        assignment_grades.append(i_dict)
+    data = {"grade_submissions": submissions}
+    if include_comments:
+        data["comments_df"] = make_comments_df(submissions, settings.COMMENT_CHUNK_SIZE)
+    return data
 
-    assignment_grades_df = pd.DataFrame(assignment_grades)
-    assignment_grades_df["user"] = assignment_grades_df["user"].apply(lambda x: x["name"])
-    
-    assignment_grades_df = assignment_grades_df.rename(
-        columns={
-            "user_id": "user_id",
-            "user": "Name",
-            "score": "Score",
-            "workflow_state": "GradingWorkflowState",
+
+def _get_submissions(course, assignment, include):
+    """Gets every submission for the assignment (with the given includes) as a
+       list, so all pages are requested here rather than by whoever uses it.
+       With settings.INCREMENTAL, only submissions changed since the last run
+       are requested (see incremental.py). Submissions are read straight from
+       the JSON, keeping SUBMISSION_FIELDS.
+
+    Args:
+        course (object): Canvas course object
+        assignment (object): Canvas assignment object
+        include (list of str): Extra data to include with each submission
+
+    Returns:
+        submissions (list of SimpleNamespace): Submissions for assignment
+    """
+    if settings.INCREMENTAL:
+        return incremental.get_submissions(course, assignment, include, SUBMISSION_FIELDS)
+
+    return list(
+        pagination.iter_records(
+            assignment.get_submissions(include=include), SUBMISSION_FIELDS, as_objects=True
+        )
+    )
+
+
+def _get_submission_comments(course, assignment):
+    """Makes the submission comments table for the assignment. Submissions are
+       streamed from Canvas a page at a time straight into make_comments_df,
+       so they are never all held in memory at once.
+
+    Args:
+        course (object): Canvas course object
+        assignment (object): Canvas assignment object
+
+    Returns:
+        comments_df (DataFrame): See make_comments_df
+    """
+    if settings.INCREMENTAL:
+        submissions = incremental.get_submissions(
+            course, assignment, ["submission_comments"], SUBMISSION_FIELDS
+        )
+    else:
+        submissions = pagination.iter_records(
+            assignment.get_submissions(include="submission_comments"),
+            SUBMISSION_FIELDS,
+            as_objects=True,
+        )
+
+    return make_comments_df(submissions, settings.COMMENT_CHUNK_SIZE)
+
+
+def _save_history(course, assignment, students, assignment_data, assessments_json, sections,
+                  include_comments, include_assignment_score):
+    """ Adds the run's raw data to the history (see history.py). A report is
+        still written (and the error printed) if it can't be saved.
+
+    Returns:
+        run_id (int): Id of the run in the history (None if it wasn't saved)
+    """
+    try:
+        return history.save_run(
+            course, assignment, students, assignment_data, assessments_json, sections,
+            include_comments, include_assignment_score,
+        )
+    except Exception as e:
+        print_error(f"Run could not be saved to the history ({e})")
+        return None
+
+
+def _get_peer_review_grades(peer_review_submissions):
+    """Makes a table of the (non-peer-review) grades given for the assignment.
+
+    Args:
+        peer_review_submissions (list of SimpleNamespace): Submissions
+                                    fetched with include="user"
+
+    Returns:
+        assignment_grades_df (dataframe): a dataframe for any submitted grades for assignment for user
+    """
+    # one column at a time, straight from the submissions
+    submissions = list(peer_review_submissions)
+    assignment_grades_df = pd.DataFrame(
+        {
+            "user_id": [submission.user_id for submission in submissions],
+            "Name": [submission.user["name"] for submission in submissions],
+            "Score": [submission.score for submission in submissions],
+            "GradingWorkflowState": [submission.workflow_state for submission in submissions],
         }
     )
     return assignment_grades_df
 
 
-def _create_output_tables(assessments_df, overview_df, assignment_grades_df=None):
-    """ Outputs dataframes to .csv files in /peer_review_data directory
+def _create_output_tables(course, assignment, assessments_df, overview_df, assignment_grades_df=None,
+                          comments_df=None, recorder=None, reliability_df=None,
+                          coverage_df=None):
+    """ Outputs dataframes to /peer_review_data directory in the format set by
+        settings.OUTPUT_FORMAT ('csv', 'parquet' or 'arrow'). If a recorder is
+        given and settings.METRICS is on, the run's metrics are written
+        alongside them (peer_review_metrics.json).
+
+        Normally the tables go in a new timestamped folder per run. With
+        settings.PARTITION_OUTPUT (parquet/arrow only) each table is instead
+        added to a dataset partitioned by course and assignment:
+        /peer_review_data/dataset/{table}/course_id={id}/assignment_id={id}/{timestamp}
+        so that many runs can be scanned as one dataset.
 
     Args:
+        course (object): Course object - canvasapi
+        assignment (object): Assignment object - canvasapi
         assessments_df (DataFrame): Assessments table for output
         overview_df (DataFrame): Overview table for output
         assignment_grades_df (DataFrame): (optional) Grades table if asked for
+        comments_df (DataFrame): (optional) Submission comments (from
+                                 make_comments_df) to add to the assessments
+                                 table as its 'Submission Comments' column
+        recorder (Recorder): (optional) Metrics of the run
+        reliability_df (DataFrame): (optional) Reliability table (see
+                                    reliability.py)
+        coverage_df (DataFrame): (optional) Review coverage table (see
+                                 review_graph.py)
 
+    Returns:
+        output_paths (list of string): Paths of the tables written
     """
+    if recorder is None:
+        recorder = Recorder()
+
     now = datetime.now()
     date_time = now.strftime("%Y-%m-%d %H %M %S")
 
-    dir_folder = f"./peer_review_data/{settings.COURSE.name}/"
+    if comments_df is not None:
+        assessments_df = attach_submission_comments(assessments_df, comments_df)
+
+    tables = {
+        "peer_review_assessments": assessments_df,
+        "peer_review_overview": overview_df,
+    }
+    if assignment_grades_df is not None:
+        tables["peer_review_given_score"] = assignment_grades_df
+    if reliability_df is not None:
+        tables["peer_review_reliability"] = reliability_df
+    if coverage_df is not None:
+        tables["peer_review_coverage"] = coverage_df
+
+    output_paths = []
+
+    if settings.PARTITION_OUTPUT and settings.OUTPUT_FORMAT != "csv":
+        for table_name, df in tables.items():
+            location = Path(
+                f"./peer_review_data/dataset/{table_name}"
+                f"/course_id={course.id}/assignment_id={assignment.id}"
+            )
+            os.makedirs(location, exist_ok=True)
+            with recorder.stage(f"write_{table_name}", assignment.id) as stage:
+                output_paths.append(_output_table(df, location, date_time))
+                stage.rows = len(df)
+
+        location = Path(
+            f"./peer_review_data/dataset/metrics"
+            f"/course_id={course.id}/assignment_id={assignment.id}"
+        )
+        recorder.write(location, date_time, course.id, assignment.id)
+        return output_paths
+
+    dir_folder = f"./peer_review_data/{course.name}/"
 
     if not os.path.isdir(dir_folder):
         os.makedirs(dir_folder)
 
-    dir_name = f"{date_time} {settings.ASSIGNMENT.name}"
+    dir_name = f"{date_time} {assignment.name}"
     dir_path = Path(f"{dir_folder}/{dir_name}")
-    os.mkdir(dir_path)
 
-    _output_csv(assessments_df, dir_path, "peer_review_assessments")
-    _output_csv(overview_df, dir_path, "peer_review_overview")
+    # several reports for the same assignment in the same second (eg. from a
+    # jobs file, or running at once in the worker) each get their own folder
+    copy_number = 1
+    while True:
+        try:
+            os.mkdir(dir_path)
+            break
+        except FileExistsError:
+            copy_number += 1
+            dir_path = Path(f"{dir_folder}/{dir_name} ({copy_number})")
+
+    for table_name, df in tables.items():
+        with recorder.stage(f"write_{table_name}", assignment.id) as stage:
+            output_paths.append(_output_table(df, dir_path, table_name))
+            stage.rows = len(df)
+
+    recorder.write(dir_path, "peer_review_metrics", course.id, assignment.id)
+    return output_paths
 
-    if assignment_grades_df is not None:
-        _output_csv(assignment_grades_df, dir_path, "peer_review_given_score")
+
+def _output_table(df, location, file_name):
+    """ Writes table to location with file_name in the format set by
+        settings.OUTPUT_FORMAT
+
+    Args:
+        df (DataFrame): Table to output
+        location (string): filepath to output directory
+        file_name (string): name to give file (without extension)
+
+    Returns:
+        output_path (string): Absolute path of the file written
+    """
+    if settings.OUTPUT_FORMAT == "csv":
+        return _output_csv(df, location, file_name)
+    elif settings.OUTPUT_FORMAT in ("parquet", "arrow"):
+        return _output_arrow(df, location, file_name, settings.OUTPUT_FORMAT)
+    else:
+        shut_down(f"ERROR: Unknown output format {settings.OUTPUT_FORMAT} (use csv, parquet or arrow).")
 
 
 def _output_csv(df, location, file_name):
@@ -235,31 +725,53 @@ def _output_csv(df, location, file_name):
         df (DataFrame): Table to output
         location (string): filepath to output directory
         file_name (string): name to give file "example" => "example.csv"
+
+    Returns:
+        output_path (string): Absolute path of the file written
     """
     output_path = Path(f"{location}/{file_name}.csv")
     df.to_csv(output_path, index=False)
     cprint(f"{file_name}.csv successfully created in /peer_review_data", "green")
+    return os.path.abspath(output_path)
+
 
+def _output_arrow(df, location, file_name, output_format):
+    """ Writes a typed, zstd compressed Parquet file ("example.parquet") or
+        Arrow IPC file ("example.arrow") to location with file_name. List valued
+        columns (eg. Submission Comments) are written as native list columns.
 
-def _create_dict_from_object(theobj, list_of_attributes):
-    """given an object and list of attributes return a dictionary
     Args:
-        theobj (a Canvas object)
-        list_of_attributes (list of strings)
+        df (DataFrame): Table to output
+        location (string): filepath to output directory
+        file_name (string): name to give file (without extension)
+        output_format (string): 'parquet' or 'arrow'
+
     Returns:
-        mydict
+        output_path (string): Absolute path of the file written
     """
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        shut_down("ERROR: pyarrow is required for parquet/arrow output (pip install pyarrow).")
+
+    # missing cells in object columns (eg. lists of comments) are NaN after
+    # the merges; arrow wants them as nulls
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+
+    output_path = Path(f"{location}/{file_name}.{output_format}")
+    if output_format == "parquet":
+        pyarrow.parquet.write_table(table, output_path, compression="zstd")
+    else:
+        pyarrow.feather.write_feather(table, output_path, compression="zstd")
 
-    def get_attribute_if_available(theobj, attrname):
-        if hasattr(theobj, attrname):
-            return {attrname: getattr(theobj, attrname)}
-        else:
-            return {attrname: None}
-
-    mydict = {}
-    for i in list_of_attributes:
-        mydict.update(get_attribute_if_available(theobj, i))
-    return mydict
+    cprint(f"{output_path} successfully created", "green")
+    return os.path.abspath(output_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+"""
+PEER REVIEW SCRIPT: reliability
+
+Reviewer reliability. Turns the completed reviews of the assessments table
+into a score matrix with one row per review and one column per measure (the
+total score and each rubric criterion), where missing scores are NaN and
+masked out of every statistic. Every statistic is worked out for all
+measures at once from grouped sums (count, sum and sum of squares per
+assessee or per assessor) of that matrix:
+
+- consensus and spread of each assessee: the mean and standard deviation of
+  the scores they received
+- residual of each review: its score minus the mean of the other reviews of
+  the same assessee (leave-one-out, so a review isn't compared with itself)
+- bias of each assessor: their mean residual, ie. how many points more (or
+  less) than the other reviewers they give. Bias (z) is that in units of the
+  spread of all residuals of the measure (1.4826 x median absolute residual,
+  which outliers don't inflate)
+- outlier reviews: reviews whose residual is more than
+  settings.RELIABILITY_OUTLIER_Z of those units away from the others
+- agreement between reviewers: Krippendorff's alpha (interval), which allows
+  each assessee a different number of reviewers. 1 is perfect agreement, 0
+  no better than chance
+
+The assessee x assessor matrix itself is nearly all missing values (each
+student reviews a handful of others), so it is never built: grouping the
+reviews by assessee or assessor gives the same statistics in memory
+proportional to the number of reviews.
+
+last edit:
+Oct 18, 2026
+"""
+
+import numpy as np
+import pandas as pd
+
+import settings
+
+# scale of a normal distribution's median absolute deviation
+MAD_SCALE = 1.4826
+
+
+def make_reliability_df(assessments_df, rubric):
+    """Makes the reliability table with one row per measure (the total score
+       and each rubric criterion) and student, with following schema:
+
+    ~~COLUMNS~~
+    Criterion: The measure: the 'Total Score (n)' column or a criterion column
+               of the assessments table
+    user_id: The Canvas ID of the student
+    Name: The student's name
+    Reviews Given: Number of completed reviews the student scored on this measure
+    Bias: Mean points the student gave above (or below) the other reviewers of
+          the same work
+    Bias (z): Bias in units of the typical residual of the measure
+    Outlier Reviews Given: Number of the student's reviews flagged as outliers
+    Reviews Received: Number of completed reviews of the student's work
+    Consensus: Mean score the student received
+    Spread: Standard deviation of the scores the student received
+    Outlier Reviews Received: Number of reviews of the student's work flagged
+                              as outliers
+    Outlier Assessors: assessor_id of each of those reviews
+    Agreement (alpha): Krippendorff's alpha of the measure (same on every row
+                       of the measure)
+
+    Args:
+        assessments_df (DataFrame): Assessments table from make_assessments_df
+        rubric (Rubric - canvasapi): Rubric obj (None if the assignment has none)
+
+    Returns:
+        reliability_df (DataFrame): Dataframe representing the reliability
+                                    output table (None if there are no scores)
+    """
+    measures = _measure_columns(assessments_df, rubric)
+    if not measures:
+        return None
+
+    # every student that appears in the table, as assessee or assessor
+    user_ids, names = _user_names(assessments_df)
+
+    completed = assessments_df[assessments_df[measures].notna().any(axis=1)]
+    assessee = np.searchsorted(user_ids, completed["user_id"].to_numpy("int64"))
+    assessor = np.searchsorted(user_ids, completed["assessor_id"].to_numpy("int64"))
+    scores = completed[measures].to_numpy("float64", na_value=np.nan)
+
+    stats = _reliability(scores, assessee, assessor, len(user_ids))
+
+    num_users = len(user_ids)
+    num_measures = len(measures)
+    reliability_df = pd.DataFrame(
+        {
+            "Criterion": pd.Categorical(np.repeat(measures, num_users), categories=measures),
+            "user_id": np.tile(user_ids, num_measures),
+            "Name": pd.Categorical.from_codes(np.tile(names.codes, num_measures), names.categories),
+            "Reviews Given": _flat(stats["given"]).astype("int32"),
+            "Bias": _flat(stats["bias"]),
+            "Bias (z)": _flat(stats["bias_z"]),
+            "Outlier Reviews Given": _flat(stats["outliers_given"]).astype("int32"),
+            "Reviews Received": _flat(stats["received"]).astype("int32"),
+            "Consensus": _flat(stats["consensus"]),
+            "Spread": _flat(stats["spread"]),
+            "Outlier Reviews Received": _flat(stats["outliers_received"]).astype("int32"),
+            "Agreement (alpha)": np.repeat(stats["alpha"], num_users),
+        }
+    )
+
+    # list the assessors of the (few) outlier reviews of each student: sort
+    # the flagged reviews by row of the table and split them where rows change
+    measure_index, review_index = np.nonzero(stats["outlier"].T)
+    rows = measure_index * num_users + assessee[review_index]
+    order = np.argsort(rows, kind="stable")
+    rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else rows
+    outlier_assessors = np.full(len(reliability_df), np.nan, dtype=object)
+    for row, group in zip(rows[starts], np.split(user_ids[assessor[review_index[order]]], starts[1:])):
+        outlier_assessors[row] = group.tolist()
+    reliability_df.insert(
+        reliability_df.columns.get_loc("Outlier Reviews Received") + 1,
+        "Outlier Assessors",
+        outlier_assessors,
+    )
+
+    return reliability_df
+
+
+def _reliability(scores, assessee, assessor, num_users):
+    """Works out the reliability statistics of every measure at once.
+
+    Args:
+        scores (ndarray): reviews x measures, NaN where there is no score
+        assessee (ndarray): Position of each review's assessee in the users
+        assessor (ndarray): Position of each review's assessor in the users
+        num_users (int): Number of users
+
+    Returns:
+        stats (dict): users x measures arrays 'given', 'bias', 'bias_z',
+                      'outliers_given', 'received', 'consensus', 'spread' and
+                      'outliers_received', reviews x measures 'outlier' and
+                      'alpha' with one value per measure
+    """
+    scored = ~np.isnan(scores)
+
+    received, total, total_squares = _group_sums(assessee, scores, num_users)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        consensus = np.where(received > 0, total / received, np.nan)
+        variance = (total_squares - total * consensus) / (received - 1)
+        spread = np.where(received > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+
+        # each review against the mean of the other reviews of the same work
+        others = received[assessee] - 1
+        others_mean = (total[assessee] - np.where(scored, scores, 0.0)) / others
+        residuals = np.where(scored & (others > 0), scores - others_mean, np.nan)
+
+    scale = _residual_scale(residuals)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = residuals / scale
+    outlier = np.abs(np.nan_to_num(z)) > settings.RELIABILITY_OUTLIER_Z
+
+    compared, residual_total, _ = _group_sums(assessor, residuals, num_users)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bias = np.where(compared > 0, residual_total / compared, np.nan)
+        bias_z = bias / scale
+
+    return {
+        "given": _group_counts(assessor, scored, num_users),
+        "bias": bias,
+        "bias_z": bias_z,
+        "outliers_given": _group_counts(assessor, outlier, num_users),
+        "received": received,
+        "consensus": consensus,
+        "spread": spread,
+        "outliers_received": _group_counts(assessee, outlier, num_users),
+        "outlier": outlier,
+        "alpha": _krippendorff_alpha(received, total, total_squares),
+    }
+
+
+def _group_sums(groups, values, num_groups):
+    """Count, sum and sum of squares of the values (rows x measures, NaN
+       masked) of each group.
+
+    Returns:
+        counts, sums, sums_of_squares (ndarray): groups x measures each
+    """
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    stacked = np.concatenate([present, filled, filled * filled], axis=1)
+    return np.split(_group_totals(groups, stacked, num_groups), 3, axis=1)
+
+
+def _group_counts(groups, flags, num_groups):
+    """Number of True flags (rows x measures) of each group"""
+    return _group_totals(groups, flags.astype("float64"), num_groups)
+
+
+def _group_totals(groups, values, num_groups):
+    """Column totals (groups x columns) of the rows of each group"""
+    totals = np.zeros((num_groups, values.shape[1]))
+    if len(groups):
+        # sort the rows by group and add up each run of rows in one call
+        order = np.argsort(groups, kind="stable")
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        totals[sorted_groups[starts]] = np.add.reduceat(values[order], starts, axis=0)
+    return totals
+
+
+def _residual_scale(residuals):
+    """Spread of the residuals of each measure: the scaled median absolute
+       residual, or their standard deviation if more than half are 0. NaN if
+       a measure has no residuals.
+    """
+    scale = np.full(residuals.shape[1], np.nan)
+    for measure in range(residuals.shape[1]):
+        values = residuals[:, measure]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            continue
+        scale[measure] = MAD_SCALE * np.median(np.abs(values)) or np.std(values)
+    # a measure every reviewer agrees on has no outliers
+    scale[scale == 0] = np.nan
+    return scale
+
+
+def _krippendorff_alpha(counts, sums, sums_of_squares):
+    """Krippendorff's alpha (interval metric) of each measure, from the count,
+       sum and sum of squares of the scores of each assessee. Only assessees
+       with at least two scores count.
+
+       alpha = 1 - observed disagreement / expected disagreement, where the
+       observed disagreement is the mean squared difference between scores of
+       the same assessee and the expected one that between any two scores.
+    """
+    pairable = counts > 1
+    counts = np.where(pairable, counts, 0.0)
+    sums = np.where(pairable, sums, 0.0)
+    sums_of_squares = np.where(pairable, sums_of_squares, 0.0)
+
+    # sum over ordered pairs (i, j) of (x_i - x_j)^2 is 2 (m sum(x^2) - sum(x)^2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        within = np.where(
+            pairable, 2 * (counts * sums_of_squares - sums * sums) / (counts - 1), 0.0
+        ).sum(axis=0)
+    n = counts.sum(axis=0)
+    total = sums.sum(axis=0)
+    between = 2 * (n * sums_of_squares.sum(axis=0) - total * total) / np.maximum(n - 1, 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = 1 - within / between
+    alpha[(n < 2) | (between <= 0)] = np.nan
+    return alpha
+
+
+def _measure_columns(assessments_df, rubric):
+    """Returns the total score column and the criterion points columns of the
+       assessments table (as named by make_assessments_df), in table order.
+    """
+    if rubric is None:
+        return []
+    names = {f"{crit['description']} ({crit['points']})" for crit in rubric.data}
+    return [
+        col
+        for col in assessments_df.columns
+        if str(col).startswith("Total Score (") or col in names
+    ]
+
+
+def _user_names(assessments_df):
+    """Every user in the table (as assessee or assessor) with their name from
+       the Assessee or Assessor column.
+
+    Returns:
+        user_ids (ndarray): Sorted user ids
+        names (Categorical): Name of each user
+    """
+    ids = np.concatenate(
+        [assessments_df["user_id"].to_numpy("int64"), assessments_df["assessor_id"].to_numpy("int64")]
+    )
+    user_ids, first = np.unique(ids, return_index=True)
+
+    # the names are categorical: look up codes rather than the strings
+    names = pd.Categorical(
+        pd.concat([assessments_df["Assessee"], assessments_df["Assessor"]], ignore_index=True)
+    )
+    return user_ids, names[first]
+
+
+def _flat(array):
+    """Users x measures array as one column, measure by measure"""
+    return array.T.ravel()
@@ -0,0 +1,250 @@
+"""
+PEER REVIEW SCRIPT: review_graph
+
+Index of who reviews whom. The peer reviews of an assignment form a directed
+graph (an edge from assessor to assessee per assigned review). ReviewGraph
+numbers every user (0...n-1, ordered by Canvas id) and keeps the edges twice
+in compressed sparse form:
+
+- by assessor (CSR): the reviews each student was assigned to do are
+  assessees[by_assessor_ptr[i]:by_assessor_ptr[i + 1]]
+- by assessee (CSC): the reviews of each student's work are
+  assessors[by_assessee_ptr[i]:by_assessee_ptr[i + 1]]
+
+with whether each review is completed alongside. Degrees, completion counts,
+reciprocity (pairs who review each other), coverage gaps and per-section
+counts are then whole-array operations over the index rather than filters
+of the peer reviews table per student.
+
+last edit:
+Oct 18, 2026
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class ReviewGraph:
+    """Sparse index of the peer reviews of one assignment.
+
+    Args:
+        user_ids (ndarray): Canvas id of each user, sorted
+        assessor (ndarray): Position (in user_ids) of each review's assessor
+        assessee (ndarray): Position (in user_ids) of each review's assessee
+        completed (ndarray): Whether each review is completed
+        names (ndarray): (optional) Name of each user
+        sections (ndarray): (optional) Section name of each user
+    """
+
+    def __init__(self, user_ids, assessor, assessee, completed, names=None, sections=None):
+        self.user_ids = user_ids
+        self.num_users = len(user_ids)
+        self.num_reviews = len(assessor)
+        self.names = names
+        self.sections = sections
+
+        self.by_assessor_ptr, by_assessor = _compress(assessor, self.num_users)
+        self.assessees = assessee[by_assessor]
+        self.completed_by_assessor = completed[by_assessor]
+
+        self.by_assessee_ptr, by_assessee = _compress(assessee, self.num_users)
+        self.assessors = assessor[by_assessee]
+        self.completed_by_assessee = completed[by_assessee]
+
+    @classmethod
+    def from_peer_reviews(cls, peer_reviews_json, students, sections=None):
+        """Builds the index of an assignment's peer reviews. Every student and
+           everyone who appears in a review is indexed (students who have
+           left the course are named 'User Not Found').
+
+        Args:
+            peer_reviews_json (JSON): Assigned peer reviews
+            students (list of User - canvasapi): Students enrolled in the course
+            sections (dict): (optional) {section id: section name}
+
+        Returns:
+            graph (ReviewGraph)
+        """
+        assessor_ids = np.array([review["assessor_id"] for review in peer_reviews_json], dtype="int64")
+        assessee_ids = np.array([review["user_id"] for review in peer_reviews_json], dtype="int64")
+        completed = np.array(
+            [review["workflow_state"] == "completed" for review in peer_reviews_json], dtype=bool
+        )
+
+        student_ids = np.array([student.id for student in students], dtype="int64")
+        user_ids = np.unique(np.concatenate([student_ids, assessor_ids, assessee_ids]))
+
+        names = np.full(len(user_ids), "User Not Found", dtype=object)
+        names[np.searchsorted(user_ids, student_ids)] = [student.name for student in students]
+
+        user_sections = None
+        if sections is not None:
+            user_sections = np.full(len(user_ids), None, dtype=object)
+            user_sections[np.searchsorted(user_ids, student_ids)] = [
+                sections.get(_section_id(student)) for student in students
+            ]
+
+        return cls(
+            user_ids,
+            np.searchsorted(user_ids, assessor_ids),
+            np.searchsorted(user_ids, assessee_ids),
+            completed,
+            names,
+            user_sections,
+        )
+
+    def positions(self, ids):
+        """Positions of the given Canvas ids in the index (-1 for ids that
+           aren't in it)
+        """
+        ids = np.asarray(ids, dtype="int64")
+        positions = np.searchsorted(self.user_ids, ids)
+        found = positions < self.num_users
+        found[found] = self.user_ids[positions[found]] == ids[found]
+        return np.where(found, positions, -1)
+
+    def out_degree(self, completed=False):
+        """Reviews each user was assigned to do (only the completed ones if
+           completed)
+        """
+        if completed:
+            return _segment_sums(self.completed_by_assessor, self.by_assessor_ptr)
+        return np.diff(self.by_assessor_ptr)
+
+    def in_degree(self, completed=False):
+        """Reviews of each user's work (only the completed ones if completed)"""
+        if completed:
+            return _segment_sums(self.completed_by_assessee, self.by_assessee_ptr)
+        return np.diff(self.by_assessee_ptr)
+
+    def reviewers_of(self, user_id):
+        """Canvas ids of the assessors of the given user's work"""
+        position = self.positions([user_id])[0]
+        if position < 0:
+            return self.user_ids[:0]
+        start, end = self.by_assessee_ptr[position], self.by_assessee_ptr[position + 1]
+        return self.user_ids[self.assessors[start:end]]
+
+    def reviewees_of(self, user_id):
+        """Canvas ids of the users the given user was assigned to review"""
+        position = self.positions([user_id])[0]
+        if position < 0:
+            return self.user_ids[:0]
+        start, end = self.by_assessor_ptr[position], self.by_assessor_ptr[position + 1]
+        return self.user_ids[self.assessees[start:end]]
+
+    def reciprocal(self):
+        """Whether each review (in by assessor order) has a review going the
+           other way, ie. its assessee was also assigned to review its assessor
+        """
+        if not self.num_reviews:
+            return np.zeros(0, dtype=bool)
+
+        # number each edge assessor * n + assessee and look up the reverse ones
+        assessor = np.repeat(np.arange(self.num_users), np.diff(self.by_assessor_ptr))
+        edges = np.sort(assessor * self.num_users + self.assessees)
+        reverse = self.assessees * self.num_users + assessor
+        found = np.minimum(np.searchsorted(edges, reverse), len(edges) - 1)
+        return edges[found] == reverse
+
+    def reciprocal_pairs(self):
+        """Canvas ids of every pair of users who review each other, as rows
+           (smaller id, larger id)
+        """
+        assessor = np.repeat(np.arange(self.num_users), np.diff(self.by_assessor_ptr))
+        mask = self.reciprocal() & (assessor < self.assessees)
+        return np.column_stack([self.user_ids[assessor[mask]], self.user_ids[self.assessees[mask]]])
+
+    def reciprocal_counts(self):
+        """Number of each user's reviewees who also review them"""
+        return _segment_sums(self.reciprocal(), self.by_assessor_ptr)
+
+    def coverage_gaps(self, min_reviews):
+        """Canvas ids of the users whose work has fewer than min_reviews
+           completed reviews
+        """
+        return self.user_ids[self.in_degree(completed=True) < min_reviews]
+
+    def outstanding_by_section(self):
+        """Assigned reviews not yet completed, by the section of the assessor
+
+        Returns:
+            outstanding (Series): {section name: number of reviews}
+        """
+        outstanding = self.out_degree() - self.out_degree(completed=True)
+        sections = self.sections if self.sections is not None else np.full(self.num_users, None)
+        return pd.Series(outstanding).groupby(pd.Series(sections, dtype=object), dropna=False).sum()
+
+
+def make_coverage_df(graph, min_reviews):
+    """Makes the review coverage table with following schema:
+
+    ~~COLUMNS~~
+    user_id: The Canvas ID of the student
+    Name: The student's name
+    Section: The student's section
+    Reviews Assigned: Reviews the student was assigned to do
+    Reviews Completed: Reviews the student has completed
+    Reviews Outstanding: Reviews the student still has to do
+    Reviewers Assigned: Reviews of the student's work that were assigned
+    Reviews Received: Reviews of the student's work that are completed
+    Reciprocal Reviews: Students the student reviews who also review them
+    Below Minimum: Whether the student's work has fewer than min_reviews
+                   completed reviews
+
+    Args:
+        graph (ReviewGraph): Index of the assignment's peer reviews
+        min_reviews (int): Completed reviews each student's work should have
+
+    Returns:
+        coverage_df (DataFrame): Dataframe representing the coverage output
+                                 table
+    """
+    assigned = graph.out_degree()
+    completed = graph.out_degree(completed=True)
+    received = graph.in_degree(completed=True)
+
+    return pd.DataFrame(
+        {
+            "user_id": graph.user_ids,
+            "Name": pd.Categorical(graph.names),
+            "Section": pd.Categorical(
+                graph.sections if graph.sections is not None else np.full(graph.num_users, None)
+            ),
+            "Reviews Assigned": assigned.astype("int32"),
+            "Reviews Completed": completed.astype("int32"),
+            "Reviews Outstanding": (assigned - completed).astype("int32"),
+            "Reviewers Assigned": graph.in_degree().astype("int32"),
+            "Reviews Received": received.astype("int32"),
+            "Reciprocal Reviews": graph.reciprocal_counts().astype("int32"),
+            "Below Minimum": received < min_reviews,
+        }
+    )
+
+
+def _compress(rows, num_rows):
+    """Row pointers of a compressed sparse index over rows (positions 0...
+       num_rows-1), and the order that sorts the edges into it (by row, then
+       by their position in the input)
+    """
+    order = np.argsort(rows, kind="stable")
+    pointers = np.zeros(num_rows + 1, dtype="int64")
+    np.cumsum(np.bincount(rows, minlength=num_rows), out=pointers[1:])
+    return pointers, order
+
+
+def _segment_sums(values, pointers):
+    """Sum of the values in each row of a compressed sparse index"""
+    totals = np.cumsum(values, dtype="int64")
+    totals = np.concatenate([[0], totals])
+    return totals[pointers[1:]] - totals[pointers[:-1]]
+
+
+def _section_id(student):
+    """Section of a student's (first) student enrollment, if the students
+       were fetched with their enrollments
+    """
+    for enrollment in getattr(student, "enrollments", None) or []:
+        if enrollment.get("type") == "StudentEnrollment":
+            return enrollment.get("course_section_id")
+    return None
@@ -0,0 +1,260 @@
+"""
+PEER REVIEW SCRIPT: rubric_assessments
+
+Fetches a rubric with the peer review assessments made with it, keeping only
+what the reports use.
+
+Canvas has no endpoint listing the assessments of one assignment: the rubric
+endpoint returns the assessments from every association of the rubric (every
+assignment and section it has ever been used in). So the rubric is requested
+with only its peer assessments (include[]=peer_assessments rather than every
+assessment) and its assignment associations, and the response is parsed as a
+stream: each assessment is reduced to the fields the reports use (assessor,
+artifact, score, association and each criterion's points and comments) as
+soon as it has been read, and the full payload is never held in memory or
+turned into canvasapi objects. assessments_for_assignment then keeps only the
+assessments made through the assignment's association.
+
+The rubric's definition (its criteria) is requested on its own, without the
+assessments: it rarely changes and the response cache keeps it for a while
+(settings.CACHE_TTLS), whereas the assessments change whenever a student
+completes a review and are revalidated with Canvas on every run.
+
+last edit:
+Oct 18, 2026
+"""
+
+import codecs
+import json
+
+from canvasapi.exceptions import CanvasException
+from canvasapi.rubric import Rubric
+
+# bytes read from the response at a time
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def get_rubric(course, rubric_id):
+    """Gets a rubric with its peer review assessments (from every association)
+       and its assignment associations.
+
+    Args:
+        course (object): Course object - canvasapi
+        rubric_id (int): Id of the rubric
+
+    Returns:
+        rubric (Rubric - canvasapi): The rubric. Its 'assessments' are reduced
+                                     to the fields the reports use (see
+                                     _reduce_assessment) and 'associations'
+                                     are its assignment associations (None if
+                                     Canvas didn't send them)
+    """
+    requester = course._requester
+    url = f"{requester.base_url}courses/{course.id}/rubrics/{rubric_id}"
+    headers = {"Authorization": f"Bearer {requester.access_token}"}
+
+    response = requester._session.get(url, headers=headers)
+    if response.status_code != 200:
+        raise CanvasException(f"Rubric {rubric_id}: {response.status_code} {response.reason}")
+    attributes = response.json()
+    attributes["associations"] = None
+
+    response = requester._session.get(
+        url,
+        params=[
+            ("include[]", "peer_assessments"),
+            ("include[]", "assignment_associations"),
+            ("style", "full"),
+        ],
+        headers=headers,
+        stream=True,
+    )
+    with response:
+        if response.status_code != 200:
+            raise CanvasException(f"Rubric {rubric_id}: {response.status_code} {response.reason}")
+
+        # the definition is sent again, only the assessments and associations are kept
+        stream = _JSONStream(_iter_text(response))
+        for key in stream.keys():
+            if key == "assessments":
+                attributes["assessments"] = [
+                    _reduce_assessment(assessment) for assessment in stream.array()
+                ]
+            elif key == "associations":
+                attributes["associations"] = stream.value()
+            else:
+                stream.value()
+        stream.end()
+
+    attributes["course_id"] = course.id
+    return Rubric(requester, attributes)
+
+
+def assessments_for_assignment(rubric, assignment):
+    """Returns the rubric's assessments made through the assignment's rubric
+       association. If Canvas didn't send the associations, every assessment
+       is returned (the report's merge with the peer reviews still only keeps
+       this assignment's).
+
+    Args:
+        rubric (Rubric - canvasapi): Rubric from get_rubric
+        assignment (object): Assignment object - canvasapi
+
+    Returns:
+        assessments (list of dict): The assignment's assessments
+    """
+    if rubric.associations is None:
+        return rubric.assessments
+
+    association_ids = {
+        association["id"]
+        for association in rubric.associations
+        if association.get("association_type") == "Assignment"
+        and association.get("association_id") == assignment.id
+    }
+    return [
+        assessment
+        for assessment in rubric.assessments
+        if assessment["rubric_association_id"] in association_ids
+    ]
+
+
+def _reduce_assessment(assessment):
+    """Keeps only the fields of an assessment the reports use. A criterion's
+       'points' is only kept if it was there (a missing value is reported as
+       invalid, see dataframe_builder._expand_criteria_to_columns).
+    """
+    data = []
+    for item in assessment.get("data") or []:
+        reduced = {"criterion_id": item.get("criterion_id"), "comments": item.get("comments")}
+        if "points" in item:
+            reduced["points"] = item["points"]
+        data.append(reduced)
+
+    return {
+        "assessor_id": assessment.get("assessor_id"),
+        "artifact_id": assessment.get("artifact_id"),
+        "rubric_association_id": assessment.get("rubric_association_id"),
+        "score": assessment.get("score"),
+        "data": data,
+    }
+
+
+def _iter_text(response):
+    """Yields the body of a streamed response as text"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+class _JSONStream:
+    """Reads a JSON document from chunks of text one value at a time, holding
+       only the value being read (and the rest of the chunk it's in).
+
+    Args:
+        chunks (iterator of str): The document in pieces
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = ""
+        self.pos = 0
+        self.done = False
+
+    def keys(self):
+        """Yields the keys of the object at the current position. The caller
+           must read each key's value (with value or array) before asking for
+           the next key.
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self._next_separator("}"):
+                return
+
+    def array(self):
+        """Yields the items of the array at the current position"""
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._next_separator("]"):
+                return
+
+    def value(self):
+        """Reads the (complete) value at the current position"""
+        self._peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.done:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.done:
+                    raise
+            self._fill()
+
+    def end(self):
+        """Reads the rest of the document, which must only be whitespace (so
+           the whole body has been read, eg. for the response cache)
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                raise ValueError(f"Extra data at {self.pos}")
+            if not self._fill():
+                return
+
+    def _next_separator(self, closing):
+        """Reads the ',' before the next item or the closing bracket. Returns
+           True at the closing bracket.
+        """
+        char = self._peek()
+        self.pos += 1
+        if char == closing:
+            return True
+        if char != ",":
+            raise ValueError(f"Expected ',' or '{closing}' at {self.pos - 1}, got {char!r}")
+        return False
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at {self.pos}, got {found!r}")
+        self.pos += 1
+
+    def _peek(self):
+        """Skips whitespace and returns the next character"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def _fill(self):
+        """Drops what has been read and appends the next chunk. Returns False
+           if there are no more chunks.
+        """
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.done = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
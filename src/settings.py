@@ -19,10 +19,132 @@ ROOT = os.path.dirname(os.path.abspath(__file__))
 # Canvas object to provide access to Canvas API
 COURSE = None
 
-# Assignment object representing Canvas assignment specified by user input
-ASSIGNMENT = None
+# List of Assignment objects representing Canvas assignment(s) specified by user input
+ASSIGNMENTS = None
 
 # Whether to include output of assignment scored (specified by user input)
 INCLUDE_ASSIGNMENT_SCORE = None
 
-INCLUDE_COMMENTS = None
\ No newline at end of file
+INCLUDE_COMMENTS = None
+
+# Number of Canvas API requests to have in flight at once
+MAX_WORKERS = 4
+
+# Whether to schedule Canvas API requests around the rate limit (see
+# throttle.py): concurrency adapts to X-Rate-Limit-Remaining and throttled
+# requests are retried with backoff
+THROTTLE = True
+
+# Times a rate limited request is retried before giving up
+THROTTLE_MAX_RETRIES = 6
+
+# Whether to keep Canvas API responses in an on-disk cache (see http_cache.py).
+# Off unless asked for: the cache holds the responses as sent, student data
+# included (roster, submissions with grades and comments, assessments)
+HTTP_CACHE = False
+
+# Where the response cache lives (project directory)
+CACHE_DIR = os.path.join(os.path.dirname(ROOT), ".http_cache")
+
+# Maximum size of the cached response bodies, in bytes
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# How long (seconds) responses from matching urls are used without asking
+# Canvas again. After that they are revalidated (ETag/Last-Modified) if
+# possible. Urls matching none of these are always revalidated. The rubric
+# entry only matches the rubric's definition: the request for its assessments
+# has a query string, so they are always revalidated (see rubric_assessments.py).
+# /users/self is left out on purpose: it is how the token is checked
+CACHE_TTLS = [
+    (r"/courses/\d+/(search_)?users", 6 * 60 * 60),
+    (r"/courses/\d+/rubrics/\d+$", 60 * 60),
+]
+
+# Whether to only fetch submissions changed since the last run (see incremental.py).
+# Canvas can't list submissions commented on since a given time, so a new
+# submission comment (on a submission not otherwise changed) only shows up
+# once the next full fetch is made, up to INCREMENTAL_FULL_REFRESH later
+INCREMENTAL = False
+
+# Where incremental refresh keeps the previous run's submissions (project directory)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(ROOT), ".snapshots")
+
+# Age (seconds) after which an incremental refresh fetches every submission again
+INCREMENTAL_FULL_REFRESH = 12 * 60 * 60
+
+# Number of submission comments to buffer before aggregating them (bounds memory
+# use when reading comments)
+COMMENT_CHUNK_SIZE = 10000
+
+# Format of the output tables: "csv", "parquet" or "arrow" (parquet and arrow
+# need pyarrow)
+OUTPUT_FORMAT = "csv"
+
+# Whether to write parquet/arrow tables into one dataset partitioned by course
+# and assignment (peer_review_data/dataset/) instead of a folder per run
+PARTITION_OUTPUT = False
+
+# Whether to record per-stage timings, request counts and peak memory of each
+# run, written as peer_review_metrics.json with the output (see metrics.py)
+METRICS = False
+
+# Whether metrics trace the peak memory allocated in each stage (tracemalloc,
+# makes runs several times slower) rather than the process' max RSS
+METRICS_TRACE_MEMORY = False
+
+# Whether to print a live progress line (pages, throughput, ETA) while fetching
+PROGRESS = False
+
+# Where the resident worker (see worker.py) writes its port and secret
+WORKER_FILE = os.path.join(os.path.dirname(ROOT), ".worker.json")
+
+# Number of courses a sweep (see sweep.py) fetches from Canvas at once
+SWEEP_FETCH_WORKERS = 4
+
+# Number of processes a sweep builds reports in (None: one per CPU core)
+SWEEP_PROCESSES = None
+
+# Whether to also write the reviewer reliability table (see reliability.py)
+RELIABILITY = False
+
+# How far (in units of the typical residual) a review's score has to be from
+# the other reviews of the same work to be flagged as an outlier
+RELIABILITY_OUTLIER_Z = 3.0
+
+# Whether to also write the review coverage table (see review_graph.py)
+COVERAGE = False
+
+# Completed reviews each student's work should have; students with fewer are
+# flagged in the review coverage table
+COVERAGE_MIN_REVIEWS = 3
+
+# Whether to add every run's raw data to the history database (see history.py).
+# Off unless asked for: the database keeps student data (names, login and SIS
+# ids, reviews, comments and grades) and rows are never deleted. jobs.py,
+# sweep.py and worker.py turn it on with --history
+HISTORY = False
+
+# Where the history database lives
+HISTORY_PATH = os.path.join(os.path.dirname(ROOT), "peer_review_data", "peer_review_history.sqlite3")
+
+# Whether to checkpoint each page of long lists (submissions, peer reviews,
+# students) so a run that fails part way through resumes where it stopped
+# (see pagination.py). Off unless asked for: the pages are written to disk, and
+# a list that changes between the failed and the resumed run can come back
+# with items missing
+CHECKPOINT = False
+
+# Where page checkpoints are kept (project directory)
+CHECKPOINT_DIR = os.path.join(os.path.dirname(ROOT), ".checkpoints")
+
+# Age (seconds) after which a checkpoint is ignored and the list fetched again.
+# Checkpoints of runs that were never resumed are deleted once this old. Kept
+# short: the longer the gap, the more the list may have changed
+CHECKPOINT_MAX_AGE = 10 * 60
+
+# Number of times a page that failed with a transient error (connection error,
+# timeout, 5xx) is retried, and the base and cap (seconds) of the random,
+# growing delay between tries
+PAGE_RETRIES = 5
+PAGE_BACKOFF_BASE = 1.0
+PAGE_BACKOFF_CAP = 30.0
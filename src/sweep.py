@@ -0,0 +1,336 @@
+"""
+PEER REVIEW SCRIPT: sweep
+
+Term-wide sweep. Lists every course in an account (optionally only those in
+one enrollment term), finds each course's peer review assignments and writes
+their reports to the usual peer_review_data/<course>/ folders.
+
+Fetching is I/O bound: settings.SWEEP_FETCH_WORKERS courses are fetched at a
+time (each with settings.MAX_WORKERS requests in flight, all under the one
+rate limit budget, see throttle.py). Building the tables is CPU bound: as
+soon as a course has been fetched, its reports are built in a pool of
+settings.SWEEP_PROCESSES processes (one per core by default), so building
+overlaps with fetching the next courses. The fetched data is detached from
+canvasapi (which can't be sent to another process) before it's handed over.
+The worker processes start from a fresh import of settings, so the settings
+of this process (including any changed at runtime) are copied into each one.
+
+Progress is kept in a manifest (peer_review_data/sweeps/<sweep>/manifest.json)
+with a status per course: pending, done, skipped (no peer review
+assignments) or failed (with the error). The manifest is saved after every
+change, so a sweep that was interrupted or partly failed can be resumed:
+courses that are done or skipped are not run again.
+
+Usage:
+    python src/sweep.py --account 123 --term 45 --comments --scores
+    python src/sweep.py --resume "peer_review_data/sweeps/<sweep>/manifest.json"
+
+last edit:
+Oct 18, 2026
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from types import SimpleNamespace
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from termcolor import cprint
+
+from interface import make_canvas, get_current_user, get_assignments
+from peer_review import _fetch_report_data, _make_report
+from util import shut_down
+import settings
+
+# courses with these statuses are not run again when a sweep is resumed
+FINAL_STATUSES = ("done", "skipped")
+
+
+def main(account_id=None, term_id=None, include_comments=False, include_assignment_score=False,
+         resume_path=None):
+    """Runs (or resumes) a sweep and prints a summary.
+
+    Args:
+        account_id (int): Account whose courses to sweep (new sweeps)
+        term_id (int): (optional) Only sweep courses in this enrollment term
+        include_comments (bool): Whether to include comment data
+        include_assignment_score (bool): Whether to output the given score table
+        resume_path (string): (optional) Manifest of a sweep to resume
+
+    Returns:
+        manifest (dict): The final manifest
+    """
+    canvas = make_canvas()
+    get_current_user(canvas)
+
+    if resume_path:
+        manifest_path = resume_path
+        manifest = _load_manifest(manifest_path)
+        cprint(f"\nResuming sweep {manifest_path}", "blue")
+    else:
+        manifest = _new_manifest(canvas, account_id, term_id, include_comments, include_assignment_score)
+        manifest_path = _manifest_path(manifest)
+        _save_manifest(manifest_path, manifest)
+        cprint(f"\nSweeping {len(manifest['courses'])} courses, manifest: {manifest_path}", "blue")
+
+    _run(canvas, manifest, manifest_path)
+    _print_summary(manifest)
+    return manifest
+
+
+def _run(canvas, manifest, manifest_path):
+    """Fetches every course that isn't done (or skipped) yet and builds its
+       reports, updating (and saving) the manifest as each course finishes.
+    """
+    include_comments = manifest["include_comments"]
+    include_assignment_score = manifest["include_assignment_score"]
+    pending = [
+        course_id
+        for course_id, course in manifest["courses"].items()
+        if course["status"] not in FINAL_STATUSES
+    ]
+
+    # spawn rather than fork: the parent has threads (and open connections)
+    processes = ProcessPoolExecutor(
+        max_workers=settings.SWEEP_PROCESSES,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_apply_settings,
+        initargs=(_settings_snapshot(),),
+    )
+    fetchers = ThreadPoolExecutor(max_workers=settings.SWEEP_FETCH_WORKERS)
+
+    # every future that hasn't finished -> ("fetch" or "build", course id)
+    running = {}
+    builds_left = {}
+    with processes, fetchers:
+        for course_id in pending:
+            course = manifest["courses"][course_id]
+            course.update(status="pending", error=None, outputs=[])
+            course["started"] = time.time()
+            future = fetchers.submit(
+                _fetch_course, canvas, int(course_id), include_comments, include_assignment_score
+            )
+            running[future] = ("fetch", course_id)
+
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, course_id = running.pop(future)
+                course = manifest["courses"][course_id]
+
+                try:
+                    result = future.result()
+                except (Exception, SystemExit) as e:
+                    # shut_down has already printed its message before exiting
+                    error = "shut down" if isinstance(e, SystemExit) else (str(e) or type(e).__name__)
+                    course["error"] = course["error"] or f"{stage}: {error}"
+                    result = None
+
+                if stage == "fetch":
+                    if result is None:
+                        _finish_course(course, "failed")
+                    else:
+                        course["name"] = result["name"]
+                        course["assignments"] = result["assignments"]
+                        if not result["reports"]:
+                            _finish_course(course, "skipped")
+                        builds_left[course_id] = len(result["reports"])
+                        for report in result["reports"]:
+                            running[processes.submit(_build_report, *report)] = ("build", course_id)
+                else:
+                    course["outputs"] += result or []
+                    builds_left[course_id] -= 1
+                    if builds_left[course_id] == 0:
+                        _finish_course(course, "failed" if course["error"] else "done")
+
+                _save_manifest(manifest_path, manifest)
+
+
+def _fetch_course(canvas, course_id, include_comments, include_assignment_score):
+    """Fetches everything the reports of a course need (in a fetch thread).
+
+    Returns:
+        result (dict): 'name', 'assignments' (ids of the peer review
+                       assignments) and 'reports' (arguments for _build_report,
+                       one per assignment with peer reviews assigned)
+    """
+    course = canvas.get_course(course_id)
+    assignments = get_assignments(course, "all")
+    result = {"name": course.name, "assignments": [a.id for a in assignments], "reports": []}
+    if not assignments:
+        return result
+
+    data = _fetch_report_data(
+        course, assignments, include_comments, include_assignment_score, peer_reviews_required=False
+    )
+
+    students = [_detach(student) for student in data["students"]]
+    for assignment in assignments:
+        assignment_data = data["assignments"][assignment.id]
+        if not assignment_data["peer_reviews_json"]:
+            continue
+        result["reports"].append(
+            (
+                SimpleNamespace(id=course.id, name=course.name),
+                SimpleNamespace(id=assignment.id, name=assignment.name),
+                students,
+                _detach_assignment_data(assignment_data),
+                include_comments,
+                include_assignment_score,
+                data["sections"],
+            )
+        )
+    return result
+
+
+def _build_report(course, assignment, students, assignment_data, include_comments,
+                  include_assignment_score, sections):
+    """Builds and writes the tables of one assignment (in a worker process).
+
+    Returns:
+        output_paths (list of string): Paths of the files written
+    """
+    try:
+        return _make_report(
+            course, assignment, students, assignment_data, include_comments, include_assignment_score,
+            sections=sections,
+        )
+    except SystemExit:
+        # don't let shut_down end the worker process
+        raise RuntimeError(f"shut down building {assignment.name}")
+
+
+def _settings_snapshot():
+    """Returns the settings that can be sent to a worker process (plain
+       values; not the canvasapi objects of an interactive run).
+    """
+    return {
+        name: value
+        for name, value in vars(settings).items()
+        if name.isupper() and isinstance(value, (str, int, float, bool, list, tuple, dict, type(None)))
+    }
+
+
+def _apply_settings(snapshot):
+    """Sets the settings of a worker process to those of the sweep"""
+    for name, value in snapshot.items():
+        setattr(settings, name, value)
+
+
+def _detach(canvas_object):
+    """Copies the attributes of a canvasapi object (without its requester,
+       which holds the session and can't be sent to another process).
+    """
+    return SimpleNamespace(
+        **{key: value for key, value in vars(canvas_object).items() if not key.startswith("_")}
+    )
+
+
+def _detach_assignment_data(assignment_data):
+    detached = dict(assignment_data)
+    detached["peer_reviews_json"] = [
+        {key: value for key, value in peer_review.items() if not key.startswith("_")}
+        for peer_review in assignment_data["peer_reviews_json"]
+    ]
+    if assignment_data.get("rubric") is not None:
+        detached["rubric"] = _detach(assignment_data["rubric"])
+    if "grade_submissions" in assignment_data:
+        detached["grade_submissions"] = [
+            _detach(submission) for submission in assignment_data["grade_submissions"]
+        ]
+    return detached
+
+
+def _finish_course(course, status):
+    course["status"] = status
+    course["seconds"] = round(time.time() - course.pop("started"), 1)
+    colour = {"done": "green", "skipped": "blue", "failed": "red"}[status]
+    error = f" ({course['error']})" if course["error"] else ""
+    cprint(f"{status.upper():>8}  {course['name']}{error}", colour)
+
+
+def _new_manifest(canvas, account_id, term_id, include_comments, include_assignment_score):
+    """Lists the courses to sweep into a new manifest"""
+    try:
+        account = canvas.get_account(account_id)
+        kwargs = {"enrollment_term_id": term_id} if term_id else {}
+        courses = list(account.get_courses(**kwargs))
+    except Exception as e:
+        shut_down(f"ERROR: could not list the courses of account {account_id} ({e}).")
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "account_id": account_id,
+        "term_id": term_id,
+        "include_comments": include_comments,
+        "include_assignment_score": include_assignment_score,
+        "courses": {
+            str(course.id): {
+                "name": course.name,
+                "status": "pending",
+                "assignments": [],
+                "outputs": [],
+                "error": None,
+                "seconds": None,
+            }
+            for course in courses
+        },
+    }
+
+
+def _manifest_path(manifest):
+    stamp = datetime.fromisoformat(manifest["created_at"]).strftime("%Y-%m-%d %H %M %S")
+    term = f" term {manifest['term_id']}" if manifest["term_id"] else ""
+    return os.path.join(
+        "peer_review_data", "sweeps", f"{stamp} account {manifest['account_id']}{term}", "manifest.json"
+    )
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        shut_down(f"ERROR: could not read manifest {path} ({e}).")
+
+
+def _save_manifest(path, manifest):
+    # write to a temporary file first so a failed write never leaves a
+    # half-written manifest behind
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _print_summary(manifest):
+    statuses = [course["status"] for course in manifest["courses"].values()]
+    cprint("\nSummary:", "blue")
+    for status in ("done", "skipped", "failed", "pending"):
+        if statuses.count(status):
+            print(f"{status:>8}: {statuses.count(status)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run peer review reports for every course in an account.")
+    parser.add_argument("--account", type=int, help="account (or sub-account) id")
+    parser.add_argument("--term", type=int, help="only courses in this enrollment term")
+    parser.add_argument("--comments", action="store_true", help="include comment data")
+    parser.add_argument("--scores", action="store_true", help="include assignment scores")
+    parser.add_argument("--resume", help="manifest of a sweep to resume")
+    parser.add_argument("--history", action="store_true", help="add the runs to the history database")
+    args = parser.parse_args()
+
+    if not args.resume and args.account is None:
+        parser.error("either --account or --resume is required")
+    if args.history:
+        settings.HISTORY = True
+
+    manifest = main(args.account, args.term, args.comments, args.scores, args.resume)
+    failed = any(course["status"] not in FINAL_STATUSES for course in manifest["courses"].values())
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,257 @@
+"""
+PEER REVIEW SCRIPT: throttle
+
+Rate limit aware scheduling of Canvas API requests. Canvas rate limits each
+token with a leaky bucket: every request costs some of a quota that refills
+over time, and requests made while the quota is used up are refused with
+403 Forbidden (Rate Limit Exceeded). Each response reports what is left in
+X-Rate-Limit-Remaining (and what it cost in X-Request-Cost).
+
+A RequestBudget (one per process, shared by every fetch) decides how many
+requests may be in flight at once. It estimates the quota left from what
+recent requests cost, and holds new requests back before they would take it
+below a floor. It also grows the limit slowly while Canvas reports plenty of
+quota and halves it (and pauses) if the quota runs low anyway.
+ThrottledAdapter sends every request through the budget and retries throttled
+requests with jittered exponential backoff (or after Retry-After, if Canvas
+sends it), so running several reports at once slows them down instead of
+failing them.
+
+last edit:
+Oct 18, 2026
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from requests.adapters import HTTPAdapter
+
+
+class RequestBudget:
+    """Adaptive limit on concurrent requests, shared by every request in the
+    process.
+
+    The budget keeps its own estimate of the quota Canvas has left: it starts
+    full (capacity), each request takes its expected cost when it starts, and
+    the quota leaks back at leak_rate. A request only starts if it would leave
+    at least low_water, so requests wait before Canvas runs low rather than
+    after. A request's expected cost is the larger of what Canvas takes up
+    front while it runs and the average X-Request-Cost of recent requests.
+    Whenever a response reports X-Rate-Limit-Remaining, the estimate is reset
+    to it, less what requests sent after that one have taken (Canvas may not
+    have counted them yet).
+
+    Args:
+        max_concurrency (int): Most requests ever allowed in flight
+        low_water (float): Quota to always leave. Below this
+                           X-Rate-Limit-Remaining, the limit is also halved
+                           and new requests pause until Canvas has leaked
+                           back up to it
+        high_water (float): Above this X-Rate-Limit-Remaining, the limit grows
+        leak_rate (float): Quota Canvas gives back per second
+        capacity (float): Size of the quota (Canvas uses 700)
+        upfront_cost (float): Quota Canvas takes while a request runs (Canvas
+                              uses 50, swapped for the request's cost when it
+                              finishes)
+        cost_weight (float): Weight of the latest X-Request-Cost in the
+                             average cost
+    """
+
+    def __init__(self, max_concurrency, low_water=150.0, high_water=400.0, leak_rate=10.0,
+                 capacity=700.0, upfront_cost=50.0, cost_weight=0.2):
+        self.max_concurrency = max_concurrency
+        self.low_water = low_water
+        self.high_water = high_water
+        self.leak_rate = leak_rate
+        self.capacity = capacity
+        self.upfront_cost = upfront_cost
+        self.cost_weight = cost_weight
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self.remaining = capacity
+        # quota taken by each request in flight, by ticket (in the order sent)
+        self._reserved = {}
+        self._tickets = 0
+        # average X-Request-Cost (None until a response has reported one)
+        self.request_cost = None
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until a request may be sent.
+
+        Returns:
+            ticket (int): Identifies the request (pass to release)
+        """
+        with self._condition:
+            while True:
+                self._leak()
+                reserved = max(self.upfront_cost, self.request_cost or 0.0)
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0 and self.in_flight < max(int(self.limit), 1):
+                    # one request may always run, so an estimate that is off
+                    # can't stall every request
+                    shortfall = self.low_water + reserved - self.remaining
+                    if shortfall <= 0 or self.in_flight == 0:
+                        self.in_flight += 1
+                        self.remaining -= reserved
+                        self._tickets += 1
+                        self._reserved[self._tickets] = reserved
+                        return self._tickets
+                    wait = shortfall / self.leak_rate
+                self._condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, ticket, response=None):
+        """Marks a request as finished and adapts the limit to the quota Canvas
+        says is left and what the request cost (if the response says).
+
+        Args:
+            ticket (int): The request's ticket from acquire
+            response (Response): The response, if there was one
+        """
+        with self._condition:
+            self.in_flight -= 1
+            reserved = self._reserved.pop(ticket)
+            self._leak()
+
+            cost = _header_float(response, "X-Request-Cost")
+            if cost is not None:
+                if self.request_cost is None:
+                    self.request_cost = cost
+                else:
+                    self.request_cost += self.cost_weight * (cost - self.request_cost)
+            self.remaining = min(self.remaining + reserved - (cost or 0.0), self.capacity)
+
+            remaining = _header_float(response, "X-Rate-Limit-Remaining")
+            if remaining is not None:
+                self.remaining = remaining - sum(
+                    taken for later, taken in self._reserved.items() if later > ticket
+                )
+                if remaining < self.low_water:
+                    self.limit = max(self.limit / 2, 1.0)
+                    self._pause((self.low_water - remaining) / self.leak_rate)
+                elif remaining > self.high_water:
+                    # additive increase: about one more request per round trip
+                    self.limit = min(self.limit + 1 / self.limit, float(self.max_concurrency))
+
+            self._condition.notify_all()
+
+    def throttle(self, delay):
+        """Called when Canvas refused a request: halves the limit and pauses
+        every request for delay seconds.
+        """
+        with self._condition:
+            self.throttled += 1
+            self.limit = max(self.limit / 2, 1.0)
+            self._pause(delay)
+            self._condition.notify_all()
+
+    def _leak(self):
+        now = time.monotonic()
+        self.remaining = min(self.remaining + (now - self._updated) * self.leak_rate, self.capacity)
+        self._updated = now
+
+    def _pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class ThrottledAdapter(HTTPAdapter):
+    """HTTPAdapter that sends every request through a RequestBudget and retries
+    requests Canvas refused for rate limiting (403 Rate Limit Exceeded or 429)
+    with full jitter exponential backoff, waiting at least as long as a
+    Retry-After header asks.
+
+    Args:
+        budget (RequestBudget): Budget shared by every request in the process
+        max_retries_throttled (int): Retries before giving up on a request
+        backoff_base (float): Backoff (seconds) before the first retry
+        backoff_cap (float): Longest backoff (seconds)
+        **kwargs: Passed on to HTTPAdapter (eg. pool_maxsize)
+    """
+
+    def __init__(self, budget, max_retries_throttled=6, backoff_base=0.5, backoff_cap=30.0, **kwargs):
+        super().__init__(**kwargs)
+        self.budget = budget
+        self.max_retries_throttled = max_retries_throttled
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def send(self, request, **kwargs):
+        for attempt in range(self.max_retries_throttled + 1):
+            ticket = self.budget.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                self.budget.release(ticket)
+                raise
+            self.budget.release(ticket, response)
+
+            if not _is_throttled(response) or attempt == self.max_retries_throttled:
+                return response
+
+            response.close()
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+            # never retry sooner than Canvas asked
+            delay = max(delay, _retry_after(response) or 0.0)
+            self.budget.throttle(delay)
+
+        return response
+
+
+_shared_budget = None
+_shared_budget_lock = threading.Lock()
+
+
+def shared_budget(max_concurrency):
+    """Returns the process wide RequestBudget, creating it on first use.
+
+    Args:
+        max_concurrency (int): Most requests allowed in flight (only used when
+                               the budget is created)
+    """
+    global _shared_budget
+    with _shared_budget_lock:
+        if _shared_budget is None:
+            _shared_budget = RequestBudget(max_concurrency)
+        return _shared_budget
+
+
+def _is_throttled(response):
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and b"Rate Limit Exceeded" in response.content
+
+
+def _retry_after(response):
+    """Seconds the response's Retry-After header asks to wait (it is either
+    a number of seconds or an HTTP date), or None
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _header_float(response, name):
+    if response is None:
+        return None
+    try:
+        return float(response.headers[name])
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,217 @@
+"""
+PEER REVIEW SCRIPT: worker
+
+Resident report worker. Starting a report from scratch means importing
+pandas, canvasapi and friends, creating a Canvas client and checking the
+token, which for a small assignment takes longer than the report itself. The
+worker does that once and then runs reports sent to it over a local socket,
+keeping the Canvas client (with its keep-alive connections, response cache
+and rate limit budget) warm between them.
+
+Reports run concurrently, each in its own thread. Everything a report needs
+is passed to it (see jobs.run_job); the worker never sets the settings
+globals that the interactive script uses.
+
+The worker listens on 127.0.0.1 only. Its port and a random secret, which
+every request has to include, are written to settings.WORKER_FILE (readable
+by the current user only); the client reads them from there. The client
+imports nothing heavy, so it starts instantly.
+
+Usage:
+    python src/worker.py serve
+    python src/worker.py run 12345 678,679 --comments --scores
+    python src/worker.py run 12345 all
+    python src/worker.py stop
+
+last edit:
+Oct 18, 2026
+"""
+
+import argparse
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+
+import settings
+
+# requests are a single line of JSON
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+def serve(port=0):
+    """Starts the worker and serves requests until it is sent 'stop'.
+
+    Args:
+        port (int): Port to listen on (0 picks a free one)
+    """
+    # the heavy imports happen once, here, rather than in the client
+    from termcolor import cprint
+
+    from interface import make_canvas, get_current_user
+    from jobs import run_job
+
+    if settings.OUTPUT_FORMAT != "csv":
+        import pyarrow  # noqa: F401 (warm up the import used by the first report)
+
+    canvas = make_canvas()
+    get_current_user(canvas)
+
+    secret = secrets.token_hex(16)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            # every reply is a line of JSON, even to a request that isn't, so
+            # the client never waits on (or tries to decode) an empty line
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if len(line) > MAX_REQUEST_BYTES:
+                # drop the rest of it, as closing with unread data resets the
+                # connection and the client may lose the reply
+                while line and not line.endswith(b"\n"):
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                return self._reply(
+                    {"success": False, "error": f"request is over {MAX_REQUEST_BYTES} bytes"}
+                )
+            try:
+                request = json.loads(line)
+            except ValueError:
+                return self._reply({"success": False, "error": "request is not valid JSON"})
+            if not isinstance(request, dict):
+                return self._reply({"success": False, "error": "request is not a JSON object"})
+
+            if not secrets.compare_digest(str(request.get("secret", "")), secret):
+                return self._reply({"success": False, "error": "wrong secret"})
+
+            action = request.get("action")
+            if action == "ping":
+                self._reply({"success": True})
+            elif action == "stop":
+                self._reply({"success": True})
+                threading.Thread(target=self.server.shutdown).start()
+            elif action == "report":
+                job = request.get("job")
+                if not isinstance(job, dict) or "course" not in job:
+                    return self._reply(
+                        {"success": False, "error": "report request has no job with a course"}
+                    )
+                self._reply(run_job(canvas, job))
+            else:
+                self._reply({"success": False, "error": f"unknown action {action}"})
+
+        def _reply(self, response):
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+
+    _write_worker_file(server.server_address[1], secret)
+    cprint(f"\nWorker listening on 127.0.0.1:{server.server_address[1]}", "green")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        _remove_worker_file()
+        cprint("Worker stopped", "blue")
+
+
+def send(request, timeout=None):
+    """Sends a request to the running worker and returns its response.
+
+    Args:
+        request (dict): 'action' ('report', 'ping' or 'stop') and for reports
+                        'job' (see jobs.py for its fields)
+        timeout (float): (optional) Seconds to wait for the response
+
+    Returns:
+        response (dict): 'success' and for reports the jobs.run_job result
+    """
+    try:
+        with open(settings.WORKER_FILE) as f:
+            worker = json.load(f)
+    except (OSError, ValueError):
+        raise ConnectionError("No worker running (start one with: python src/worker.py serve)")
+
+    with socket.create_connection(("127.0.0.1", worker["port"]), timeout=timeout) as connection:
+        connection.sendall(json.dumps({**request, "secret": worker["secret"]}).encode() + b"\n")
+        with connection.makefile("rb") as response:
+            line = response.readline()
+    if not line:
+        raise ConnectionError("The worker closed the connection without replying")
+    return json.loads(line)
+
+
+def _write_worker_file(port, secret):
+    # readable by the current user only, so other users can't send requests
+    descriptor = os.open(settings.WORKER_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w") as f:
+        json.dump({"port": port, "secret": secret, "pid": os.getpid()}, f)
+
+
+def _remove_worker_file():
+    try:
+        os.remove(settings.WORKER_FILE)
+    except OSError:
+        pass
+
+
+def _parse_assignments(assignments):
+    if assignments.strip().lower() == "all":
+        return "all"
+    return [int(number) for number in assignments.split(",") if number.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run peer review reports in a resident worker.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="start the worker")
+    serve_parser.add_argument("--port", type=int, default=0)
+    serve_parser.add_argument("--history", action="store_true", help="add the runs to the history database")
+
+    run_parser = commands.add_parser("run", help="run a report in the worker")
+    run_parser.add_argument("course", type=int)
+    run_parser.add_argument("assignments", help="assignment ids separated by commas, or 'all'")
+    run_parser.add_argument("--comments", action="store_true", help="include comment data")
+    run_parser.add_argument("--scores", action="store_true", help="include assignment scores")
+
+    commands.add_parser("ping", help="check the worker is running")
+    commands.add_parser("stop", help="stop the worker")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        if args.history:
+            settings.HISTORY = True
+        serve(args.port)
+        sys.exit(0)
+
+    request = {"action": args.command}
+    if args.command == "run":
+        request = {
+            "action": "report",
+            "job": {
+                "course": args.course,
+                "assignments": _parse_assignments(args.assignments),
+                "include_comments": args.comments,
+                "include_assignment_score": args.scores,
+            },
+        }
+
+    try:
+        response = send(request)
+    except (ConnectionError, OSError) as e:
+        print(e)
+        sys.exit(1)
+
+    if not response["success"]:
+        print(f"FAILED: {response['error']}")
+        sys.exit(1)
+
+    for output in response.get("outputs", []):
+        print(output)
+    if args.command == "run":
+        print(f"({response['seconds']:.1f}s)")
+    elif args.command == "ping":
+        print("Worker is running")
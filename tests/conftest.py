@@ -0,0 +1,60 @@
+"""
+Shared fixtures for the tests. The tests run the scripts in /src against the
+local mock Canvas API (benchmarks/mock_canvas.py) serving a small synthetic
+course, so they need no Canvas instance or network access.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+import settings
+import throttle
+from mock_canvas import MockCanvas
+from synthetic import generate_course
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path):
+    """Keeps every file the scripts write (cache, snapshots, checkpoints,
+       history) inside the test's temporary directory, and undoes any change
+       a test makes to settings.
+    """
+    saved = {name: value for name, value in vars(settings).items() if name.isupper()}
+    settings.CACHE_DIR = str(tmp_path / "http_cache")
+    settings.SNAPSHOT_DIR = str(tmp_path / "snapshots")
+    settings.CHECKPOINT_DIR = str(tmp_path / "checkpoints")
+    settings.HISTORY_PATH = str(tmp_path / "history.sqlite3")
+    settings.WORKER_FILE = str(tmp_path / "worker.json")
+    # the rate limit budget is shared by the whole process
+    throttle._shared_budget = None
+
+    yield
+
+    for name, value in saved.items():
+        setattr(settings, name, value)
+    throttle._shared_budget = None
+
+
+@pytest.fixture
+def mock_canvas():
+    """Returns a function starting a mock Canvas (keyword arguments are passed
+       to MockCanvas) that serves a synthetic course of 60 students. Servers
+       are shut down after the test.
+    """
+    servers = []
+
+    def start(num_students=60, **kwargs):
+        server = MockCanvas(generate_course(num_students), **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
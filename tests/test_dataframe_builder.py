@@ -0,0 +1,195 @@
+"""
+Tests of the table builders (dataframe_builder.py) on small fixed inputs.
+"""
+
+import math
+from types import SimpleNamespace
+
+import pandas as pd
+
+from dataframe_builder import (
+    attach_submission_comments,
+    make_assessments_df,
+    make_comments_df,
+    make_overview_df,
+)
+
+
+def test_comments_without_author():
+    # Canvas sends no author_id for deleted or anonymized users
+    submissions = [
+        SimpleNamespace(user_id=1, submission_comments=[
+            {"author_id": None, "comment": "x"},
+            {"author_id": 2, "comment": "first"},
+            {"author_id": 2, "comment": "second"},
+        ]),
+        SimpleNamespace(user_id=2, submission_comments=None),
+    ]
+    comments_df = make_comments_df(iter(submissions), chunk_size=2)
+
+    assert comments_df["comment"].tolist() == ["x", "first", "second"]
+    assert comments_df["author_id"].isna().tolist() == [True, False, False]
+    assert comments_df["author_id"].dtype == "Int64"
+
+    assessments_df = pd.DataFrame({"user_id": [1, 2], "assessor_id": [2, 1]})
+    attached_df = attach_submission_comments(assessments_df, comments_df)
+    assert attached_df["Submission Comments"][0] == ["first", "second"]
+    assert pd.isna(attached_df["Submission Comments"][1])
+
+
+def _student(user_id, name):
+    return SimpleNamespace(id=user_id, name=name, sis_user_id=f"s{user_id}")
+
+
+# 98 and 99 aren't students in the course
+STUDENTS = [_student(1, "Ann"), _student(2, "Ben"), _student(3, "Cat"), _student(4, "Dan")]
+
+PEER_REVIEWS = [
+    {"user_id": 1, "assessor_id": 2, "asset_id": 101, "workflow_state": "completed"},
+    {"user_id": 1, "assessor_id": 3, "asset_id": 101, "workflow_state": "completed"},
+    {"user_id": 2, "assessor_id": 1, "asset_id": 102, "workflow_state": "assigned"},
+    {"user_id": 3, "assessor_id": 4, "asset_id": 103, "workflow_state": "completed"},
+    {"user_id": 99, "assessor_id": 1, "asset_id": 199, "workflow_state": "completed"},
+    {"user_id": 4, "assessor_id": 98, "asset_id": 104, "workflow_state": "completed"},
+]
+
+RUBRIC = SimpleNamespace(
+    points_possible=10.0,
+    data=[
+        {"id": "c1", "description": "Clarity", "points": 5.0},
+        {"id": "c2", "description": "Depth", "points": 5.0},
+    ],
+)
+
+
+def _assessments():
+    return [
+        {"assessor_id": 2, "artifact_id": 101, "score": 8.0, "data": [
+            {"criterion_id": "c1", "points": 4.0, "comments": "clear"},
+            {"criterion_id": "c2", "points": 4.0, "comments": ""},
+        ]},
+        # NaN and text points are left blank
+        {"assessor_id": 3, "artifact_id": 101, "score": 6.0, "data": [
+            {"criterion_id": "c1", "points": math.nan, "comments": None},
+            {"criterion_id": "c2", "points": "4", "comments": "shallow"},
+        ]},
+        {"assessor_id": 4, "artifact_id": 103, "score": 5.0, "data": []},
+        {"assessor_id": 1, "artifact_id": 199, "score": 9.0, "data": [
+            {"criterion_id": "c1", "points": 5.0, "comments": "great"},
+            {"criterion_id": "c2", "points": 4.0, "comments": "deep"},
+        ]},
+        {"assessor_id": 98, "artifact_id": 104, "score": 3.0, "data": [
+            {"criterion_id": "c2", "points": 3.0, "comments": "ok"},
+        ]},
+    ]
+
+
+def _submissions():
+    comments = {
+        1: [(2, "nice"), (2, "more"), (3, "meh"), (None, "anon")],
+        2: None,
+        3: [(4, "hi")],
+    }
+    return iter([
+        SimpleNamespace(user_id=user_id, submission_comments=None if pairs is None else [
+            {"author_id": author_id, "comment": comment} for author_id, comment in pairs
+        ])
+        for user_id, pairs in comments.items()
+    ])
+
+
+def _dtypes(df):
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def test_assessments_table():
+    assessments_df = make_assessments_df(_assessments(), PEER_REVIEWS, STUDENTS, RUBRIC, True)
+    assessments_df = attach_submission_comments(assessments_df, make_comments_df(_submissions()))
+
+    assert assessments_df.to_csv(index=False) == (
+        "user_id,assessor_id,State,Assessor,Assessee,Total Score (10.0),Clarity (5.0),"
+        "Depth (5.0),Clarity comment,Depth comment,Submission Comments\n"
+        "1,2,completed,Ben,Ann,8.0,4.0,4.0,clear,,\"['nice', 'more']\"\n"
+        "1,3,completed,Cat,Ann,6.0,,,,shallow,['meh']\n"
+        "2,1,assigned,Ann,Ben,,,,,,\n"
+        "3,4,completed,Dan,Cat,5.0,,,,,['hi']\n"
+        "99,1,completed,Ann,User Not Found,9.0,5.0,4.0,great,deep,\n"
+        "4,98,completed,User Not Found,Dan,3.0,,3.0,,ok,\n"
+    )
+    assert _dtypes(assessments_df) == {
+        "user_id": "int64",
+        "assessor_id": "int64",
+        "State": "category",
+        "Assessor": "category",
+        "Assessee": "category",
+        "Total Score (10.0)": "float64",
+        "Clarity (5.0)": "float32",
+        "Depth (5.0)": "float32",
+        "Clarity comment": "str",
+        "Depth comment": "str",
+        "Submission Comments": "object",
+    }
+
+
+def test_assessments_table_without_rubric():
+    assessments_df = make_assessments_df([], PEER_REVIEWS, STUDENTS, None, False)
+
+    assert assessments_df.to_csv(index=False) == (
+        "user_id,assessor_id,State,Assessor,Assessee\n"
+        "1,2,completed,Ben,Ann\n"
+        "1,3,completed,Cat,Ann\n"
+        "2,1,assigned,Ann,Ben\n"
+        "3,4,completed,Dan,Cat\n"
+        "99,1,completed,Ann,User Not Found\n"
+        "4,98,completed,User Not Found,Dan\n"
+    )
+    assert _dtypes(assessments_df) == {
+        "user_id": "int64",
+        "assessor_id": "int64",
+        "State": "category",
+        "Assessor": "category",
+        "Assessee": "category",
+    }
+
+
+def test_assessments_table_with_no_criteria_data():
+    assessments_json = [dict(assessment, data=[]) for assessment in _assessments()]
+    assessments_df = make_assessments_df(assessments_json, PEER_REVIEWS, STUDENTS, RUBRIC, True)
+
+    assert list(assessments_df.columns) == [
+        "user_id", "assessor_id", "State", "Assessor", "Assessee", "Total Score (10.0)",
+    ]
+    assert assessments_df["Total Score (10.0)"].tolist()[:2] == [8.0, 6.0]
+
+
+def test_overview_table():
+    assessments_df = make_assessments_df(_assessments(), PEER_REVIEWS, STUDENTS, RUBRIC, False)
+    overview_df = make_overview_df(assessments_df, PEER_REVIEWS, STUDENTS)
+
+    # a review not yet completed still takes a (blank) review number
+    assert overview_df.to_csv(index=False) == (
+        "user_id,Name,Num Assigned Peer Reviews,Num Completed Peer Reviews,Review: 1,Review: 2\n"
+        "1,Ann,2,1,8.0,6.0\n"
+        "2,Ben,1,1,,\n"
+        "3,Cat,1,1,5.0,\n"
+        "4,Dan,1,1,3.0,\n"
+    )
+    assert _dtypes(overview_df) == {
+        "user_id": "int64",
+        "Name": "category",
+        "Num Assigned Peer Reviews": "int32",
+        "Num Completed Peer Reviews": "int32",
+        "Review: 1": "float64",
+        "Review: 2": "float64",
+    }
+
+
+def test_overview_table_without_rubric():
+    assessments_df = make_assessments_df([], PEER_REVIEWS, STUDENTS, None, False)
+    overview_df = make_overview_df(assessments_df, PEER_REVIEWS, STUDENTS)
+
+    assert list(overview_df.columns) == [
+        "user_id", "Name", "Num Assigned Peer Reviews", "Num Completed Peer Reviews",
+    ]
+    assert overview_df["Num Assigned Peer Reviews"].tolist() == [2, 1, 1, 1]
+    assert overview_df["Num Completed Peer Reviews"].tolist() == [1, 1, 1, 1]
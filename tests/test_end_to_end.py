@@ -0,0 +1,78 @@
+"""
+Runs whole reports against the mock Canvas.
+"""
+
+import glob
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import bench_end_to_end
+import settings
+
+
+def _tables(result):
+    return {
+        os.path.basename(path): path
+        for path in glob.glob(os.path.join(result["output_dir"], "**", "*.csv"), recursive=True)
+    }
+
+
+def test_report_writes_tables(mock_canvas):
+    server = mock_canvas()
+    result = bench_end_to_end.run(server, include_comments=True, include_assignment_score=True)
+
+    tables = _tables(result)
+    assert {
+        "peer_review_assessments.csv",
+        "peer_review_overview.csv",
+        "peer_review_given_score.csv",
+    } <= set(tables)
+
+    # optional tables are only written when turned on
+    assert "peer_review_reliability.csv" not in tables
+    assert "peer_review_coverage.csv" not in tables
+    assert "sections" not in result["requests_by_endpoint"]
+
+    overview_df = pd.read_csv(tables["peer_review_overview.csv"])
+    assert len(overview_df) == len(server.data["users"])
+    assessments_df = pd.read_csv(tables["peer_review_assessments.csv"])
+    assert len(assessments_df) == len(server.data["peer_reviews"])
+    # the history (student data) is only kept when asked for
+    assert not os.path.exists(os.path.join(result["output_dir"], "peer_review_history.sqlite3"))
+
+
+def test_reliability_table_when_turned_on(mock_canvas):
+    server = mock_canvas()
+    settings.RELIABILITY = True
+    result = bench_end_to_end.run(server, include_comments=False, include_assignment_score=False)
+
+    reliability_df = pd.read_csv(_tables(result)["peer_review_reliability.csv"])
+    assert len(reliability_df) > 0
+
+
+def test_coverage_table_when_turned_on(mock_canvas):
+    server = mock_canvas()
+    settings.COVERAGE = True
+    result = bench_end_to_end.run(server, include_comments=False, include_assignment_score=False)
+
+    coverage_df = pd.read_csv(_tables(result)["peer_review_coverage.csv"])
+    assert len(coverage_df) == len(server.data["users"])
+    assert result["requests_by_endpoint"]["sections"] == 1
+
+
+def test_repeat_run_uses_cache(mock_canvas):
+    server = mock_canvas()
+    first = bench_end_to_end.run(server, False, False, use_cache=True)
+    second = bench_end_to_end.run(server, False, False, use_cache=True)
+
+    assert first["requests_by_endpoint"]["users"] > 0
+    # the roster is reused for hours, but the token is checked on every run
+    assert "users" not in second["requests_by_endpoint"]
+    assert second["requests_by_endpoint"]["user_self"] == 1
+    assert _table_contents(first) == _table_contents(second)
+
+
+def _table_contents(result):
+    return {name: Path(path).read_text() for name, path in _tables(result).items()}
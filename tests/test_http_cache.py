@@ -0,0 +1,72 @@
+"""
+Tests of the response cache (http_cache.py).
+"""
+
+import glob
+import os
+from pathlib import Path
+
+import requests
+
+import bench_end_to_end
+from http_cache import CachingAdapter, ResponseCache
+
+
+def _session(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), 10 * 1024 * 1024, [(r"/users", 60)])
+    session = requests.Session()
+    session.mount("http://", CachingAdapter(requests.adapters.HTTPAdapter(), cache))
+    return session
+
+
+def test_repeat_run_takes_rubric_from_cache(mock_canvas):
+    server = mock_canvas()
+    first = bench_end_to_end.run(server, False, False, use_cache=True)
+    second = bench_end_to_end.run(server, False, False, use_cache=True)
+
+    assert first["requests_by_endpoint"]["rubric"] == 1
+    # the rubric is streamed, and stored once it has been read
+    assert "rubric" not in second["requests_by_endpoint"]
+
+
+def test_rubric_assessments_are_revalidated(mock_canvas):
+    server = mock_canvas()
+    first = bench_end_to_end.run(server, False, False, use_cache=True)
+    # a student completes a review: the overview must not show it as
+    # completed without its score
+    assessment = next(
+        a for a in server.data["rubric"]["assessments"] if a["assessment_type"] == "peer_review"
+    )
+    assessment["score"] = 0.25
+    second = bench_end_to_end.run(server, False, False, use_cache=True)
+    third = bench_end_to_end.run(server, False, False, use_cache=True)
+
+    assert second["requests_by_endpoint"]["rubric_assessments"] == 1
+    assert "0.25" not in _table_contents(first)["peer_review_assessments.csv"]
+    assert "0.25" in _table_contents(second)["peer_review_assessments.csv"]
+    # unchanged since, so Canvas only confirms the cached copy
+    assert third["not_modified"] >= 1
+    assert _table_contents(second) == _table_contents(third)
+
+
+def test_streamed_response_is_stored_once_read(mock_canvas, tmp_path):
+    server = mock_canvas()
+    session = _session(tmp_path)
+    course_id = server.data["course"]["id"]
+    url = f"{server.url}/api/v1/courses/{course_id}/users"
+
+    # a body read only in part isn't stored
+    with session.get(url, stream=True) as response:
+        next(response.iter_content(chunk_size=16))
+    assert not getattr(session.get(url, stream=True), "from_cache", False)
+
+    streamed = session.get(url, stream=True)
+    body = b"".join(streamed.iter_content(chunk_size=16))
+    cached = session.get(url, stream=True)
+    assert cached.from_cache
+    assert cached.content == body
+
+
+def _table_contents(result):
+    paths = glob.glob(os.path.join(result["output_dir"], "**", "*.csv"), recursive=True)
+    return {os.path.basename(path): Path(path).read_text() for path in paths}
@@ -0,0 +1,64 @@
+"""
+Tests of incremental refresh (incremental.py).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import incremental
+import interface
+import settings
+from peer_review import SUBMISSION_FIELDS
+
+
+def test_concurrent_snapshot_saves(tmp_path):
+    path = os.path.join(settings.SNAPSHOT_DIR, "1_2_submission_comments.json")
+    snapshots = [
+        {"fetched_at": str(run), "submissions": [{"id": i, "run": run} for i in range(20000)]}
+        for run in range(8)
+    ]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda snapshot: incremental._save_snapshot(path, snapshot), snapshots))
+
+    # one run's snapshot, whole, and no temporary files left behind
+    assert incremental._load_snapshot(path) in snapshots
+    assert os.listdir(settings.SNAPSHOT_DIR) == [os.path.basename(path)]
+
+
+def test_changed_submissions_replace_stored_ones(mock_canvas, monkeypatch):
+    server = mock_canvas()
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    course = interface.make_canvas().get_course(server.data["course"]["id"])
+    assignment = course.get_assignment(server.data["assignment"]["id"])
+    include = ["user"]
+
+    first = incremental.get_submissions(course, assignment, include, SUBMISSION_FIELDS)
+
+    # a submission is regraded after the first run
+    regraded = server.data["submissions"][3]
+    regraded["score"] = 0.25
+    regraded["graded_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    server.reset_stats()
+    second = incremental.get_submissions(course, assignment, include, SUBMISSION_FIELDS)
+
+    # only the changed submissions are fetched, and only the regraded one changes
+    requests_by_endpoint = server.stats()["requests_by_endpoint"]
+    assert "submissions" not in requests_by_endpoint
+    assert requests_by_endpoint["student_submissions"] == 2
+    assert len(second) == len(first)
+    changed = [
+        (before.id, after.score)
+        for before, after in zip(first, second)
+        if vars(before) != vars(after)
+    ]
+    assert changed == [(regraded["id"], 0.25)]
+
+    # past settings.INCREMENTAL_FULL_REFRESH every submission is fetched again
+    settings.INCREMENTAL_FULL_REFRESH = 0
+    server.reset_stats()
+    third = incremental.get_submissions(course, assignment, include, SUBMISSION_FIELDS)
+    assert server.stats()["requests_by_endpoint"]["submissions"] >= 1
+    assert [vars(submission) for submission in third] == [vars(submission) for submission in second]
@@ -0,0 +1,68 @@
+"""
+Tests of per-stage metrics (metrics.py) against the mock Canvas.
+"""
+
+import glob
+import json
+import math
+
+import interface
+import peer_review
+import settings
+from metrics import Recorder
+
+
+def _course(server, monkeypatch):
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    return interface.make_canvas().get_course(server.data["course"]["id"])
+
+
+def test_requests_are_counted_per_stage(mock_canvas, monkeypatch):
+    server = mock_canvas(max_page_size=20)
+    course = _course(server, monkeypatch)
+    session = course._requester._session
+    assignment_id = server.data["assignment"]["id"]
+    recorder = Recorder(metrics=True)
+    recorder.attach(session)
+
+    with recorder.stage("assignment") as assignment_stage:
+        course.get_assignment(assignment_id)
+        course.get_assignment(assignment_id)
+    with recorder.stage("users") as users_stage:
+        users = list(course.get_users(per_page=20))
+    # not made in a stage, so not counted
+    course.get_assignment(assignment_id)
+
+    recorder.detach()
+    with recorder.stage("detached") as detached_stage:
+        course.get_assignment(assignment_id)
+
+    pages = math.ceil(len(users) / 20)
+    assert pages > 1
+    assert (assignment_stage.requests, assignment_stage.pages) == (2, 0)
+    assert (users_stage.requests, users_stage.pages) == (pages, pages)
+    assert users_stage.bytes > assignment_stage.bytes > 0
+    assert detached_stage.requests == 0
+    assert session.hooks["response"] == []
+
+
+def test_report_removes_its_hook(mock_canvas, monkeypatch, tmp_path):
+    server = mock_canvas()
+    course = _course(server, monkeypatch)
+    assignment = course.get_assignment(server.data["assignment"]["id"])
+    monkeypatch.chdir(tmp_path)
+    settings.METRICS = True
+    server.reset_stats()
+
+    peer_review.run_report(course, [assignment], False, False)
+
+    assert course._requester._session.hooks["response"] == []
+    (metrics_path,) = glob.glob(str(tmp_path / "**" / "peer_review_metrics.json"), recursive=True)
+    with open(metrics_path) as f:
+        metrics = json.load(f)
+    stages = {stage["stage"]: stage for stage in metrics["stages"]}
+    requests_by_endpoint = server.stats()["requests_by_endpoint"]
+    assert stages["get_students"]["requests"] == requests_by_endpoint["users"]
+    assert stages["get_peer_reviews"]["requests"] == requests_by_endpoint["peer_reviews"]
+    assert metrics["totals"]["requests"] == server.stats()["requests"]
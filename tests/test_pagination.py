@@ -0,0 +1,98 @@
+"""
+Tests of checkpointed pagination (pagination.py): runs that fail part way
+through a list against the mock Canvas.
+"""
+
+import glob
+import math
+import os
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import bench_end_to_end
+import pagination
+import settings
+
+
+def test_failed_run_resumes_from_checkpoint(mock_canvas):
+    server = mock_canvas(max_page_size=20)
+    pages = math.ceil(len(server.data["peer_reviews"]) / 20)
+    assert pages > 5
+    clean = bench_end_to_end.run(server, False, False)
+
+    # the 5th page of peer reviews fails, and isn't retried
+    settings.CHECKPOINT = True
+    settings.PAGE_RETRIES = 0
+    server.fail_after = {re.compile(r"/peer_reviews"): 4}
+    with pytest.raises(SystemExit):
+        bench_end_to_end.run(server, False, False)
+    assert len(os.listdir(settings.CHECKPOINT_DIR)) == 1
+
+    server.fail_after = {}
+    resumed = bench_end_to_end.run(server, False, False)
+
+    # only the pages after the 4 checkpointed ones are fetched again
+    assert resumed["requests_by_endpoint"]["peer_reviews"] == pages - 4
+    assert _table_contents(resumed) == _table_contents(clean)
+    assert os.listdir(settings.CHECKPOINT_DIR) == []
+
+
+def test_resume_drops_items_fetched_twice(mock_canvas):
+    server = mock_canvas(max_page_size=20)
+    peer_reviews = server.data["peer_reviews"]
+    settings.CHECKPOINT = True
+    settings.PAGE_RETRIES = 0
+    server.fail_after = {re.compile(r"/peer_reviews"): 4}
+    with pytest.raises(SystemExit):
+        bench_end_to_end.run(server, False, False)
+
+    # a review assigned in between moves every later review one place on, so
+    # the first review of the next page was on the last checkpointed page
+    peer_reviews.insert(0, dict(peer_reviews[-1], asset_id=999999))
+    server.fail_after = {}
+    resumed = bench_end_to_end.run(server, False, False)
+
+    assessments_df = pd.read_csv(_tables(resumed)["peer_review_assessments.csv"])
+    assert not assessments_df.duplicated().any()
+    # the new review was on a page already fetched
+    assert len(assessments_df) == len(peer_reviews) - 1
+
+
+def test_transient_failure_is_retried(mock_canvas):
+    server = mock_canvas(max_page_size=20, fail_after={r"/peer_reviews": 2})
+    settings.PAGE_BACKOFF_BASE = 0.01
+    result = bench_end_to_end.run(server, False, False)
+
+    assert result["failed"] == 1
+    assert len(_table_contents(result)) > 0
+
+
+def test_stale_checkpoints_are_removed(mock_canvas, monkeypatch):
+    monkeypatch.setattr(pagination, "_swept", set())
+    settings.CHECKPOINT = True
+    os.makedirs(settings.CHECKPOINT_DIR)
+    stale = os.path.join(settings.CHECKPOINT_DIR, "stale.jsonl")
+    recent = os.path.join(settings.CHECKPOINT_DIR, "recent.jsonl")
+    for path in (stale, recent):
+        with open(path, "w") as f:
+            f.write("{}\n")
+    old = time.time() - settings.CHECKPOINT_MAX_AGE - 60
+    os.utime(stale, (old, old))
+
+    bench_end_to_end.run(mock_canvas(), False, False)
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(recent)
+
+
+def _tables(result):
+    paths = glob.glob(os.path.join(result["output_dir"], "**", "*.csv"), recursive=True)
+    return {os.path.basename(path): path for path in paths}
+
+
+def _table_contents(result):
+    return {name: Path(path).read_text() for name, path in _tables(result).items()}
@@ -0,0 +1,57 @@
+"""
+Runs term-wide sweeps (sweep.py) against the mock Canvas.
+"""
+
+import glob
+import sqlite3
+
+import interface
+import settings
+import sweep
+
+
+def test_sweep_workers_use_runtime_settings(mock_canvas, monkeypatch, tmp_path):
+    server = mock_canvas(num_courses=2)
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    monkeypatch.chdir(tmp_path)
+    # changed at runtime, after the worker processes' settings were imported
+    settings.SWEEP_PROCESSES = 2
+    settings.OUTPUT_FORMAT = "parquet"
+    settings.HISTORY = True
+    settings.HISTORY_PATH = str(tmp_path / "sweep_history.sqlite3")
+
+    manifest = sweep.main(account_id=1)
+
+    assert [course["status"] for course in manifest["courses"].values()] == ["done", "done"]
+    outputs = [path for course in manifest["courses"].values() for path in course["outputs"]]
+    assert outputs and all(path.endswith(".parquet") for path in outputs)
+    assert not glob.glob(str(tmp_path / "peer_review_data" / "**" / "*.csv"), recursive=True)
+    with sqlite3.connect(settings.HISTORY_PATH) as connection:
+        (runs,) = connection.execute("SELECT COUNT(*) FROM runs").fetchone()
+    assert runs == 2
+
+
+def test_resume_leaves_out_skipped_courses(mock_canvas, monkeypatch, tmp_path):
+    server = mock_canvas(num_courses=3)
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    monkeypatch.chdir(tmp_path)
+    settings.SWEEP_PROCESSES = 1
+
+    manifest = sweep.main(account_id=1)
+    done, skipped, failed = manifest["courses"]
+    # as if the second course had no peer review assignments and the third
+    # had failed
+    manifest["courses"][skipped]["status"] = "skipped"
+    manifest["courses"][failed].update(status="failed", error="fetch: timed out", outputs=[])
+    manifest_path = sweep._manifest_path(manifest)
+    sweep._save_manifest(manifest_path, manifest)
+    server.reset_stats()
+
+    resumed = sweep.main(resume_path=manifest_path)
+
+    # only the failed course is fetched again
+    assert server.stats()["requests_by_endpoint"]["course"] == 1
+    assert [course["status"] for course in resumed["courses"].values()] == ["done", "skipped", "done"]
+    assert resumed["courses"][failed]["outputs"]
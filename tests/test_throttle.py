@@ -0,0 +1,76 @@
+"""
+Tests of rate limit aware scheduling (throttle.py) against the mock Canvas'
+leaky bucket rate limit.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+import interface
+import settings
+import throttle
+from mock_canvas import LeakyBucket
+
+
+def test_concurrent_requests_are_not_throttled(mock_canvas, monkeypatch):
+    # Canvas' bucket: 700 units leaking at 10 a second, 50 taken up front
+    server = mock_canvas(latency=0.05, rate_limit=LeakyBucket())
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    settings.HTTP_CACHE = False
+    settings.MAX_WORKERS = 16
+
+    canvas = interface.make_canvas()
+    course = canvas.get_course(server.data["course"]["id"])
+    with ThreadPoolExecutor(max_workers=settings.MAX_WORKERS) as executor:
+        assignments = list(
+            executor.map(lambda _: course.get_assignment(server.data["assignment"]["id"]), range(100))
+        )
+
+    assert len(assignments) == 100
+    assert server.stats()["throttled"] == 0
+    assert throttle._shared_budget.throttled == 0
+    assert throttle._shared_budget.request_cost > 0
+
+
+def test_budget_reserves_the_average_request_cost():
+    budget = throttle.RequestBudget(4, leak_rate=0.0)
+    ticket = budget.acquire()
+    budget.release(ticket, _response({"X-Request-Cost": "100"}))
+    budget.remaining = 700.0
+
+    # each request now takes 100 rather than 50: (700 - 150) // 100 fit
+    tickets = [budget.acquire() for _ in range(4)]
+    assert budget.remaining == 300.0
+    for ticket in tickets:
+        budget.release(ticket)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("3", 3.0),
+        ("-1", 0.0),
+        ("soon", None),
+    ],
+)
+def test_retry_after_seconds(value, expected):
+    assert throttle._retry_after(_response({"Retry-After": value}, status_code=429)) == expected
+
+
+def test_retry_after_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    response = _response({"Retry-After": format_datetime(when, usegmt=True)}, status_code=429)
+    # the date is given to the second
+    assert throttle._retry_after(response) == pytest.approx(30.0, abs=1.5)
+
+
+def _response(headers, status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    return response
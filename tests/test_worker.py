@@ -0,0 +1,78 @@
+"""
+Tests of the resident report worker (worker.py) against the mock Canvas.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import interface
+import settings
+import worker
+
+
+@pytest.fixture
+def running_worker(mock_canvas, monkeypatch, tmp_path):
+    server = mock_canvas()
+    monkeypatch.setattr(interface, "URL", server.url)
+    monkeypatch.setattr(interface, "KEY", "mock-token")
+    monkeypatch.chdir(tmp_path)
+
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(settings.WORKER_FILE):
+        assert time.monotonic() < deadline, "worker didn't start"
+        time.sleep(0.05)
+
+    yield server
+
+    worker.send({"action": "stop"}, timeout=10)
+    thread.join(timeout=10)
+
+
+def _send_line(line):
+    with open(settings.WORKER_FILE) as f:
+        port = json.load(f)["port"]
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as connection:
+        connection.sendall(line)
+        with connection.makefile("rb") as response:
+            return json.loads(response.readline())
+
+
+def test_report_job(running_worker):
+    server = running_worker
+    response = worker.send(
+        {
+            "action": "report",
+            "job": {
+                "course": server.data["course"]["id"],
+                "assignments": [server.data["assignment"]["id"]],
+            },
+        },
+        timeout=60,
+    )
+
+    assert response["success"], response
+    assert response["outputs"] and all(os.path.isfile(path) for path in response["outputs"])
+
+
+def test_malformed_requests_get_an_error_reply(running_worker):
+    for line in (
+        b"{not json\n",
+        b"[1, 2]\n",
+        b"\xff\xfe\n",
+        b'{"action": "report"' + b" " * worker.MAX_REQUEST_BYTES + b"}\n",
+    ):
+        response = _send_line(line)
+        assert response["success"] is False
+        assert response["error"]
+
+    assert worker.send({"action": "report"}, timeout=10)["success"] is False
+
+    # and the worker carries on serving
+    assert worker.send({"action": "ping"}, timeout=10) == {"success": True}